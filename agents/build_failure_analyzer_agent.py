@@ -2,11 +2,17 @@ import datetime
 import uuid
 from config import is_simulation_mode
 from utils.azure_openai import azure_openai_prompt
-from utils.azure_cosmos import log_session
+from utils.storage import log_session
+from utils.prompt_budget import fit_log
 
 class BuildFailureAnalyzerAgent:
-    def run(self, build_logs: str, repo_url: str = "") -> dict:
-        session_id = str(uuid.uuid4())
+    def run(self, build_logs: str, repo_url: str = "", on_token=None, session_id: str = None) -> dict:
+        result, entry = self.analyze(build_logs, repo_url, on_token)
+        log_session(session_id or str(uuid.uuid4()), "build_failure_analyzer", entry)
+        return result
+
+    def analyze(self, build_logs: str, repo_url: str = "", on_token=None):
+        """The analysis and its session log entry, without logging it (see run)"""
         execution_mode = "simulation" if is_simulation_mode() else "production"
 
         # Define consistent structure with all expected fields
@@ -50,12 +56,12 @@ class BuildFailureAnalyzerAgent:
                     ---
 
                     Build Logs:
-                    {build_logs}
+                    {fit_log(build_logs)}
                     (Repo: {repo_url})
                     """
                 }]
 
-                raw_response = azure_openai_prompt(prompt)
+                raw_response = azure_openai_prompt(prompt, on_token=on_token)
                 parsed = self._parse_response(raw_response)
 
                 result = default_result | {
@@ -77,7 +83,7 @@ class BuildFailureAnalyzerAgent:
                 }
 
         # Ensure consistent logging shape
-        log_session(session_id, "build_failure_analyzer", {
+        entry = {
             "input": {
                 "repo_url": repo_url,
                 "mode": execution_mode,
@@ -87,9 +93,8 @@ class BuildFailureAnalyzerAgent:
             "output": result,
             "status": result["status"],
             "critical": result["critical"]
-        })
-
-        return result
+        }
+        return result, entry
 
     def _parse_response(self, response: str) -> dict:
         result = {}
@@ -1,12 +1,19 @@
 import uuid
 import datetime
 from utils.azure import build_container
-from utils.azure_cosmos import log_session
+from utils.build_logs import BuildLog
+from utils.storage import log_session
 from config import is_simulation_mode, get_azure_config
 
 class BuildAgent:
-    def run(self, repo_url, azure_config=None):
-        session_id = str(uuid.uuid4())
+    def run(self, repo_url, azure_config=None, repo_cache=None, session_id=None, on_log_line=None, on_failure=None):
+        """
+        Builds and pushes the repo image. In production the build output is streamed
+        into a BuildLog: `on_log_line` gets each line, `on_failure` gets the failure
+        excerpt as soon as a failure line appears, and a failed result carries that
+        excerpt as "logs" (the full log stays on disk at "log_path").
+        """
+        session_id = session_id or str(uuid.uuid4())
         execution_mode = "simulation" if is_simulation_mode() else "production"
         
         if azure_config is None:
@@ -32,8 +39,9 @@ class BuildAgent:
                 "critical": False
             }
         else:
+            build_log = BuildLog(session_id, on_line=on_log_line, on_failure=on_failure)
             try:
-                image_url = build_container(repo_url, azure_config)
+                image_url = build_container(repo_url, azure_config, repo_cache, build_log=build_log)
                 result = default_result | {
                     "status": "success",
                     "image_url": image_url,
@@ -44,8 +52,13 @@ class BuildAgent:
                 result = default_result | {
                     "status": "error",
                     "reason": f"Build failed: {str(e)}",
-                    "critical": True
+                    "critical": True,
+                    "logs": build_log.excerpt() or str(e)
                 }
+            finally:
+                build_log.close()
+            if build_log.line_count:
+                result["log_path"] = build_log.path
 
         # Add consistent input block
         log_session(session_id, "build", {
@@ -2,11 +2,11 @@ import datetime
 import uuid
 from config import is_simulation_mode
 from utils.azure_openai import azure_openai_prompt
-from utils.azure_cosmos import log_session
+from utils.storage import log_session
 
 class CodeReviewerAgent:
-    def run(self, repo_url: str) -> dict:
-        session_id = str(uuid.uuid4())
+    def run(self, repo_url: str, on_token=None, session_id: str = None) -> dict:
+        session_id = session_id or str(uuid.uuid4())
         execution_mode = "simulation" if is_simulation_mode() else "production"
         timestamp = datetime.datetime.utcnow().isoformat()
         prompt = None
@@ -69,7 +69,7 @@ class CodeReviewerAgent:
                         """
                 }]
 
-                review = azure_openai_prompt(prompt)
+                review = azure_openai_prompt(prompt, on_token=on_token)
 
                 result.update({
                     "status": "success",
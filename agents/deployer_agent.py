@@ -1,12 +1,12 @@
 import uuid
 import datetime
 from config import is_simulation_mode
-from utils.azure_cosmos import log_session
+from utils.storage import log_session
 from utils.azure import deploy_to_container_apps
 
 class DeployAgent:
-    def run(self, image_url, azure_config):
-        session_id = str(uuid.uuid4())
+    def run(self, image_url, azure_config, session_id=None):
+        session_id = session_id or str(uuid.uuid4())
         execution_mode = "simulation" if is_simulation_mode() else "production"
         timestamp = datetime.datetime.utcnow().isoformat()
 
@@ -1,23 +1,25 @@
 import datetime
-import json
 import uuid
 import os
-import subprocess
 from typing import Dict, Any
 from config import is_simulation_mode
-from utils.azure_cosmos import log_session
+from utils.storage import log_session
 from utils.azure import get_container_app_logs
+from utils.azure_mgmt import get_container_app, list_container_apps
 
 class MonitorAgent:
     def run(
         self,
         azure_config: dict,
         app_name: str = None,
-        resource_group: str = None
+        resource_group: str = None,
+        session_id: str = None
     ) -> Dict[str, Any]:
         """
         Monitors one or all Azure Container Apps in the given resource group.
-        Uses Azure CLI for monitoring.
+        Uses the Azure Container Apps management API for monitoring.
+        With a pipeline session_id the per-app results are logged as one document
+        for that session; otherwise each app is logged under its own session.
         """
         execution_mode = "simulation" if is_simulation_mode() else "production"
         timestamp = datetime.datetime.utcnow().isoformat()
@@ -33,20 +35,10 @@ class MonitorAgent:
         else:
             try:
                 # List container apps in resource group
-                result = subprocess.run([
-                    "az", "containerapp", "list",
-                    "--resource-group", resource_group,
-                    "--query", "[].name",
-                    "--output", "tsv"
-                ], capture_output=True, text=True, check=True)
-                
-                all_apps = result.stdout.strip().split('\n') if result.stdout.strip() else []
-                for app in all_apps:
+                for app in list_container_apps(resource_group, azure_config):
                     if app_name is None or app == app_name:
                         apps.append(app)
-                        
-            except subprocess.CalledProcessError as e:
-                session_id = str(uuid.uuid4())
+            except Exception as e:
                 error_result = {
                     "status": "error",
                     "summary": "Failed to list container apps",
@@ -57,13 +49,11 @@ class MonitorAgent:
                     "timestamp": timestamp,
                     "input": {"azure_config": str(azure_config), "app_name": app_name, "mode": execution_mode}
                 }
-                log_session(session_id, "monitor", error_result)
+                log_session(session_id or str(uuid.uuid4()), "monitor", error_result)
                 return {"error": error_result}
 
         # Describe and collect status for each app
         for app in apps:
-            session_id = str(uuid.uuid4())
-            
             if is_simulation_mode():
                 result = {
                     "status": "success",
@@ -78,17 +68,9 @@ class MonitorAgent:
             else:
                 try:
                     # Get container app details
-                    app_result = subprocess.run([
-                        "az", "containerapp", "show",
-                        "--name", app,
-                        "--resource-group", resource_group,
-                        "--query", "{provisioningState: properties.provisioningState, fqdn: properties.configuration.ingress.fqdn, replicas: properties.template.scale}",
-                        "--output", "json"
-                    ], capture_output=True, text=True, check=True)
-                    
-                    app_info = json.loads(app_result.stdout)
+                    app_info = get_container_app(app, resource_group, azure_config)
                     provisioning_state = app_info.get("provisioningState", "Unknown")
-                    fqdn = app_info.get("fqdn", "N/A")
+                    fqdn = app_info.get("fqdn") or "N/A"
                     
                     errors = []
                     if provisioning_state != "Succeeded":
@@ -111,7 +93,7 @@ class MonitorAgent:
                         "timestamp": timestamp,
                         "input": {"azure_config": str(azure_config), "app_name": app, "mode": execution_mode}
                     }
-                except subprocess.CalledProcessError as e:
+                except Exception as e:
                     result = {
                         "status": "error",
                         "summary": "Failed to describe container app",
@@ -124,7 +106,11 @@ class MonitorAgent:
                     }
                     
             # Log and store result
-            log_session(session_id, "monitor", result)
+            if session_id is None:
+                log_session(str(uuid.uuid4()), "monitor", result)
             results[app] = result
 
+        if session_id is not None:
+            log_session(session_id, "monitor", results)
+
         return results
@@ -1,16 +1,16 @@
 import time
 import uuid
 import subprocess
-import tempfile
 import os
-import shutil
 from config import is_simulation_mode
 from utils.azure_openai import azure_openai_prompt
-from utils.azure_cosmos import log_session
+from utils.storage import log_session
+from utils.github import checkout_repo
+from utils.prompt_budget import fit_log
 
 class RegressionCheckerAgent:
-    def run(self, repo_url: str):
-        session_id = str(uuid.uuid4())
+    def run(self, repo_url: str, repo_cache=None, on_token=None, session_id: str = None):
+        session_id = session_id or str(uuid.uuid4())
         execution_mode = "simulation" if is_simulation_mode() else "production"
         prompt = None
         timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
@@ -40,30 +40,26 @@ class RegressionCheckerAgent:
         try:
             print("[PROD MODE] Running RegressionCheckerAgent...")
 
-            # Step 1: Clone repo to temp dir
-            tmp_dir = tempfile.mkdtemp()
-            clone_cmd = f"git clone {repo_url} {tmp_dir}"
-            clone_result = os.system(clone_cmd)
-            if clone_result != 0:
-                raise Exception(f"Failed to clone repo: {repo_url}")
+            # Step 1: Check out the repo (shared clone when a cache is provided)
+            with checkout_repo(repo_url, repo_cache) as repo_path:
 
-            # Step 2: Install dependencies
-            req_path = os.path.join(tmp_dir, "requirements.txt")
-            if os.path.exists(req_path):
-                subprocess.run(["pip", "install", "-r", "requirements.txt"], cwd=tmp_dir, check=True)
+                # Step 2: Install dependencies
+                req_path = os.path.join(repo_path, "requirements.txt")
+                if os.path.exists(req_path):
+                    subprocess.run(["pip", "install", "-r", "requirements.txt"], cwd=repo_path, check=True)
 
-            # Step 3: Run tests
-            test_proc = subprocess.run(
-                ["pytest", "--tb=short", "--maxfail=5"],
-                cwd=tmp_dir, capture_output=True, text=True
-            )
-            test_output = test_proc.stdout + "\n" + test_proc.stderr
+                # Step 3: Run tests
+                test_proc = subprocess.run(
+                    ["pytest", "--tb=short", "--maxfail=5"],
+                    cwd=repo_path, capture_output=True, text=True
+                )
+                test_output = test_proc.stdout + "\n" + test_proc.stderr
 
-            # Step 4: Analyze output using LLM
+            # Step 4: Analyze output using LLM (log trimmed to the prompt token budget)
             prompt = [{
                 "content": (
                     f"I ran regression tests on the repository `{repo_url}`.\n\n"
-                    f"Here is the pytest output:\n\n```\n{test_output}\n```\n\n"
+                    f"Here is the pytest output:\n\n```\n{fit_log(test_output)}\n```\n\n"
                     "Please analyze the results and summarize any regressions. "
                     "Format the response in Markdown with the following sections:\n"
                     "1. **Summary** – overall test result\n"
@@ -73,7 +69,7 @@ class RegressionCheckerAgent:
                     "5. **Test Pass Rate** – count of passed vs failed\n"
                 )
             }]
-            llm_response = azure_openai_prompt(prompt)
+            llm_response = azure_openai_prompt(prompt, on_token=on_token)
 
             result = {
                 "status": "success",  # ✅ Always success to prevent pipeline stop
@@ -107,11 +103,5 @@ class RegressionCheckerAgent:
                 }
             }
 
-        finally:
-            try:
-                shutil.rmtree(tmp_dir)
-            except Exception:
-                pass
-
         log_session(session_id, "regression_check", result)
         return result
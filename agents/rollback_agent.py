@@ -1,14 +1,13 @@
 import datetime
 import uuid
-import subprocess
-import json
 from config import is_simulation_mode
-from utils.azure_cosmos import log_session
+from utils.storage import log_session
+from utils.azure_mgmt import list_container_app_revisions, set_container_app_traffic
 
 
 class RollbackAgent:
-    def run(self, azure_config: dict, app_name: str = "agentops-app") -> dict:
-        session_id = str(uuid.uuid4())
+    def run(self, azure_config: dict, app_name: str = "agentops-app", session_id: str = None) -> dict:
+        session_id = session_id or str(uuid.uuid4())
         execution_mode = "simulation" if is_simulation_mode() else "production"
         timestamp = datetime.datetime.utcnow().isoformat()
         resource_group = azure_config.get("resource_group", "agentops-rg")
@@ -36,17 +35,8 @@ class RollbackAgent:
         try:
             print("[PROD MODE] Attempting Azure rollback using Container Apps...")
 
-            # Get container app revisions
-            revisions_result = subprocess.run([
-                "az", "containerapp", "revision", "list",
-                "--name", app_name,
-                "--resource-group", resource_group,
-                "--query", "[].{name: name, createdTime: properties.createdTime, active: properties.active}",
-                "--output", "json"
-            ], capture_output=True, text=True, check=True)
-            
-            revisions = json.loads(revisions_result.stdout)
-            revisions.sort(key=lambda r: r["createdTime"], reverse=True)
+            # Get container app revisions, newest first
+            revisions = list_container_app_revisions(app_name, resource_group, azure_config)
 
             if len(revisions) < 2:
                 result = {
@@ -62,12 +52,7 @@ class RollbackAgent:
                 prev_revision = revisions[1]["name"]
                 
                 # Update traffic to route 100% to previous revision
-                subprocess.run([
-                    "az", "containerapp", "ingress", "traffic", "set",
-                    "--name", app_name,
-                    "--resource-group", resource_group,
-                    "--revision-weight", f"{prev_revision}=100"
-                ], check=True)
+                set_container_app_traffic(app_name, resource_group, {prev_revision: 100}, azure_config)
 
                 result = {
                     "status": "success",
@@ -80,15 +65,15 @@ class RollbackAgent:
                     "output": f"Rolled back to revision: {prev_revision}"
                 }
 
-        except subprocess.CalledProcessError as e:
+        except Exception as e:
             result = {
                 "status": "error",
                 "restored": False,
-                "reason": f"Azure CLI error: {str(e)}",
+                "reason": f"Azure API error: {str(e)}",
                 "critical": False,
                 "skippable": True,
                 "timestamp": timestamp,
-                "output": "Rollback failed due to Azure CLI error."
+                "output": "Rollback failed due to Azure API error."
             }
 
         # ✅ Input payload for logging
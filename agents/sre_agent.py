@@ -2,11 +2,11 @@ import datetime
 import uuid
 from config import is_simulation_mode
 from utils.azure_openai import azure_openai_prompt
-from utils.azure_cosmos import fetch_agent_history, log_session
+from utils.storage import fetch_agent_history, log_session
 
 class SREAgent:
-    def run(self, repo_url: str, azure_config: dict) -> dict:
-        session_id = str(uuid.uuid4())
+    def run(self, repo_url: str, azure_config: dict, on_token=None, session_id: str = None) -> dict:
+        session_id = session_id or str(uuid.uuid4())
         execution_mode = "simulation" if is_simulation_mode() else "production"
         timestamp = datetime.datetime.utcnow().isoformat()
 
@@ -91,7 +91,7 @@ class SREAgent:
                 """
             }]
 
-            response = azure_openai_prompt(prompt)
+            response = azure_openai_prompt(prompt, on_token=on_token)
 
             def safe_extract(key, fallback="N/A"):
                 try:
@@ -7,14 +7,15 @@ import shutil
 from github import Github
 from config import is_simulation_mode
 from utils.azure_openai import azure_openai_prompt
-from utils.azure_cosmos import log_session
+from utils.storage import log_session
+from utils.github import checkout_repo
 from dotenv import load_dotenv
 
 load_dotenv()
 
 class TestWriterAgent:
-    def run(self, repo_url: str) -> dict:
-        session_id = str(uuid.uuid4())
+    def run(self, repo_url: str, repo_cache=None, on_token=None, session_id: str = None) -> dict:
+        session_id = session_id or str(uuid.uuid4())
         execution_mode = "simulation" if is_simulation_mode() else "production"
         timestamp = datetime.datetime.utcnow().isoformat()
         generated_tests = []
@@ -40,13 +41,12 @@ class TestWriterAgent:
         # Try to extract real repo structure for better LLM prompting
         file_list_text = ""
         try:
-            from utils.github import validate_and_clone_repo
-            local_repo_path = validate_and_clone_repo(repo_url)
-            for root, _, files in os.walk(local_repo_path):
-                for file in files:
-                    if file.endswith(".py") and "test" not in file:
-                        relative_path = os.path.relpath(os.path.join(root, file), local_repo_path)
-                        file_list_text += f"- {relative_path}\n"
+            with checkout_repo(repo_url, repo_cache) as local_repo_path:
+                for root, _, files in os.walk(local_repo_path):
+                    for file in files:
+                        if file.endswith(".py") and "test" not in file:
+                            relative_path = os.path.relpath(os.path.join(root, file), local_repo_path)
+                            file_list_text += f"- {relative_path}\n"
         except Exception as e:
             note += f"⚠️ Repo scan failed: {str(e)}\n"
 
@@ -68,7 +68,7 @@ Files:
 
         try:
             print("[PROD MODE] Generating real test code...")
-            test_code = azure_openai_prompt(prompt)
+            test_code = azure_openai_prompt(prompt, on_token=on_token)
 
             # Sanity check: is it valid Python?
             try:
@@ -1,8 +1,13 @@
+import datetime
 import streamlit as st
 import pandas as pd
 import json
 import os
 import altair as alt
+from config import is_simulation_mode
+from utils.analytics import RunAnalytics, export_history_parquet
+from utils.rollups import get_rollups
+from utils.storage import get_history_version, get_storage, sync_rollups
 
 # === Styling ===
 st.markdown("""
@@ -66,29 +71,125 @@ with st.expander("🕒 Latest Run Summary", expanded=False):
     else:
         st.warning("No run data available. Run pipeline to populate this.")
 
-# === Mocked Historical Data ===
-mock_data_path = os.path.join(os.getcwd(), "mock_data", "historical_runs.json")
-if not os.path.exists(mock_data_path):
-    st.error("Missing mock_data/historical_runs.json")
-    st.stop()
+# === Run History ===
+# The KPI cards and the latency table read only the hourly/daily rollups kept up to
+# date by log_session, so a render costs O(buckets in the window). The rollups are
+# caught up from the storage backend — fully on first use, then incrementally — so runs
+# logged before a restart or by other replicas are counted too. The time series and
+# the ad-hoc date range / mode drill-down query the partitioned Parquet export with
+# DuckDB. The mock file is only used until there is any history.
+# Both refreshes are cached across sessions, so the mode and backend they read under
+# are part of the key: a simulation session (whose history reads come back empty)
+# must not stand in for a production one.
+@st.cache_data(ttl=300, show_spinner=False)
+def refresh_rollups(history_version: int, simulation: bool, backend: str) -> int:
+    # history_version is part of the cache key: runs logged here trigger a catch-up
+    return sync_rollups()
 
-with open(mock_data_path, "r") as f:
-    history = json.load(f)
 
-df = pd.DataFrame(history)
+@st.cache_data(ttl=300, show_spinner=False)
+def refresh_history_export(history_version: int, simulation: bool, backend: str) -> int:
+    # Appends rows newer than the export watermark; cheap when nothing changed
+    return export_history_parquet()
+
+
+rollups = get_rollups()
+agent_stats = []
+if rollups is not None:
+    try:
+        refresh_rollups(get_history_version(), is_simulation_mode(), get_storage().name)
+    except Exception as e:
+        st.warning(f"⚠️ Could not sync run history into the dashboard rollups: {e}")
+
+analytics = RunAnalytics()
+try:
+    refresh_history_export(get_history_version(), is_simulation_mode(), get_storage().name)
+except Exception as e:
+    st.warning(f"⚠️ Could not export run history for the charts: {e}")
+
+if rollups is not None and rollups.has_data():
+    st.sidebar.header("📅 Window")
+    window_days = st.sidebar.selectbox("Show last", [7, 30, 90, 365], index=1, format_func=lambda d: f"{d} days")
+    since = (datetime.date.today() - datetime.timedelta(days=window_days)).isoformat()
+
+    kpis = rollups.kpis(since=since)
+    total_runs = kpis["total_runs"]
+    success_pct = int(kpis["success_rate"] * 100)
+    prod_runs = kpis["production_runs"]
+
+    agent_stats = rollups.agent_stats(since=since)
+
+    if analytics.has_data():
+        st.sidebar.header("🔎 Explore")
+        today = datetime.date.today()
+        explore_range = st.sidebar.date_input(
+            "Date range", value=(today - datetime.timedelta(days=window_days), today), max_value=today
+        )
+        # date_input returns a single date while the range is being picked
+        if isinstance(explore_range, (list, tuple)):
+            start, end = explore_range[0], explore_range[-1]
+        else:
+            start = end = explore_range
+        explore_mode = st.sidebar.selectbox("Mode", ["all", "production", "simulation"])
+        mode = None if explore_mode == "all" else explore_mode
+
+        timeseries = analytics.status_timeseries(since=start, until=end, mode=mode)
+        x_field = "day"
+        agent_scores = analytics.agent_success_rates(since=start, until=end, mode=mode).rename(
+            columns={"agent": "Agent", "success_rate": "SuccessRate"}
+        )[["Agent", "SuccessRate"]]
+    else:
+        timeseries = pd.DataFrame(rollups.timeseries(since=since))
+        x_field = "bucket"
+        agent_scores = pd.DataFrame(
+            [{"Agent": s["agent"], "SuccessRate": s["success_rate"]} for s in agent_stats],
+            columns=["Agent", "SuccessRate"]
+        )
+
+    line_chart = alt.Chart(timeseries).mark_line(point=True).encode(
+        x=alt.X(f"{x_field}:T", title="Day"),
+        y=alt.Y("success_rate:Q", title="Success Rate (0–1)"),
+        tooltip=[f"{x_field}:T", "executions:Q", "success_rate:Q"]
+    ).properties(height=300) if not timeseries.empty else None
+else:
+    mock_data_path = os.path.join(os.getcwd(), "mock_data", "historical_runs.json")
+    if not os.path.exists(mock_data_path):
+        st.error("Missing mock_data/historical_runs.json")
+        st.stop()
+
+    st.info("🔁 No runs recorded yet — showing mock data")
+    with open(mock_data_path, "r") as f:
+        df = pd.DataFrame(json.load(f))
+
+    total_runs = len(df)
+    success_pct = int((df["status"] == "success").mean() * 100) if "status" in df.columns else None
+    prod_runs = df[df["mode"] == "production"].shape[0] if "mode" in df.columns else None
+
+    line_chart = None
+    if {"timestamp", "status_score", "status"} <= set(df.columns):
+        line_chart = alt.Chart(df).mark_line(point=True).encode(
+            x="timestamp:T",
+            y=alt.Y("status_score:Q", title="Run Score (0–1)"),
+            color="status:N"
+        ).properties(height=300)
+
+    agent_scores = pd.DataFrame(columns=["Agent", "SuccessRate"])
+    agent_cols = [c for c in df.columns if c.startswith("agent_")]
+    if agent_cols:
+        agent_scores = df[agent_cols].mean().reset_index()
+        agent_scores.columns = ["Agent", "SuccessRate"]
 
 # === KPI Section ===
 st.subheader("📌 Key Metrics")
 col1, col2, col3 = st.columns(3)
 col1.markdown('<div class="card">', unsafe_allow_html=True)
-col1.markdown(f"<div class='kpi'>{len(df)}</div>", unsafe_allow_html=True)
+col1.markdown(f"<div class='kpi'>{total_runs}</div>", unsafe_allow_html=True)
 col1.markdown("<div class='label'>Total Runs</div>", unsafe_allow_html=True)
 col1.markdown('</div>', unsafe_allow_html=True)
 
-# ✅ Safe handling for missing 'status' column
+# ✅ Safe handling for missing status data
 col2.markdown('<div class="card">', unsafe_allow_html=True)
-if 'status' in df.columns:
-    success_pct = int((df['status'] == 'success').mean() * 100)
+if success_pct is not None:
     col2.markdown(f"<div class='kpi'>{success_pct}%</div>", unsafe_allow_html=True)
     col2.markdown("<div class='label'>Success Rate</div>", unsafe_allow_html=True)
 else:
@@ -96,10 +197,9 @@ else:
     col2.markdown("<div class='label'>Success Rate (missing)</div>", unsafe_allow_html=True)
 col2.markdown('</div>', unsafe_allow_html=True)
 
-# ✅ Safe handling for missing 'mode' column
+# ✅ Safe handling for missing mode data
 col3.markdown('<div class="card">', unsafe_allow_html=True)
-if 'mode' in df.columns:
-    prod_runs = df[df["mode"] == "production"].shape[0]
+if prod_runs is not None:
     col3.markdown(f"<div class='kpi'>{prod_runs}</div>", unsafe_allow_html=True)
     col3.markdown("<div class='label'>Production Runs</div>", unsafe_allow_html=True)
 else:
@@ -109,25 +209,27 @@ col3.markdown('</div>', unsafe_allow_html=True)
 
 # === Charts ===
 st.subheader("📈 Run Status Over Time")
-if 'timestamp' in df.columns and 'status_score' in df.columns and 'status' in df.columns:
-    line_chart = alt.Chart(df).mark_line(point=True).encode(
-        x="timestamp:T",
-        y=alt.Y("status_score:Q", title="Run Score (0–1)"),
-        color="status:N"
-    ).properties(height=300)
+if line_chart is not None:
     st.altair_chart(line_chart, use_container_width=True)
 else:
-    st.warning("📉 Cannot render line chart — required columns missing.")
+    st.warning("📉 Cannot render line chart — no run data in this window.")
 
 st.subheader("📊 Agent Success Rate")
-agent_cols = [c for c in df.columns if c.startswith("agent_")]
-if agent_cols:
-    agent_scores = df[agent_cols].mean().reset_index()
-    agent_scores.columns = ["Agent", "SuccessRate"]
+if not agent_scores.empty:
     bar_chart = alt.Chart(agent_scores).mark_bar().encode(
         x=alt.X("Agent", sort="-y"),
         y="SuccessRate"
     ).properties(height=300)
     st.altair_chart(bar_chart, use_container_width=True)
 else:
-    st.warning("📊 No agent_* columns found to generate bar chart.")
\ No newline at end of file
+    st.warning("📊 No agent data found to generate bar chart.")
+
+if agent_stats:
+    st.subheader("⏱️ Agent Latency")
+    st.dataframe(
+        pd.DataFrame(agent_stats).rename(columns={
+            "agent": "Agent", "executions": "Executions", "success_rate": "Success Rate",
+            "p50_s": "p50 (s)", "p90_s": "p90 (s)", "p99_s": "p99 (s)"
+        }),
+        use_container_width=True
+    )
@@ -1,153 +1,182 @@
+import datetime
 import streamlit as st
 import pandas as pd
 import json
 import os
 from config import is_simulation_mode
-from utils.azure_cosmos import fetch_all_sessions
+from utils.history_export import EXPORT_FORMATS, ExportFile, export_history, prune_exports
+from utils.history_frame import HISTORY_COLUMNS, flatten_mock_runs
+from utils.storage import (
+    begin_query_scope, fetch_session_summaries, fetch_sessions_page, get_query_metrics, summary_bucket,
+    get_storage, sync_session_summaries_in_background
+)
 
 # st.set_page_config(page_title="🕓 Historical Runs", layout="wide")
 st.title("🕓 Historical Azure Pipeline Runs")
 
+AGENTS = [
+    "code_review", "test_writer", "regression_check", "build", "build_failure_analyzer",
+    "deploy", "monitor", "rollback", "sre"
+]
+STATUSES = ["success", "error", "warning", "skipped"]
+
+# === Filters (applied server-side in production) ===
+st.sidebar.header("🔍 Filters")
+
+selected_mode = st.sidebar.selectbox("Mode", ["All", "simulation", "production"])
+selected_status = st.sidebar.selectbox("Status", ["All"] + STATUSES)
+selected_agent = st.sidebar.selectbox("Agent", ["All"] + AGENTS)
+date_range = st.sidebar.date_input(
+    "Date range",
+    value=(datetime.date.today() - datetime.timedelta(days=30), datetime.date.today())
+)
+page_size = st.sidebar.selectbox("Rows per page", [25, 50, 100, 250], index=1)
+
+filters = {
+    "mode": None if selected_mode == "All" else selected_mode,
+    "status": None if selected_status == "All" else selected_status,
+    "agent": None if selected_agent == "All" else selected_agent,
+    "since": None,
+    "until": None,
+}
+if isinstance(date_range, (list, tuple)) and len(date_range) == 2:
+    filters["since"] = date_range[0].isoformat()
+    filters["until"] = (date_range[1] + datetime.timedelta(days=1)).isoformat()
+
+# Continuation tokens of the pages visited so far; reset whenever the filters change
+filter_key = tuple(sorted(filters.items())) + (page_size,)
+if st.session_state.get("history_filter_key") != filter_key:
+    st.session_state.history_filter_key = filter_key
+    st.session_state.history_pages = [None]
+pages = st.session_state.history_pages
+page_number = len(pages) - 1
+
 # === Load Data ===
-if is_simulation_mode():
+# Only one page is ever fetched and rendered; the export pages through separately.
+begin_query_scope("historical_runs")
+if is_simulation_mode() and not get_storage().records_simulation:
     st.info("🔁 Simulation Mode Enabled — using mock data")
     mock_data_path = os.path.join(os.getcwd(), "mock_data", "historical_runs.json")
     if not os.path.exists(mock_data_path):
         st.error("Missing mock_data/historical_runs.json")
         st.stop()
     with open(mock_data_path, "r") as f:
-        sessions = json.load(f)
+        mock_rows = flatten_mock_runs(json.load(f))
+
+    def fetch_page(size, token, **page_filters):
+        matching = mock_rows
+        for column in ("mode", "status", "agent"):
+            if page_filters.get(column) is not None:
+                matching = matching[matching[column] == page_filters[column]]
+        start = int(token or 0)
+        page = matching.iloc[start:start + size].to_dict("records")
+        return page, str(start + size) if len(matching) > start + size else None
 else:
-    sessions = fetch_all_sessions()
-    print("sessions", sessions)
-
-    # ✅ DEBUGGING — Confirm Cosmos DB Data Structure
-    try:
-        session_count = len(sessions) if hasattr(sessions, "__len__") else "unknown"
-        st.info(f"✅ Cosmos DB fetched {session_count} session(s).")
-    except Exception as e:
-        st.error(f"❌ Could not determine session count: {e}")
-
-    try:
-        if isinstance(sessions, dict) and sessions:
-            st.markdown("### 🔍 First Cosmos DB Session (Preview):")
-            st.json(dict(list(sessions.items())[:1]))  # show one session
+    fetch_page = fetch_sessions_page
+
+    # One summary document per session, read from a single month partition. The change
+    # feed is folded in off the page thread, at most once per AZURE_COSMOS_SUMMARY_SYNC_INTERVAL
+    sync_session_summaries_in_background()
+    month = summary_bucket(date_range[1].isoformat() if filters["until"] else datetime.date.today().isoformat())
+    summaries = fetch_session_summaries(month)
+    with st.expander(f"🗂 Sessions — {month} ({len(summaries)})", expanded=False):
+        if summaries:
+            st.dataframe(pd.DataFrame(summaries, columns=[
+                "session_id", "updated_at", "status", "repo", "mode", "agents"
+            ]), use_container_width=True, hide_index=True)
         else:
-            st.warning("⚠️ No session data found in Cosmos DB.")
-    except Exception as e:
-        st.error(f"❌ Error displaying Cosmos DB session preview: {e}")
-
-# === Flatten Session Logs ===
-rows = []
-
-if isinstance(sessions, list):  # Simulation mode
-    for s in sessions:
-        session_id = s.get("session_id", "mock-session")
-        agents = s.get("agents", {})
-        for agent_name, log in agents.items():
-            output = log.get("output", {})
-            if isinstance(output, str):
-                try:
-                    output = json.loads(output)
-                except json.JSONDecodeError:
-                    output = {}
-            rows.append({
-                "session_id": session_id,
-                "agent": agent_name,
-                "timestamp": log.get("timestamp"),
-                "repo": log.get("input", {}).get("repo_url", "N/A"),
-                "mode": log.get("input", {}).get("mode", "simulation"),
-                "status": log.get("status", "unknown"),
-                "issues_found": str(output.get("issues_found", "N/A") if output else "N/A"),
-            })
-else:
-    for session_id, session in sessions.items():
-        agents = session.get("agents", {})
-        for agent_name, log in agents.items():
-            output = log.get("output", {})
-            if isinstance(output, str):
-                try:
-                    output = json.loads(output)
-                except json.JSONDecodeError:
-                    output = {}
-            rows.append({
-                "session_id": session_id,
-                "agent": agent_name,
-                "timestamp": log.get("timestamp"),
-                "repo": log.get("input", {}).get("repo_url", "N/A"),
-                "mode": log.get("input", {}).get("mode", "production"),
-                "status": log.get("status", "unknown"),
-                "issues_found": str(output.get("issues_found", "N/A") if output else "N/A"),
-            })
-
-    df = pd.DataFrame(rows)
-    print(df)
-
-    # 🔍 Debug: Show what's inside the DataFrame
-    st.subheader("🔧 Debug Info")
-    st.text(f"Columns in DataFrame: {list(df.columns)}")
-    st.text(f"Number of rows: {len(df)}")
-
-    # ✅ Fallback if 'mode' column is missing
-    if "mode" not in df.columns:
-        st.warning("⚠️ 'mode' column missing — injecting fallback value")
-        df["mode"] = "unknown"
-
-    # === Filters ===
-    st.sidebar.header("🔍 Filters")
-
-    selected_mode = st.sidebar.selectbox("Mode", ["All", "simulation", "production"])
-    selected_status = st.sidebar.selectbox("Status", ["All"] + sorted(df["status"].dropna().unique()) if not df.empty else ["All"])
-    selected_agent = st.sidebar.selectbox("Agent", ["All"] + sorted(df["agent"].unique()) if not df.empty else ["All"])
-
-    if selected_mode != "All":
-        df = df[df["mode"] == selected_mode]
-
-    if selected_status != "All":
-        df = df[df["status"] == selected_status]
-
-    if selected_agent != "All":
-        df = df[df["agent"] == selected_agent]
-        
-    if "mode" in df.columns:
-        df = df[df["mode"] == selected_mode]
-    else:
-        print("Column 'mode' not found in DataFrame")
+            st.info("No sessions recorded for this month yet.")
+
+rows, next_token = fetch_page(page_size, pages[-1], **filters)
+df = pd.DataFrame(rows, columns=HISTORY_COLUMNS)
 
-    # === Display Table as Clean Cards ===
-    st.markdown("### 📄 Filtered Run Log")
+# === Run Table ===
+st.markdown("### 📄 Filtered Run Log")
 
-    if df.empty:
-        st.warning("No matching records found with the selected filters.")
+STATUS_LABELS = {"success": "🟢 success", "error": "🔴 error", "warning": "🟠 warning", "skipped": "⚪️ skipped"}
+
+if df.empty:
+    st.warning("No matching records found with the selected filters.")
+else:
+    df["status"] = df["status"].map(STATUS_LABELS).fillna("⚪️ " + df["status"].astype(str))
+    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce", utc=True)
+    df["repo"] = df["repo"].where(df["repo"].astype(str).str.startswith("http"), None)
+    st.dataframe(
+        df,
+        hide_index=True,
+        use_container_width=True,
+        column_order=["timestamp", "agent", "status", "mode", "repo", "issues_found", "session_id"],
+        column_config={
+            "timestamp": st.column_config.DatetimeColumn("🕒 Time", format="YYYY-MM-DD HH:mm:ss"),
+            "agent": st.column_config.TextColumn("🧪 Agent"),
+            "status": st.column_config.TextColumn("📊 Status"),
+            "mode": st.column_config.TextColumn("📌 Mode"),
+            "repo": st.column_config.LinkColumn("🗂 Repo"),
+            "issues_found": st.column_config.TextColumn("🐞 Issues"),
+            "session_id": st.column_config.TextColumn("🆔 Session"),
+        }
+    )
+
+# === Paging ===
+col_prev, col_page, col_next = st.columns([1, 2, 1])
+with col_prev:
+    if st.button("⬅️ Newer", disabled=page_number == 0):
+        pages.pop()
+        st.rerun()
+with col_page:
+    st.markdown(f"Page **{page_number + 1}** · {len(df)} record(s)")
+with col_next:
+    if st.button("Older ➡️", disabled=next_token is None):
+        pages.append(next_token)
+        st.rerun()
+
+# === Export ===
+# Streamed page by page from the storage query into a file under static/, so memory stays
+# bounded by one page (one row group for Parquet) however many runs match. The browser
+# then fetches it from the static file endpoint, streamed from disk.
+col_format, col_prepare = st.columns([1, 3])
+with col_format:
+    export_format = st.selectbox("Export format", list(EXPORT_FORMATS), label_visibility="collapsed")
+with col_prepare:
+    prepare = st.button("📦 Prepare export of all matching runs")
+
+if prepare:
+    previous = st.session_state.pop("history_export", None)
+    if previous:
+        previous["file"].delete()
+    prune_exports()
+    export_file = ExportFile(EXPORT_FORMATS[export_format]["extension"])
+    with st.spinner("Exporting..."):
+        try:
+            with export_file.open() as f:
+                count = export_history(f, export_format, fetch_page, page_size=1000, **filters)
+        except Exception:
+            export_file.delete()
+            raise
+    # Holding the ExportFile in session state deletes the file when the session ends
+    st.session_state.history_export = {
+        "file": export_file, "count": count, "filter_key": filter_key, "format": export_format
+    }
+
+export = st.session_state.get("history_export")
+if export and export["filter_key"] == filter_key and os.path.exists(export["file"].path):
+    spec = EXPORT_FORMATS[export["format"]]
+    file_name = f"filtered_historical_runs.{spec['extension']}"
+    label = f"⬇️ Download Filtered {export['format']} ({export['count']} rows)"
+    if st.get_option("server.enableStaticServing"):
+        base_path = st.get_option("server.baseUrlPath").strip("/")
+        href = "/" + "/".join(filter(None, [base_path, export["file"].url_path]))
+        st.markdown(f'<a href="{href}" download="{file_name}">{label}</a>', unsafe_allow_html=True)
+    else:
+        # Static serving is off (see .streamlit/config.toml): fall back to sending the bytes
+        with open(export["file"].path, "rb") as f:
+            st.download_button(label=label, data=f, file_name=file_name, mime=spec["mime"])
+
+# === Storage Usage ===
+with st.expander("📊 Storage usage (this page)", expanded=False):
+    usage = get_query_metrics().summary("historical_runs")
+    if usage:
+        st.caption(f"{sum(u['request_charge'] for u in usage):.1f} RU across {sum(u['calls'] for u in usage)} call(s)")
+        st.dataframe(usage, use_container_width=True)
     else:
-        for _, row in df.sort_values("timestamp", ascending=False).iterrows():
-            with st.container():
-                col1, col2, col3 = st.columns([1.4, 1.6, 2.5])
-                with col1:
-                    st.markdown(f"**🧪 Agent:** `{row.agent}`")
-                    st.markdown(f"**🕒 Time:** `{row.timestamp}`")
-                    st.markdown(f"**🆔 Session:** `{row.session_id}`")
-                with col2:
-                    st.markdown(f"**🗂 Repo:** [{row.repo}]({row.repo})")
-                    st.markdown(f"**📌 Mode:** `{row.mode}`")
-                    st.markdown(f"**🐞 Issues:** `{row.issues_found}`")
-                with col3:
-                    status = str(row.status)
-                    if "✅" in status:
-                        icon = "🟢"
-                    elif "❌" in status:
-                        icon = "🔴"
-                    elif "⚠️" in status:
-                        icon = "🟠"
-                    else:
-                        icon = "⚪️"
-                    st.markdown(f"**📊 Status:** {icon} `{status.replace('✅','').replace('❌','').replace('⚠️','').strip()}`")
-                st.markdown("---")
-
-        # === Download Option ===
-        st.download_button(
-            label="⬇️ Download Filtered CSV",
-            data=df.to_csv(index=False),
-            file_name="filtered_historical_runs.csv",
-            mime="text/csv"
-        )
+        st.info("No storage calls on this page run.")
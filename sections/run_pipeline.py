@@ -2,7 +2,20 @@ import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import streamlit as st
+import collections
+import threading
+import time
 import uuid
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from config import get_azure_config, is_simulation_mode
+from utils.storage import (
+    begin_query_scope, fetch_recent_history, flush_session_logs, get_history_version, get_query_metrics, get_storage,
+    log_session, sync_session_summaries
+)
+from utils.build_logs import EarlyFailureAnalysis
+from utils.pipeline import Pipeline, Stage
+from utils.rollups import record_stage_latency
+from utils.repo_cache import RepoCloneCache
 from agents.code_reviewer_agent import CodeReviewerAgent
 from agents.test_writer_agent import TestWriterAgent
 from agents.regression_checker_agent import RegressionCheckerAgent
@@ -30,84 +43,213 @@ if azure_subscription:
     azure_config["subscription_id"] = azure_subscription
 
 # === Load History ===
-history_options = {
-    "code_review": fetch_agent_history(agent="code_review", limit=5),
-    "test_writer": fetch_agent_history(agent="test_writer", limit=5),
-    "regression_check": fetch_agent_history(agent="regression_check", limit=5),
-    "build": fetch_agent_history(agent="build", limit=5),
-    "build_failure_analyzer": fetch_agent_history(agent="build_failure_analyzer", limit=5),
-    "deploy": fetch_agent_history(agent="deploy", limit=5),
-    "monitor": fetch_agent_history(agent="monitor", limit=5),
-    "rollback": fetch_agent_history(agent="rollback", limit=5),
-    "sre": fetch_agent_history(agent="sre", limit=5),
-}
+begin_query_scope("run_pipeline")
+HISTORY_AGENTS = [
+    "code_review", "test_writer", "regression_check", "build", "build_failure_analyzer",
+    "deploy", "monitor", "rollback", "sre"
+]
+
+
+@st.cache_data(ttl=int(os.getenv("AGENTOPS_HISTORY_CACHE_TTL", "300")), show_spinner=False)
+def load_history(history_version: int, simulation: bool, backend: str, limit: int = 5) -> dict:
+    # st.cache_data is shared by every session, so everything the result depends on is
+    # part of the key: newly logged runs (history_version), this session's mode (the
+    # Cosmos reads return mock rows in simulation) and the storage backend.
+    return fetch_recent_history(HISTORY_AGENTS, limit=limit)
+
+
+history_options = load_history(get_history_version(), is_simulation_mode(), get_storage().name)
 
 agent_outputs = {}
 STATUS_ICONS = {
     "pending": "⏳", "running": "🔄", "success": "✅", "error": "❌"
 }
 
+# === Live LLM Output ===
+class LiveOutput:
+    """Token callback that renders an agent's streamed LLM output into a placeholder."""
+
+    def __init__(self, title: str, min_interval: float = 0.15):
+        self.title = title
+        self.min_interval = min_interval
+        self.placeholder = st.empty()
+        self.text = ""
+        self._last_render = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, chunk: str):
+        with self._lock:
+            self.text += chunk
+            # Throttle re-renders so long reviews don't flood the websocket
+            if time.monotonic() - self._last_render >= self.min_interval:
+                self._render()
+
+    def _render(self):
+        self._last_render = time.monotonic()
+        self.placeholder.markdown(f"**{self.title}**\n\n{self.text}")
+
+    def flush(self):
+        with self._lock:
+            if self.text:
+                self._render()
+
+
+class LiveLog:
+    """Line callback that keeps the last lines of a streaming build log in a placeholder."""
+
+    def __init__(self, title: str, max_lines: int = 40, min_interval: float = 0.25):
+        self.title = title
+        self.min_interval = min_interval
+        self.placeholder = st.empty()
+        self.lines = collections.deque(maxlen=max_lines)
+        self._last_render = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, line: str):
+        with self._lock:
+            self.lines.append(line)
+            if time.monotonic() - self._last_render >= self.min_interval:
+                self._render()
+
+    def _render(self):
+        self._last_render = time.monotonic()
+        with self.placeholder.container():
+            st.markdown(f"**{self.title}**")
+            st.code("\n".join(self.lines), language="text")
+
+    def flush(self):
+        with self._lock:
+            if self.lines:
+                self._render()
+
+
+LIVE_AGENTS = {
+    "code_review": "🧠 Code Reviewer",
+    "test_writer": "🧪 Test Writer",
+    "regression_check": "🔁 Regression Checker",
+    "build_failure_analyzer": "📉 Build Failure Analysis",
+    "sre": "🛡️ SRE Audit",
+}
+
+
+# === Pipeline Definition ===
+# Every agent logs its own output under the pipeline session_id
+def _deploy(session_id, upstream):
+    image_url = upstream["build"].get("image_url")
+    if image_url:
+        return DeployAgent().run(image_url, azure_config, session_id=session_id)
+    result = {
+        "status": "error",
+        "reason": "Missing image_url from BuildAgent output",
+        "critical": True,
+        "skippable": False
+    }
+    log_session(session_id, "deploy", result)
+    return result
+
+
+def build_pipeline(session_id: str, repo_cache: RepoCloneCache, live: dict, initializer=None) -> Pipeline:
+    gate = ("code_review", "test_writer", "regression_check", "build")
+    # Failure analysis starts from the build log's first failure line, while the build is still winding down
+    analysis = EarlyFailureAnalysis(
+        lambda logs: BuildFailureAnalyzerAgent().analyze(
+            build_logs=logs,
+            repo_url=repo_url,
+            on_token=live.get("build_failure_analyzer")
+        ),
+        initializer=initializer
+    )
+
+    def build_failed(build: dict) -> bool:
+        return build.get("status") == "error" and "logs" in build
+
+    def run_build(_):
+        build = {}
+        try:
+            build = BuildAgent().run(
+                repo_url, azure_config, repo_cache, session_id=session_id,
+                on_log_line=live.get("build"), on_failure=analysis.start
+            )
+            return build
+        finally:
+            # A failure line the build recovered from may have started the analysis early
+            if not build_failed(build):
+                analysis.cancel()
+
+    def analyze_build(up):
+        result, entry = analysis.result(up["build"]["logs"])
+        log_session(session_id, "build_failure_analyzer", entry)
+        return result
+
+    return Pipeline([
+        Stage("code_review", lambda _: CodeReviewerAgent().run(
+            repo_url, on_token=live.get("code_review"), session_id=session_id
+        )),
+        Stage("test_writer", lambda _: TestWriterAgent().run(
+            repo_url, repo_cache, on_token=live.get("test_writer"), session_id=session_id
+        )),
+        Stage("regression_check", lambda _: RegressionCheckerAgent().run(
+            repo_url, repo_cache, on_token=live.get("regression_check"), session_id=session_id
+        )),
+        Stage("build", run_build),
+        Stage(
+            "build_failure_analyzer",
+            analyze_build,
+            depends_on=["build"],
+            when=lambda up: build_failed(up["build"])
+        ),
+        Stage(
+            "deploy",
+            lambda up: _deploy(session_id, up),
+            depends_on=gate,
+            when=lambda up: all(up[name].get("status") == "success" for name in gate)
+        ),
+        Stage("monitor", lambda _: MonitorAgent().run(azure_config, session_id=session_id), depends_on=["deploy"]),
+        Stage("rollback", lambda _: RollbackAgent().run(azure_config, session_id=session_id), depends_on=["deploy"]),
+        Stage("sre", lambda _: SREAgent().run(
+            repo_url, azure_config, on_token=live.get("sre"), session_id=session_id
+        ), depends_on=["deploy"]),
+    ], max_workers=4)
+
+
 # === Pipeline Execution ===
 if st.button("▶️ Run Full Azure Agent Pipeline") and repo_url and azure_resource_group:
     session_id = str(uuid.uuid4())
-    with st.spinner("⏱️ Running all agents..."):
+    ctx = get_script_run_ctx()
+    with st.expander("📡 Live Agent Output", expanded=True):
+        live = {key: LiveOutput(title) for key, title in LIVE_AGENTS.items()}
+        live["build"] = LiveLog("🏗️ Build Log")
+    def record_latency(name, timing, _output):
+        if get_storage().records_simulation or not is_simulation_mode():
+            record_stage_latency(name, timing.duration, repo_url)
 
-        output = CodeReviewerAgent().run(repo_url)
-        log_session(session_id, "code_review", output)
-        agent_outputs["code_review"] = output
+    def attach_ctx():
+        add_script_run_ctx(threading.current_thread(), ctx)
 
-        output = TestWriterAgent().run(repo_url)
-        log_session(session_id, "test_writer", output)
-        agent_outputs["test_writer"] = output
+    with st.spinner("⏱️ Running all agents..."), RepoCloneCache() as repo_cache:
+        result = build_pipeline(session_id, repo_cache, live, initializer=attach_ctx).run(
+            initializer=attach_ctx,
+            on_stage_done=record_latency
+        )
+    for panel in live.values():
+        panel.flush()
+    agent_outputs.update(result.outputs)
 
-        output = RegressionCheckerAgent().run(repo_url)
-        log_session(session_id, "regression_check", output)
-        agent_outputs["regression_check"] = output
+    log_stats = flush_session_logs()
+    sync_session_summaries()
+    history_options = load_history(get_history_version(), is_simulation_mode(), get_storage().name)
+    if log_stats["dropped"] or log_stats["failed"]:
+        st.warning(
+            f"⚠️ {log_stats['dropped'] + log_stats['failed']} session log(s) could not be saved "
+            f"({log_stats['dropped']} dropped, {log_stats['failed']} failed)."
+        )
 
-        output = BuildAgent().run(repo_url, azure_config)
-        log_session(session_id, "build", output)
-        agent_outputs["build"] = output
+    if "deploy" in agent_outputs:
+        st.success("✅ Pipeline completed successfully!")
+        st.balloons()
 
-        if output.get("status") == "error" and "logs" in output:
-            failure_output = BuildFailureAnalyzerAgent().run(
-                build_logs=output["logs"],
-                repo_url=repo_url
-            )
-            log_session(session_id, "build_failure_analyzer", failure_output)
-            agent_outputs["build_failure_analyzer"] = failure_output
-
-        if all([
-            agent_outputs.get("code_review", {}).get("status") == "success",
-            agent_outputs.get("test_writer", {}).get("status") == "success",
-            agent_outputs.get("regression_check", {}).get("status") == "success",
-            agent_outputs.get("build", {}).get("status") == "success"
-        ]):
-            image_url = agent_outputs["build"].get("image_url")
-            if image_url:
-                deploy_output = DeployAgent().run(image_url, azure_config)
-            else:
-                deploy_output = {
-                    "status": "error",
-                    "reason": "Missing image_url from BuildAgent output",
-                    "critical": True,
-                    "skippable": False
-                }
-            log_session(session_id, "deploy", deploy_output)
-            agent_outputs["deploy"] = deploy_output
-
-            monitor_output = MonitorAgent().run(azure_config)
-            rollback_output = RollbackAgent().run(azure_config)
-            sre_output = SREAgent().run(repo_url, azure_config)
-
-            log_session(session_id, "monitor", monitor_output)
-            log_session(session_id, "rollback", rollback_output)
-            log_session(session_id, "sre", sre_output)
-
-            agent_outputs["monitor"] = monitor_output
-            agent_outputs["rollback"] = rollback_output
-            agent_outputs["sre"] = sre_output
-            st.success("✅ Pipeline completed successfully!")
-            st.balloons()
+    with st.expander(f"⏱️ Stage Timeline — {result.wall_time:.1f}s wall time", expanded=False):
+        st.dataframe(result.timeline(), use_container_width=True)
 
 # === Output Viewer ===
 def render_output_block(title, agent_key):
@@ -150,3 +292,12 @@ render_output_block("🚀 Deployer", "deploy")
 render_output_block("📈 Monitor", "monitor")
 render_output_block("↩️ Rollback", "rollback")
 render_output_block("🛡️ SRE Audit", "sre")
+
+# === Storage Usage ===
+with st.expander("📊 Storage usage (this page)", expanded=False):
+    usage = get_query_metrics().summary("run_pipeline")
+    if usage:
+        st.caption(f"{sum(u['request_charge'] for u in usage):.1f} RU across {sum(u['calls'] for u in usage)} call(s)")
+        st.dataframe(usage, use_container_width=True)
+    else:
+        st.info("No storage calls on this page run.")
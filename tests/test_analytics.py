@@ -0,0 +1,62 @@
+import datetime
+from unittest import mock
+import pytest
+from utils.analytics import RunAnalytics, export_history_parquet
+
+pytest.importorskip("duckdb")
+
+
+def _row(session_id, agent, status, timestamp, mode="production"):
+    return {"session_id": session_id, "agent": agent, "timestamp": timestamp, "status": status,
+            "mode": mode, "repo": "https://github.com/a/b", "issues_found": "N/A"}
+
+
+ROWS = [
+    _row("s3", "deploy", "error", "2025-06-23T09:00:00"),
+    _row("s3", "build", "success", "2025-06-23T08:59:00"),
+    _row("s2", "build", "success", "2025-06-22T12:00:00Z", mode="simulation"),
+    _row("s1", "build", "error", "2025-06-21T10:00:00"),
+]
+
+
+def _pages(rows, page_size=2):
+    def fetch(size, token, since=None):
+        start = int(token or 0)
+        visible = [r for r in rows if not since or r["timestamp"] >= since]
+        end = start + page_size
+        return visible[start:end], str(end) if end < len(visible) else None
+    return fetch
+
+
+@mock.patch("utils.analytics.fetch_sessions_page")
+def test_export_partitions_by_day_and_agent_incrementally(mock_fetch, tmp_path):
+    mock_fetch.side_effect = _pages(ROWS)
+    assert export_history_parquet(str(tmp_path)) == 4
+    assert (tmp_path / "day=2025-06-23" / "agent=deploy").is_dir()
+
+    # Second export only picks up rows newer than the watermark
+    mock_fetch.side_effect = _pages([_row("s4", "build", "success", "2025-06-24T10:00:00")] + ROWS)
+    assert export_history_parquet(str(tmp_path)) == 1
+    assert RunAnalytics(str(tmp_path)).kpis()["total_runs"] == 4
+
+
+@mock.patch("utils.analytics.fetch_sessions_page")
+def test_kpis_timeseries_and_agent_rates(mock_fetch, tmp_path):
+    mock_fetch.side_effect = _pages(ROWS)
+    export_history_parquet(str(tmp_path))
+    analytics = RunAnalytics(str(tmp_path))
+
+    assert analytics.has_data()
+    assert analytics.kpis() == {"total_runs": 3, "success_rate": pytest.approx(1 / 3), "production_runs": 2}
+    assert analytics.kpis(since=datetime.date(2025, 6, 22), mode="production")["total_runs"] == 1
+
+    series = analytics.status_timeseries()
+    assert [d.isoformat()[:10] for d in series["day"]] == ["2025-06-21", "2025-06-22", "2025-06-23"]
+    assert list(series["success_rate"]) == [0.0, 1.0, 0.5]
+
+    rates = analytics.agent_success_rates(until=datetime.date(2025, 6, 22))
+    assert rates.to_dict("records") == [{"agent": "build", "executions": 2, "success_rate": 0.5}]
+
+
+def test_no_data(tmp_path):
+    assert not RunAnalytics(str(tmp_path)).has_data()
@@ -0,0 +1,241 @@
+import threading
+import pytest
+from unittest import mock
+from azure.cosmos import exceptions
+import utils.azure_cosmos as azure_cosmos
+from utils.azure_cosmos import (
+    SessionLogWriter, build_history_query, fetch_agent_history, fetch_recent_history, get_history_version, fetch_sessions_page, flush_session_logs,
+    get_database_and_container, get_query_metrics, log_session, query_scope, sync_session_summaries
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setenv("AZURE_COSMOS_ENDPOINT", "https://example.documents.azure.com:443/")
+    monkeypatch.setenv("AZURE_COSMOS_KEY", "key")
+    monkeypatch.setattr(azure_cosmos, "_writer", None)
+    azure_cosmos.reset_cosmos_cache()
+    yield
+    azure_cosmos.reset_cosmos_cache()
+
+
+def _container(mock_client_cls):
+    return mock_client_cls.return_value.create_database_if_not_exists.return_value.create_container_if_not_exists.return_value
+
+
+def _doc(session_id, agent, status="success"):
+    return {"id": f"{session_id}_{agent}", "session_id": session_id, "agent": agent, "data": {"status": status}}
+
+
+@mock.patch("utils.azure_cosmos.is_simulation_mode", return_value=False)
+@mock.patch("utils.azure_cosmos.CosmosClient")
+def test_client_and_container_provisioned_once(mock_client_cls, mock_sim):
+    container = _container(mock_client_cls)
+    container.query_items.return_value = []
+
+    log_session("s1", "build", {"status": "success"})
+    log_session("s1", "deploy", {"status": "success"})
+    stats = flush_session_logs()
+    fetch_agent_history("build")
+
+    assert mock_client_cls.call_count == 1
+    assert mock_client_cls.return_value.create_database_if_not_exists.call_count == 1
+    assert stats["written"] == 2
+    assert sum(len(c.kwargs["batch_operations"]) for c in container.execute_item_batch.call_args_list) == 2
+    container.upsert_item.assert_not_called()
+
+
+@mock.patch("utils.azure_cosmos.CosmosClient")
+def test_documents_batched_per_session_and_coalesced(mock_client_cls):
+    container = _container(mock_client_cls)
+    writer = SessionLogWriter()
+
+    writer._write([_doc("s1", "build", "error"), _doc("s2", "build"), _doc("s1", "deploy"), _doc("s1", "build")])
+
+    batches = {c.kwargs["partition_key"]: c.kwargs["batch_operations"] for c in container.execute_item_batch.call_args_list}
+    assert set(batches) == {"s1", "s2"}
+    assert [op[1][0]["agent"] for op in batches["s1"]] == ["build", "deploy"]
+    assert batches["s1"][0][1][0]["data"]["status"] == "success"
+    assert writer.written == 3
+
+
+@mock.patch("utils.azure_cosmos.CosmosClient")
+def test_missing_container_triggers_reprovisioning(mock_client_cls):
+    container = _container(mock_client_cls)
+    container.execute_item_batch.side_effect = exceptions.CosmosResourceNotFoundError(message="gone")
+    writer = SessionLogWriter()
+
+    writer._write([_doc("s1", "build")])
+
+    # The batch failed, the cache was reset and the document was retried on its own
+    assert mock_client_cls.call_count == 2
+    container.upsert_item.assert_called_once()
+    assert writer.written == 1 and writer.failed == 0
+
+
+def test_full_queue_drops_and_counts():
+    writer = SessionLogWriter(max_queue=1)
+    with mock.patch.object(writer, "_ensure_started"):
+        assert writer.submit(_doc("s1", "build"))
+        assert not writer.submit(_doc("s1", "deploy"))
+    assert writer.stats()["dropped"] == 1
+
+
+def test_history_query_projects_and_filters():
+    query, parameters = build_history_query(mode="production", agent="build", since="2025-06-01")
+
+    assert query.startswith("SELECT c.session_id, c.agent, c.timestamp, c.data.status AS status")
+    assert "SELECT *" not in query
+    assert "WHERE c.data.input.mode = @mode AND c.agent = @agent AND c.timestamp >= @since" in query
+    assert parameters == [
+        {"name": "@mode", "value": "production"},
+        {"name": "@agent", "value": "build"},
+        {"name": "@since", "value": "2025-06-01"},
+    ]
+
+
+@mock.patch("utils.azure_cosmos.is_simulation_mode", return_value=False)
+@mock.patch("utils.azure_cosmos.CosmosClient")
+def test_fetch_sessions_page_follows_continuation(mock_client_cls, mock_sim):
+    container = _container(mock_client_cls)
+    pager = container.query_items.return_value.by_page.return_value
+    pager.__iter__.return_value = iter([
+        [{"session_id": "s1", "agent": "build", "timestamp": "t", "status": "success"}],
+        [{"session_id": "s0", "agent": "build", "timestamp": "t", "status": "success"}],
+    ])
+    pager.continuation_token = "next-token"
+
+    rows, token = fetch_sessions_page(page_size=25, continuation="token-1", status="success")
+
+    assert token == "next-token"
+    assert len(rows) == 1
+    assert rows[0]["status"] == "success" and rows[0]["repo"] == "N/A"
+    container.query_items.return_value.by_page.assert_called_once_with("token-1")
+    assert container.query_items.call_args.kwargs["max_item_count"] == 25
+
+
+@mock.patch("utils.azure_cosmos.CosmosClient")
+def test_indexing_policy_replaced_only_when_outdated(mock_client_cls):
+    database = mock_client_cls.return_value.create_database_if_not_exists.return_value
+    container = database.create_container_if_not_exists.return_value
+    container.read.return_value = {"indexingPolicy": {"excludedPaths": [{"path": "/\"_etag\"/?"}]}}
+
+    get_database_and_container()
+    assert database.create_container_if_not_exists.call_args.kwargs["indexing_policy"] == azure_cosmos.INDEXING_POLICY
+    database.replace_container.assert_called_once()
+
+    azure_cosmos.reset_cosmos_cache()
+    database.replace_container.reset_mock()
+    container.read.return_value = {"indexingPolicy": azure_cosmos.INDEXING_POLICY}
+    get_database_and_container()
+    database.replace_container.assert_not_called()
+
+
+@mock.patch("utils.azure_cosmos.is_simulation_mode", return_value=False)
+@mock.patch("utils.azure_cosmos.CosmosClient")
+def test_change_feed_folds_into_session_summaries(mock_client_cls, mock_sim):
+    container = _container(mock_client_cls)
+    container.read.return_value = {"indexingPolicy": azure_cosmos.INDEXING_POLICY}
+    container.read_item.side_effect = exceptions.CosmosResourceNotFoundError(message="none")
+    documents = [
+        {"session_id": "s1", "agent": "build", "timestamp": "2025-06-22T10:00:00",
+         "data": {"status": "success", "input": {"repo_url": "https://github.com/a/b", "mode": "production"}}},
+        {"session_id": "s1", "agent": "deploy", "timestamp": "2025-06-22T10:05:00", "data": {"status": "error"}},
+    ]
+
+    def change_feed(response_hook, **kwargs):
+        # The SDK reports the connection's previous headers when the feed is created
+        response_hook({"etag": "stale-lease-etag"}, None)
+
+        def pages():
+            response_hook({"etag": "cont-1", "x-ms-request-charge": "3"}, documents)
+            yield from documents
+        return pages()
+
+    container.query_items_change_feed.side_effect = change_feed
+    # Shared connection headers are overwritten by other calls and must not be used
+    container.client_connection.last_response_headers = {"etag": "someone-elses"}
+
+    assert sync_session_summaries() == 1
+
+    assert container.query_items_change_feed.call_args.kwargs["start_time"] == "Beginning"
+    summary, lease = [c.args[0] for c in container.upsert_item.call_args_list]
+    assert summary["bucket"] == "2025-06"
+    assert summary["agents"] == {"build": "success", "deploy": "error"}
+    assert summary["status"] == "error" and summary["repo"] == "https://github.com/a/b"
+    assert summary["started_at"] == "2025-06-22T10:00:00" and summary["updated_at"] == "2025-06-22T10:05:00"
+    assert lease["continuation"] == "cont-1"
+
+
+@mock.patch("utils.azure_cosmos.is_simulation_mode", return_value=False)
+@mock.patch("utils.azure_cosmos._sync_session_summaries")
+def test_background_summary_sync_is_throttled(mock_sync, mock_sim, monkeypatch):
+    monkeypatch.setattr(azure_cosmos, "_summary_sync", {"thread": None, "started": None})
+
+    assert azure_cosmos.sync_session_summaries_in_background(min_interval=60)
+    azure_cosmos._summary_sync["thread"].join()
+    assert not azure_cosmos.sync_session_summaries_in_background(min_interval=60)
+    assert mock_sync.call_count == 1
+
+    assert azure_cosmos.sync_session_summaries_in_background(min_interval=0)
+    azure_cosmos._summary_sync["thread"].join()
+    assert mock_sync.call_count == 2
+
+
+@mock.patch("utils.azure_cosmos.is_simulation_mode", return_value=False)
+@mock.patch("utils.azure_cosmos.CosmosClient")
+def test_history_query_is_parameterized_and_metered(mock_client_cls, mock_sim):
+    container = _container(mock_client_cls)
+    container.read.return_value = {"indexingPolicy": azure_cosmos.INDEXING_POLICY}
+
+    def query_items(query, parameters, response_hook, **kwargs):
+        response_hook({"x-ms-request-charge": "2.5"}, None)
+        response_hook({"x-ms-request-charge": "1.5"}, None)
+        pager = mock.MagicMock()
+        pager.by_page.return_value.__iter__.return_value = iter([[{"session_id": "s1", "timestamp": "t", "data": {}}]])
+        return pager
+
+    container.query_items.side_effect = query_items
+    get_query_metrics().reset()
+
+    with query_scope("history_page"):
+        fetch_agent_history("x' OR 1=1 --", limit=3)
+
+    query = container.query_items.call_args.kwargs["query"]
+    assert "x' OR" not in query and "@agent" in query and "@limit" in query
+    assert container.query_items.call_args.kwargs["parameters"][0]["value"] == "x' OR 1=1 --"
+    [usage] = get_query_metrics().summary("history_page")
+    assert usage["operation"] == "fetch_agent_history"
+    assert usage["calls"] == 1 and usage["request_charge"] == 4.0 and usage["items"] == 1
+    assert get_query_metrics().summary("another_page") == []
+
+
+@mock.patch("utils.azure_cosmos.is_simulation_mode", return_value=False)
+@mock.patch("utils.azure_cosmos.fetch_agent_history")
+@mock.patch("utils.azure_cosmos.CosmosClient")
+def test_recent_history_fetches_all_agents_concurrently(mock_client_cls, mock_fetch, mock_sim):
+    barrier = threading.Barrier(3, timeout=5)
+
+    def fetch(agent, limit):
+        barrier.wait()  # only passes if all three queries are in flight together
+        return [{"agent": agent, "limit": limit}]
+
+    mock_fetch.side_effect = fetch
+    history = fetch_recent_history(["build", "deploy", "sre"], limit=3)
+
+    assert list(history) == ["build", "deploy", "sre"]
+    assert history["sre"] == [{"agent": "sre", "limit": 3}]
+    assert mock_client_cls.call_count == 1
+
+
+@mock.patch("utils.azure_cosmos.CosmosClient")
+def test_history_version_changes_when_logs_are_written(mock_client_cls):
+    before = get_history_version()
+    SessionLogWriter()._write([_doc("s1", "build")])
+    assert get_history_version() > before
+
+
+def test_missing_credentials_raise(monkeypatch):
+    monkeypatch.delenv("AZURE_COSMOS_KEY")
+    with pytest.raises(ValueError):
+        get_database_and_container()
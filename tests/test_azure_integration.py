@@ -1,4 +1,5 @@
 import pytest
+from contextlib import contextmanager
 from unittest import mock
 from utils.azure import build_container, deploy_to_container_apps
 from utils.azure_openai import azure_openai_prompt
@@ -35,4 +36,40 @@ def test_cosmos_logging_simulation(mock_sim):
     
     history = fetch_agent_history("test-agent")
     assert len(history) > 0
-    assert "mock-session" in history[0]["session_id"]
\ No newline at end of file
+    assert "mock-session" in history[0]["session_id"]
+
+
+def _checkout(path):
+    @contextmanager
+    def checkout(repo_url, repo_cache=None):
+        yield path
+    return checkout
+
+
+@mock.patch("utils.azure.is_simulation_mode", return_value=False)
+@mock.patch("utils.azure.get_build_backend")
+def test_azure_build_reuses_image_for_unchanged_context(mock_backend, mock_sim, tmp_path):
+    (tmp_path / "Dockerfile").write_text("FROM python:3.11\nCOPY . .\n")
+    backend = mock_backend.return_value
+    backend.image_exists.return_value = True
+    azure_config = {"container_registry": "testregistry", "resource_group": "test-rg"}
+    with mock.patch("utils.azure.checkout_repo", _checkout(str(tmp_path))):
+        result = build_container("https://github.com/test/Repo", azure_config)
+
+    assert result.startswith("testregistry.azurecr.io/repo:src-")
+    backend.build.assert_not_called()
+
+
+@mock.patch("utils.azure.is_simulation_mode", return_value=False)
+@mock.patch("utils.azure.get_build_backend")
+def test_azure_build_pushes_content_tag(mock_backend, mock_sim, tmp_path):
+    (tmp_path / "Dockerfile").write_text("FROM python:3.11\nCOPY . .\n")
+    backend = mock_backend.return_value
+    backend.image_exists.return_value = False
+    azure_config = {"container_registry": "testregistry", "resource_group": "test-rg"}
+    with mock.patch("utils.azure.checkout_repo", _checkout(str(tmp_path))):
+        result = build_container("https://github.com/test/repo", azure_config)
+
+    tag = result.split(":")[-1]
+    assert tag.startswith("src-")
+    backend.build.assert_called_once_with(str(tmp_path), "testregistry", "repo", tag, azure_config, log=None)
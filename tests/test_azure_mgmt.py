@@ -0,0 +1,163 @@
+import datetime
+import pytest
+from types import SimpleNamespace
+from unittest import mock
+from utils import azure_mgmt
+
+
+@pytest.fixture(autouse=True)
+def _reset_clients():
+    azure_mgmt.reset_mgmt_clients()
+    yield
+    azure_mgmt.reset_mgmt_clients()
+
+
+def test_clients_are_shared_per_subscription():
+    with mock.patch("utils.azure_mgmt.AzureManagementClients") as factory:
+        first = azure_mgmt.get_mgmt_clients({"subscription_id": "sub-1"})
+        again = azure_mgmt.get_mgmt_clients({"subscription_id": "sub-1"})
+        other = azure_mgmt.get_mgmt_clients({"subscription_id": "sub-2"})
+    assert first is again
+    assert factory.call_count == 2
+    assert other is not None
+
+
+def test_missing_subscription_fails_fast():
+    with pytest.raises(ValueError):
+        azure_mgmt.AzureManagementClients(None, credential=object())
+
+
+def test_revisions_sorted_newest_first():
+    def revision(name, day):
+        return SimpleNamespace(name=name, created_time=datetime.datetime(2025, 6, day), active=day == 3)
+
+    clients = mock.Mock()
+    clients.container_apps.container_apps_revisions.list_revisions.return_value = [
+        revision("app--rev1", 1), revision("app--rev3", 3), revision("app--rev2", 2)
+    ]
+    with mock.patch("utils.azure_mgmt.get_mgmt_clients", return_value=clients):
+        revisions = azure_mgmt.list_container_app_revisions("app", "rg")
+    assert [r["name"] for r in revisions] == ["app--rev3", "app--rev2", "app--rev1"]
+    assert revisions[0]["active"] is True
+
+
+def test_container_app_summary():
+    app = SimpleNamespace(
+        provisioning_state="Succeeded",
+        configuration=SimpleNamespace(ingress=SimpleNamespace(fqdn="app.example.io")),
+        template=SimpleNamespace(scale=SimpleNamespace(min_replicas=0, max_replicas=3)),
+        latest_revision_name="app--rev2",
+        latest_ready_revision_name="app--rev2",
+    )
+    clients = mock.Mock()
+    clients.container_apps.container_apps.get.return_value = app
+    with mock.patch("utils.azure_mgmt.get_mgmt_clients", return_value=clients):
+        info = azure_mgmt.get_container_app("app", "rg")
+    assert info["provisioningState"] == "Succeeded"
+    assert info["fqdn"] == "app.example.io"
+    assert info["replicas"] == {"minReplicas": 0, "maxReplicas": 3}
+
+
+def _app(*containers):
+    return SimpleNamespace(template=SimpleNamespace(containers=list(containers)))
+
+
+def _deploy_clients():
+    clients = mock.Mock()
+    clients.environments = {}
+    apps = clients.container_apps.container_apps
+    apps.get.return_value = _app(
+        SimpleNamespace(name="web", image="r.azurecr.io/app:v1", env=[{"name": "PORT", "value": "8501"}]),
+        SimpleNamespace(name="otel-sidecar", image="otel/collector:1", env=[]),
+    )
+    apps.begin_update.return_value.result.return_value = SimpleNamespace(
+        configuration=SimpleNamespace(ingress=SimpleNamespace(fqdn="app.example.io")), template=None
+    )
+    apps.begin_create_or_update.return_value.result.return_value = SimpleNamespace(
+        configuration=SimpleNamespace(ingress=SimpleNamespace(fqdn="new.example.io")), template=None
+    )
+    clients.container_apps.managed_environments.get.return_value = SimpleNamespace(id="/env/app-env")
+    return clients
+
+
+@mock.patch("utils.azure_mgmt.app_models")
+def test_deploy_existing_app_patches_only_the_image(mock_models):
+    clients = _deploy_clients()
+    with mock.patch("utils.azure_mgmt.get_mgmt_clients", return_value=clients):
+        result = azure_mgmt.deploy_container_app("app", "rg", "eastus", "app-env", "r.azurecr.io/app:v2")
+
+    assert result == {"action": "updated", "fqdn": "app.example.io"}
+    apps = clients.container_apps.container_apps
+    apps.get.assert_called_once_with("rg", "app")
+    apps.begin_update.assert_called_once()
+    apps.begin_create_or_update.assert_not_called()
+    clients.container_apps.managed_environments.get.assert_not_called()
+    mock_models.Container.assert_not_called()
+
+    # The whole container list goes back, with only the primary container's image changed
+    containers = mock_models.Template.call_args.kwargs["containers"]
+    assert [(c.name, c.image) for c in containers] == [
+        ("web", "r.azurecr.io/app:v2"), ("otel-sidecar", "otel/collector:1")
+    ]
+    assert containers[0].env == [{"name": "PORT", "value": "8501"}]
+
+
+@mock.patch("utils.azure_mgmt.app_models")
+def test_deploy_keeps_container_changes_made_between_deploys(mock_models):
+    clients = _deploy_clients()
+    apps = clients.container_apps.container_apps
+    apps.get.side_effect = [
+        _app(SimpleNamespace(name="web", image="r.azurecr.io/app:v1", env=[])),
+        # Someone added an env var and a sidecar in the portal after the first deploy
+        _app(
+            SimpleNamespace(name="web", image="r.azurecr.io/app:v2", env=[{"name": "DEBUG", "value": "1"}]),
+            SimpleNamespace(name="otel-sidecar", image="otel/collector:1", env=[]),
+        ),
+    ]
+    with mock.patch("utils.azure_mgmt.get_mgmt_clients", return_value=clients):
+        azure_mgmt.deploy_container_app("app", "rg", "eastus", "app-env", "r.azurecr.io/app:v2")
+        azure_mgmt.deploy_container_app("app", "rg", "eastus", "app-env", "r.azurecr.io/app:v3")
+
+    assert apps.get.call_count == 2
+    containers = mock_models.Template.call_args.kwargs["containers"]
+    assert [(c.name, c.image) for c in containers] == [
+        ("web", "r.azurecr.io/app:v3"), ("otel-sidecar", "otel/collector:1")
+    ]
+    assert containers[0].env == [{"name": "DEBUG", "value": "1"}]
+
+
+@mock.patch("utils.azure_mgmt.app_models")
+def test_deploy_missing_app_creates_it_and_caches_environment(mock_models):
+    clients = _deploy_clients()
+    clients.container_apps.container_apps.get.side_effect = azure_mgmt.ResourceNotFoundError("gone")
+    with mock.patch("utils.azure_mgmt.get_mgmt_clients", return_value=clients):
+        first = azure_mgmt.deploy_container_app("app", "rg", "eastus", "app-env", "r.azurecr.io/app:v1")
+        second = azure_mgmt.deploy_container_app("app", "rg", "eastus", "app-env", "r.azurecr.io/app:v1")
+
+    assert first == second == {"action": "created", "fqdn": "new.example.io"}
+    assert clients.container_apps.container_apps.begin_create_or_update.call_count == 2
+    clients.container_apps.managed_environments.get.assert_called_once_with("rg", "app-env")
+    assert clients.environments == {("rg", "app-env"): "/env/app-env"}
+
+
+def test_run_log_tail_emits_complete_lines_across_chunks():
+    responses = [
+        SimpleNamespace(status_code=404, content=b""),
+        SimpleNamespace(status_code=206, content="Step 1/2 : FROM x\nStep 2/2 : RU".encode()),
+        SimpleNamespace(status_code=206, content="N make ✓\nRun ID: ca1 failed".encode()),
+        SimpleNamespace(status_code=416, content=b""),
+    ]
+    for r in responses:
+        r.raise_for_status = lambda: None
+    session = mock.Mock()
+    session.get.side_effect = responses
+    lines = []
+    tail = azure_mgmt._RunLogTail(session, "https://blob/log", lines.append)
+    tail.pull()
+    tail.pull()
+    tail.pull()
+    tail.finish()
+
+    assert lines == ["Step 1/2 : FROM x", "Step 2/2 : RUN make ✓", "Run ID: ca1 failed"]
+    offsets = [c.kwargs["headers"]["Range"] for c in session.get.call_args_list]
+    assert offsets[1] == "bytes=0-" and offsets[3] == f"bytes={len(responses[1].content) + len(responses[2].content)}-"
@@ -0,0 +1,124 @@
+import pytest
+import requests
+from unittest import mock
+from utils.azure_openai import AzureOpenAIClient, azure_openai_prompt
+
+
+def _response(status, body=None, headers=None):
+    response = mock.Mock(status_code=status, headers=headers or {})
+    response.json.return_value = body or {}
+    if status >= 400:
+        response.raise_for_status.side_effect = requests.HTTPError(f"{status} error")
+    return response
+
+
+def _client(**kwargs):
+    return AzureOpenAIClient(api_key="key", endpoint="https://example.openai.azure.com/", **kwargs)
+
+
+OK_BODY = {"choices": [{"message": {"content": " reviewed "}}]}
+
+
+@mock.patch("utils.azure_openai.time.sleep")
+def test_retries_429_honoring_retry_after(mock_sleep):
+    client = _client()
+    with mock.patch.object(client.session, "post", side_effect=[
+        _response(429, headers={"Retry-After": "3"}),
+        _response(503, headers={"retry-after-ms": "250"}),
+        _response(200, OK_BODY)
+    ]) as post:
+        assert client.complete([{"text": "hi"}]) == "reviewed"
+
+    assert post.call_count == 3
+    assert [c.args[0] for c in mock_sleep.call_args_list] == [3.0, 0.25]
+    assert post.call_args.kwargs["timeout"] == client.timeout
+
+
+@mock.patch("utils.azure_openai.time.sleep")
+def test_gives_up_after_max_retries(mock_sleep):
+    client = _client(max_retries=2)
+    with mock.patch.object(client.session, "post", return_value=_response(429)) as post:
+        with pytest.raises(requests.HTTPError):
+            client.complete(["hi"])
+    assert post.call_count == 3
+
+
+def test_client_errors_are_not_retried():
+    client = _client()
+    with mock.patch.object(client.session, "post", return_value=_response(400)) as post:
+        with pytest.raises(requests.HTTPError):
+            client.complete(["hi"])
+    assert post.call_count == 1
+
+
+def test_url_and_auth_header():
+    client = _client(deployment_name="gpt-4o")
+    assert client.url() == "https://example.openai.azure.com/openai/deployments/gpt-4o/chat/completions?api-version=2024-02-15-preview"
+    assert client.session.headers["api-key"] == "key"
+
+
+@mock.patch("utils.azure_openai.is_simulation_mode", return_value=False)
+@mock.patch("utils.azure_openai.get_openai_client")
+def test_prompt_uses_shared_client(mock_get_client, mock_sim):
+    mock_get_client.return_value.complete.return_value = "ok"
+    assert azure_openai_prompt([{"text": "hi"}]) == "ok"
+    mock_get_client.return_value.complete.side_effect = RuntimeError("down")
+    assert "ERROR calling Azure OpenAI" in azure_openai_prompt([{"text": "hi"}])
+
+
+def test_stream_parses_sse_chunks_and_caches_result():
+    client = _client()
+    response = _response(200)
+    response.iter_lines.return_value = iter([
+        'data: {"choices": [], "prompt_filter_results": []}',
+        "",
+        'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+        'data: {"choices": [{"delta": {"content": "Looks "}}]}',
+        'data: {"choices": [{"delta": {"content": "good"}}]}',
+        "data: [DONE]",
+    ])
+    with mock.patch.object(client.session, "post", return_value=response) as post:
+        assert list(client.stream(["review"])) == ["Looks ", "good"]
+        assert post.call_args.kwargs["stream"] is True
+        assert post.call_args.kwargs["json"]["stream"] is True
+
+        # Second call is a cache hit delivered as one chunk
+        assert list(client.stream(["review"])) == ["Looks good"]
+        assert post.call_count == 1
+    response.close.assert_called_once()
+
+
+@mock.patch("utils.azure_openai.is_simulation_mode", return_value=False)
+@mock.patch("utils.azure_openai.get_openai_client")
+def test_prompt_streams_to_on_token(mock_get_client, mock_sim):
+    mock_get_client.return_value.stream.return_value = iter(["a", "b", "c "])
+    tokens = []
+    assert azure_openai_prompt(["hi"], on_token=tokens.append) == "abc"
+    assert tokens == ["a", "b", "c "]
+
+
+def test_stream_holds_concurrency_slot_until_body_is_consumed():
+    client = _client(max_concurrency=1)
+    response = _response(200)
+    response.iter_lines.return_value = iter(['data: {"choices": [{"delta": {"content": "a"}}]}', "data: [DONE]"])
+    with mock.patch.object(client.session, "post", return_value=response):
+        chunks = client.stream(["review"], use_cache=False)
+        assert next(chunks) == "a"
+        assert not client._semaphore.acquire(blocking=False)
+        assert list(chunks) == []
+    assert client._semaphore.acquire(blocking=False)
+
+
+@mock.patch("utils.azure_openai.is_simulation_mode", return_value=False)
+@mock.patch("utils.azure_openai.get_openai_client")
+def test_prompt_reports_mid_stream_failure_as_error(mock_get_client, mock_sim):
+    def broken_stream(*args, **kwargs):
+        yield "partial "
+        raise requests.ConnectionError("reset")
+
+    mock_get_client.return_value.stream.side_effect = broken_stream
+    tokens = []
+    result = azure_openai_prompt(["hi"], on_token=tokens.append)
+    assert result.startswith("[ERROR calling Azure OpenAI]")
+    assert "partial" not in result
+    assert tokens[0] == "partial "
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+from utils.azure_openai_async import RateLimiter, azure_openai_prompt_many, estimate_tokens
+
+
+def _fake_client(delays):
+    client = mock.Mock(deployment_name="gpt-4", max_concurrency=2)
+    client.cached.return_value = None
+    state = {"active": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def _complete(messages, **kwargs):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(delays[messages[0]["text"]])
+        with lock:
+            state["active"] -= 1
+        return f"answer {messages[0]['text']}"
+
+    client.complete.side_effect = _complete
+    return client, state
+
+
+@mock.patch("utils.azure_openai_async.is_simulation_mode", return_value=False)
+@mock.patch("utils.azure_openai_async.get_rate_limiter", return_value=RateLimiter())
+@mock.patch("utils.azure_openai_async.get_openai_client")
+def test_results_in_input_order_under_concurrency_cap(mock_get_client, mock_limiter, mock_sim):
+    client, state = _fake_client({"a": 0.15, "b": 0.0, "c": 0.05, "d": 0.0})
+    mock_get_client.return_value = client
+
+    results = azure_openai_prompt_many([[{"text": t}] for t in "abcd"])
+
+    assert results == ["answer a", "answer b", "answer c", "answer d"]
+    assert state["peak"] <= 2
+
+
+@mock.patch("utils.azure_openai_async.is_simulation_mode", return_value=False)
+@mock.patch("utils.azure_openai_async.get_rate_limiter", return_value=RateLimiter())
+@mock.patch("utils.azure_openai_async.get_openai_client")
+def test_failed_prompt_does_not_sink_batch(mock_get_client, mock_limiter, mock_sim):
+    client = mock.Mock(deployment_name="gpt-4", max_concurrency=4)
+    client.cached.side_effect = lambda messages, **kw: "cached" if messages == ["hit"] else None
+    client.complete.side_effect = RuntimeError("throttled")
+    mock_get_client.return_value = client
+
+    results = azure_openai_prompt_many([["hit"], ["miss"]])
+
+    assert results[0] == "cached"
+    assert "throttled" in results[1]
+
+
+@mock.patch("utils.azure_openai_async.is_simulation_mode", return_value=False)
+@mock.patch("utils.azure_openai_async.get_rate_limiter", return_value=RateLimiter())
+@mock.patch("utils.azure_openai_async.get_openai_client")
+def test_blocking_wrapper_works_inside_a_running_loop(mock_get_client, mock_limiter, mock_sim):
+    client, _ = _fake_client({"a": 0.0, "b": 0.0})
+    mock_get_client.return_value = client
+
+    async def _caller():
+        return azure_openai_prompt_many([[{"text": "a"}], [{"text": "b"}]])
+
+    assert asyncio.run(_caller()) == ["answer a", "answer b"]
+
+
+def test_rate_limiter_waits_once_budget_is_spent():
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=6000)
+    assert limiter.reserve(100) == 0.0
+    # Token bucket: 6000 - 100 - 6000 => 100 tokens in debt at 100 tokens/s
+    assert abs(limiter.reserve(6000) - 1.0) < 0.05
+    unlimited = RateLimiter()
+    assert all(unlimited.reserve(10 ** 6) == 0.0 for _ in range(10))
+
+
+def test_estimate_tokens_counts_prompt_and_completion():
+    assert estimate_tokens([{"text": "x" * 400}], max_tokens=100) == 200
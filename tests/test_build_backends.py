@@ -0,0 +1,120 @@
+import pytest
+from unittest import mock
+from utils import build_backends
+from utils.build_backends import AcrBuildBackend, BuildBackend, BuildKitBuildBackend, get_build_backend
+
+
+@pytest.fixture(autouse=True)
+def _reset_backend():
+    build_backends._backend = None
+    yield
+    build_backends._backend = None
+
+
+def test_backend_selection(monkeypatch):
+    monkeypatch.setenv("AGENTOPS_BUILD_BACKEND", "buildkit")
+    monkeypatch.setenv("AGENTOPS_BUILD_CACHE", "local")
+    backend = get_build_backend()
+    assert isinstance(backend, BuildKitBuildBackend) and backend.cache == "local"
+    assert get_build_backend() is backend
+
+    build_backends._backend = None
+    monkeypatch.setenv("AGENTOPS_BUILD_BACKEND", "kaniko")
+    with pytest.raises(ValueError):
+        get_build_backend()
+
+
+def test_backends_must_implement_build():
+    class Incomplete(BuildBackend):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_acr_backend_builds_remotely():
+    with mock.patch("utils.build_backends.azure_mgmt") as mgmt:
+        AcrBuildBackend().build("/ctx", "reg", "app", "src-1", {"resource_group": "rg"})
+    mgmt.acr_build.assert_called_once_with(
+        "reg", "rg", "/ctx", "app:src-1", dockerfile="Dockerfile", on_output=None,
+        azure_config={"resource_group": "rg"}
+    )
+
+
+def test_buildkit_command_uses_registry_cache():
+    command = BuildKitBuildBackend(platform="linux/amd64").command("/ctx", "reg", "app", "src-1")
+    assert command[:4] == ["docker", "buildx", "build", "--push"]
+    assert ["--tag", "reg.azurecr.io/app:src-1"] == command[command.index("--tag"):command.index("--tag") + 2]
+    assert "type=registry,ref=reg.azurecr.io/app:buildcache" in command
+    assert "type=registry,ref=reg.azurecr.io/app:buildcache,mode=max" in command
+    assert command[-1] == "/ctx"
+
+
+def test_buildkit_default_builder_supports_cache_export():
+    # The stock `docker` driver rejects --cache-to, so the default config must not build on it
+    command = BuildKitBuildBackend().command("/ctx", "reg", "app", "t")
+    assert command[command.index("--builder") + 1] == build_backends.DEFAULT_BUILDX_BUILDER
+    assert "--cache-to" in command
+
+    assert "--builder" not in BuildKitBuildBackend(cache="none").command("/ctx", "reg", "app", "t")
+    custom = BuildKitBuildBackend(builder="ci").command("/ctx", "reg", "app", "t")
+    assert custom[custom.index("--builder") + 1] == "ci"
+
+
+def test_buildkit_creates_default_builder_once_when_missing():
+    backend = BuildKitBuildBackend()
+    missing, created = mock.Mock(returncode=1), mock.Mock(returncode=0)
+    with mock.patch("utils.build_backends.subprocess.run", side_effect=[missing, created]) as run:
+        backend._ensure_builder()
+        backend._ensure_builder()
+    assert [c.args[0][:3] for c in run.call_args_list] == [
+        ["docker", "buildx", "inspect"], ["docker", "buildx", "create"]
+    ]
+    assert "docker-container" in run.call_args_list[1].args[0]
+
+    with mock.patch("utils.build_backends.subprocess.run") as run:
+        BuildKitBuildBackend(builder="ci")._ensure_builder()
+        BuildKitBuildBackend(cache="none")._ensure_builder()
+    run.assert_not_called()
+
+
+def test_buildkit_local_cache_and_validation(tmp_path):
+    command = BuildKitBuildBackend(cache="local", cache_dir=str(tmp_path)).command("/ctx", "reg", "app", "t")
+    assert f"type=local,src={tmp_path}/reg/app" in command
+    assert not any("buildcache" in arg for arg in BuildKitBuildBackend(cache="none").command("/ctx", "reg", "app", "t"))
+    with pytest.raises(ValueError):
+        BuildKitBuildBackend(cache="s3")
+
+
+class _FakeProcess:
+    def __init__(self, lines, returncode):
+        self.stdout = iter(lines)
+        self.returncode = returncode
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+def test_buildkit_streams_output_logs_in_once_and_reports_failures():
+    backend = BuildKitBuildBackend()
+    log = mock.Mock()
+    processes = [
+        _FakeProcess(["#1 building\n", "#2 DONE\n"], 0),
+        _FakeProcess(["#3 RUN make\n", "ERROR: process did not complete successfully\n"], 1),
+    ]
+    with mock.patch("utils.build_backends.azure_mgmt") as mgmt, \
+            mock.patch("utils.build_backends.subprocess.run") as run, \
+            mock.patch("utils.build_backends.subprocess.Popen", side_effect=processes):
+        mgmt.acr_refresh_token.return_value = "token"
+        backend.build("/ctx", "reg", "app", "t1", {}, log=log)
+        with pytest.raises(RuntimeError, match="did not complete successfully"):
+            backend.build("/ctx", "reg", "app", "t2", {})
+
+    assert [c.args[0] for c in log.write.call_args_list] == ["#1 building\n", "#2 DONE\n"]
+    assert mgmt.acr_refresh_token.call_count == 1
+    login = run.call_args
+    assert login.args[0][:3] == ["docker", "login", "reg.azurecr.io"]
+    assert login.kwargs["input"] == "token"
@@ -0,0 +1,101 @@
+import os
+import tarfile
+from utils.build_context import DockerIgnore, context_hash, dockerfile_sources, image_tag, iter_context_files, pack_context
+
+
+def _write(root, files: dict):
+    for path, content in files.items():
+        full = root / path
+        full.parent.mkdir(parents=True, exist_ok=True)
+        full.write_text(content)
+
+
+def test_dockerignore_rules():
+    ignore = DockerIgnore(["# comment", "*.pyc", "build", "docs/**/*.md", "!docs/keep.md", "/secrets/"])
+    assert ignore.excluded("a.pyc")
+    assert not ignore.excluded("pkg/a.pyc")  # * does not cross directories
+    assert ignore.excluded("build/out.bin")
+    assert ignore.excluded("docs/guide.md") and ignore.excluded("docs/api/ref.md")
+    assert not ignore.excluded("docs/keep.md")
+    assert ignore.excluded("secrets/key.pem")
+    assert not ignore.excluded("src/app.py")
+
+
+def test_context_files_honor_dockerignore_and_skip_git(tmp_path):
+    _write(tmp_path, {
+        "Dockerfile": "FROM python:3.11\nCOPY . .\n", ".dockerignore": "*.log\nDockerfile\n",
+        "app.py": "print()", "debug.log": "x", ".git/HEAD": "ref",
+    })
+    assert list(iter_context_files(str(tmp_path))) == [".dockerignore", "Dockerfile", "app.py"]
+
+
+def test_dockerfile_sources():
+    text = (
+        "FROM python:3.11 AS base\n"
+        "COPY requirements.txt ./\n"
+        "COPY --chown=app:app [\"src\", \"lib/*.py\", \"/app/\"]\n"
+        "ADD https://example.com/x.tgz /tmp/\n"
+        "COPY --from=base /usr/lib /usr/lib\n"
+        "RUN pip install \\\n  -r requirements.txt\n"
+    )
+    assert dockerfile_sources(text) == ["requirements.txt", "src", "lib/*.py"]
+    assert dockerfile_sources("FROM x\nCOPY . /app\n") is None
+
+
+def test_hash_tracks_only_referenced_files(tmp_path):
+    _write(tmp_path, {
+        "Dockerfile": "FROM python:3.11\nCOPY app/ /app/\n",
+        "app/main.py": "print(1)", "README.md": "docs",
+    })
+    first = context_hash(str(tmp_path))
+
+    (tmp_path / "README.md").write_text("changed docs")
+    assert context_hash(str(tmp_path)) == first
+
+    (tmp_path / "app" / "main.py").write_text("print(2)")
+    assert context_hash(str(tmp_path)) != first
+    assert image_tag(str(tmp_path)).startswith("src-") and len(image_tag(str(tmp_path))) == 28
+
+
+def test_hash_covers_the_context_for_variable_sources(tmp_path):
+    _write(tmp_path, {
+        "Dockerfile": "FROM python:3.11\nARG APP=app\nCOPY ${APP} /app\n",
+        "app/main.py": "print(1)",
+    })
+    assert dockerfile_sources((tmp_path / "Dockerfile").read_text()) is None
+    first = context_hash(str(tmp_path))
+    (tmp_path / "app" / "main.py").write_text("print(2)")
+    assert context_hash(str(tmp_path)) != first
+
+
+def test_hash_covers_the_context_for_bind_mounts(tmp_path):
+    _write(tmp_path, {
+        "Dockerfile": "FROM golang:1.22\nRUN --mount=type=cache,target=/root/.cache \\\n"
+                      "    --mount=type=bind,target=/src go build -o /app /src\n",
+        "main.go": "package main",
+    })
+    assert dockerfile_sources((tmp_path / "Dockerfile").read_text()) is None
+    assert dockerfile_sources("FROM x\nRUN --mount=target=/src make\n") is None  # bind is the default
+    assert dockerfile_sources("FROM x\nRUN --mount=type=cache,target=/c make\n") == []
+    assert dockerfile_sources("FROM x\nRUN --mount=type=bind,from=base,target=/b make\n") == []
+    first = context_hash(str(tmp_path))
+    (tmp_path / "main.go").write_text("package main // changed")
+    assert context_hash(str(tmp_path)) != first
+
+
+def test_hash_is_independent_of_location(tmp_path):
+    files = {"Dockerfile": "FROM x\nCOPY . .\n", "a.py": "1", "pkg/b.py": "2"}
+    _write(tmp_path / "one", files)
+    _write(tmp_path / "two", files)
+    assert context_hash(str(tmp_path / "one")) == context_hash(str(tmp_path / "two"))
+
+
+def test_pack_context_matches_context_files(tmp_path):
+    _write(tmp_path, {"Dockerfile": "FROM x", ".dockerignore": "*.log", "a.py": "1", "x.log": "2", ".git/HEAD": "r"})
+    archive = pack_context(str(tmp_path))
+    try:
+        with tarfile.open(archive) as tar:
+            names = tar.getnames()
+    finally:
+        os.remove(archive)
+    assert names == [".dockerignore", "Dockerfile", "a.py"]
@@ -18,4 +18,12 @@ def test_production_mode(mock_prompt, mock_logger, mock_sim):
     result = agent.run("build log content")
     assert "llm_analysis" in result
     assert result["status"] == "success"
-    assert result["critical"] is False
\ No newline at end of file
+    assert result["critical"] is False
+
+@mock.patch("agents.build_failure_analyzer_agent.is_simulation_mode", return_value=True)
+@mock.patch("agents.build_failure_analyzer_agent.log_session")
+def test_analyze_returns_the_entry_without_logging(mock_logger, mock_sim):
+    result, entry = BuildFailureAnalyzerAgent().analyze("build log content", "https://github.com/a/b")
+    mock_logger.assert_not_called()
+    assert entry["output"] is result
+    assert entry["input"]["repo_url"] == "https://github.com/a/b"
@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from utils.build_logs import BuildLog, EarlyFailureAnalysis, prune_build_logs
+
+
+def test_build_log_ring_file_and_live_lines(tmp_path):
+    seen = []
+    with BuildLog("s1", log_dir=str(tmp_path), max_lines=3, on_line=seen.append) as log:
+        for i in range(5):
+            log.write(f"line {i}\n")
+
+    assert seen == [f"line {i}" for i in range(5)]
+    assert [line for _, line in log.lines] == ["line 2", "line 3", "line 4"]
+    with open(log.path) as f:
+        assert f.read().splitlines() == seen
+    assert log.excerpt(tail=2) == "... [3 lines omitted] ...\nline 3\nline 4"
+
+
+def test_failure_line_fires_once_with_error_window(tmp_path):
+    excerpts = []
+    log = BuildLog("s2", log_dir=str(tmp_path), on_failure=excerpts.append)
+    for i in range(100):
+        log.write(f"step {i}")
+    log.write('#9 ERROR: process "/bin/sh -c make" did not complete successfully: exit code: 2')
+    log.write("ERROR: failed to solve: exit code: 2")
+    log.close()
+
+    assert len(excerpts) == 1 and log.failure_line == 100
+    excerpt = log.excerpt(context=2, tail=1)
+    assert excerpt.splitlines() == [
+        "... [98 lines omitted] ...", "step 98", "step 99",
+        '#9 ERROR: process "/bin/sh -c make" did not complete successfully: exit code: 2',
+        "ERROR: failed to solve: exit code: 2",
+    ]
+
+
+def test_no_file_until_first_line(tmp_path):
+    log = BuildLog("s3", log_dir=str(tmp_path / "logs"))
+    log.close()
+    assert not (tmp_path / "logs").exists()
+    assert log.excerpt() == ""
+
+
+def test_failing_live_panel_does_not_break_the_build(tmp_path):
+    def broken_panel(line):
+        raise RuntimeError("panel gone")
+
+    failures = []
+    with BuildLog("app", log_dir=str(tmp_path), on_line=broken_panel, on_failure=failures.append) as log:
+        log.write("#1 building\n")
+        log.write("ERROR: failed to solve: exit code 1\n")
+    assert log.line_count == 2 and len(failures) == 1
+
+
+def test_old_and_excess_logs_are_pruned(tmp_path):
+    now = time.time()
+    for i in range(5):
+        path = tmp_path / f"2025060{i}T000000-app.log"
+        path.write_text("x\n")
+        os.utime(path, (now - i * 60, now - i * 60))
+    stale = tmp_path / "20240101T000000-app.log"
+    stale.write_text("x\n")
+    os.utime(stale, (now - 30 * 24 * 3600, now - 30 * 24 * 3600))
+    (tmp_path / "notes.txt").write_text("keep me")
+
+    assert prune_build_logs(str(tmp_path), keep=3, max_age_days=14) == 3
+    assert sorted(os.listdir(tmp_path)) == [
+        "20250600T000000-app.log", "20250601T000000-app.log", "20250602T000000-app.log", "notes.txt"
+    ]
+
+
+def test_early_analysis_starts_once_and_is_reused():
+    release = threading.Event()
+    calls = []
+
+    def analyze(logs):
+        calls.append(logs)
+        release.wait(5)
+        return {"status": "success", "logs": logs}
+
+    analysis = EarlyFailureAnalysis(analyze)
+    analysis.start("early excerpt")
+    analysis.start("second failure line")
+    assert analysis.started
+    release.set()
+    assert analysis.result("final logs") == {"status": "success", "logs": "early excerpt"}
+    assert calls == ["early excerpt"]
+
+
+def test_analysis_runs_on_result_when_never_started():
+    analysis = EarlyFailureAnalysis(lambda logs: logs.upper())
+    assert analysis.result("final logs") == "FINAL LOGS"
+
+
+def test_cancel_drops_an_analysis_the_build_recovered_from():
+    release = threading.Event()
+    calls = []
+
+    def analyze(logs):
+        calls.append(logs)
+        release.wait(5)
+        return logs
+
+    analysis = EarlyFailureAnalysis(analyze)
+    analysis.start("transient failure line")
+    analysis.cancel()
+    release.set()
+    assert analysis._executor._shutdown
+    analysis.start("later failure line")  # no-op once cancelled
+    assert calls in ([], ["transient failure line"])
+
+    never_started = EarlyFailureAnalysis(analyze)
+    never_started.cancel()
+    never_started.start("excerpt")
+    assert not never_started.started
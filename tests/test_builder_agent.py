@@ -1,6 +1,8 @@
 import pytest
+from functools import partial
 from unittest import mock
 from agents.builder_agent import BuildAgent
+from utils.build_logs import BuildLog
 
 @mock.patch("agents.builder_agent.is_simulation_mode", return_value=True)
 def test_simulation_mode(mock_sim):
@@ -22,4 +24,26 @@ def test_production_mode(mock_build_container, mock_logger, mock_sim):
     result = agent.run("https://github.com/example/repo", azure_config)
     assert result["status"] == "success"
     assert "image_url" in result
-    assert result["critical"] is False
\ No newline at end of file
+    assert result["critical"] is False
+
+@mock.patch("agents.builder_agent.is_simulation_mode", return_value=False)
+@mock.patch("agents.builder_agent.log_session")
+@mock.patch("agents.builder_agent.build_container")
+def test_production_failure_returns_streamed_logs(mock_build_container, mock_logger, mock_sim, tmp_path):
+    def failing_build(repo_url, azure_config, repo_cache=None, build_log=None):
+        build_log.write("#5 [3/4] RUN pip install -r requirements.txt")
+        build_log.write('#5 ERROR: process "/bin/sh -c pip install" did not complete successfully: exit code: 1')
+        raise RuntimeError("docker buildx build exited with 1")
+    mock_build_container.side_effect = failing_build
+
+    lines, failures = [], []
+    with mock.patch("agents.builder_agent.BuildLog", partial(BuildLog, log_dir=str(tmp_path))):
+        result = BuildAgent().run(
+            "https://github.com/example/repo", {"container_registry": "testregistry"},
+            on_log_line=lines.append, on_failure=failures.append
+        )
+
+    assert result["status"] == "error"
+    assert "did not complete successfully" in result["logs"]
+    assert len(lines) == 2 and len(failures) == 1
+    assert result["log_path"].startswith(str(tmp_path))
@@ -0,0 +1,103 @@
+import csv
+import gc
+import gzip
+import io
+import os
+import pyarrow.parquet as pq
+import pytest
+from utils.history_export import (
+    HISTORY_COLUMNS, ExportFile, export_history, export_history_csv, export_history_parquet_file, iter_history_rows,
+    prune_exports
+)
+
+
+def _fetch_page(rows):
+    calls = []
+
+    def fetch(size, token, **filters):
+        calls.append((size, token, filters))
+        start = int(token or 0)
+        end = start + size
+        return rows[start:end], str(end) if end < len(rows) else None
+    return fetch, calls
+
+
+ROWS = [{"session_id": f"s{i}", "agent": "build", "timestamp": f"t{i}", "status": "success", "extra": i} for i in range(5)]
+
+
+def test_iter_history_rows_follows_continuations():
+    fetch, calls = _fetch_page(ROWS)
+    assert [r["session_id"] for r in iter_history_rows(fetch, page_size=2, status="success")] == ["s0", "s1", "s2", "s3", "s4"]
+    assert [c[1] for c in calls] == [None, "2", "4"]
+    assert calls[0][2] == {"status": "success"}
+
+
+def test_export_history_csv_writes_header_and_rows():
+    fetch, _ = _fetch_page(ROWS)
+    out = io.StringIO()
+    assert export_history_csv(out, fetch, page_size=2) == 5
+
+    out.seek(0)
+    records = list(csv.DictReader(out))
+    assert len(records) == 5
+    assert list(records[0]) == ["session_id", "agent", "timestamp", "repo", "mode", "status", "issues_found"]
+    assert records[4]["session_id"] == "s4" and records[4]["repo"] == ""
+
+
+def test_export_history_csv_gz_round_trips():
+    fetch, _ = _fetch_page(ROWS)
+    out = io.BytesIO()
+    assert export_history(out, "csv.gz", fetch, page_size=2) == 5
+    assert not out.closed
+
+    records = list(csv.DictReader(io.StringIO(gzip.decompress(out.getvalue()).decode("utf-8"))))
+    assert [r["session_id"] for r in records] == ["s0", "s1", "s2", "s3", "s4"]
+
+
+def test_export_history_parquet_writes_row_groups():
+    rows = [{**r, "issues_found": i} for i, r in enumerate(ROWS)]
+    fetch, _ = _fetch_page(rows)
+    out = io.BytesIO()
+    assert export_history_parquet_file(out, fetch, page_size=2, row_group_size=2) == 5
+
+    parquet = pq.ParquetFile(io.BytesIO(out.getvalue()))
+    assert parquet.num_row_groups == 3
+    table = parquet.read()
+    assert table.column_names == HISTORY_COLUMNS
+    assert table.column("issues_found").to_pylist() == ["0", "1", "2", "3", "4"]
+    assert table.column("repo").to_pylist() == [None] * 5
+
+
+def test_export_history_rejects_unknown_format():
+    fetch, _ = _fetch_page(ROWS)
+    with pytest.raises(ValueError):
+        export_history(io.BytesIO(), "xlsx", fetch)
+
+
+def test_export_file_is_removed_on_delete_and_when_dropped(tmp_path):
+    export = ExportFile("csv", static_dir=str(tmp_path))
+    assert export.url_path.startswith("app/static/exports/") and export.url_path.endswith(".csv")
+    with export.open() as f:
+        f.write(b"a,b\n")
+    assert os.path.exists(export.path)
+    export.delete()
+    assert not os.path.exists(export.path)
+
+    # Dropped with the session state that held it
+    export = ExportFile("parquet", static_dir=str(tmp_path))
+    export.open().close()
+    path = export.path
+    del export
+    gc.collect()
+    assert not os.path.exists(path)
+
+
+def test_prune_exports_removes_old_files(tmp_path):
+    old = ExportFile("csv", static_dir=str(tmp_path))
+    old.open().close()
+    os.utime(old.path, (0, 0))
+    new = ExportFile("csv", static_dir=str(tmp_path))
+    new.open().close()
+    assert prune_exports(str(tmp_path), max_age_hours=1) == 1
+    assert os.path.exists(new.path) and not os.path.exists(old.path)
+    assert prune_exports(str(tmp_path / "missing")) == 0
@@ -0,0 +1,16 @@
+from utils.history_frame import HISTORY_COLUMNS, flatten_mock_runs
+
+
+def test_flatten_mock_runs_expands_agent_scores():
+    runs = [
+        {"timestamp": "2025-06-22T10:00:00Z", "mode": "production", "agent_build": 1.0, "agent_deploy": 0.0},
+        {"timestamp": "2025-06-23T10:00:00Z", "agent_build": 0.5},
+    ]
+    df = flatten_mock_runs(runs)
+    assert list(df.columns) == HISTORY_COLUMNS
+    assert df[["session_id", "agent", "mode", "status"]].values.tolist() == [
+        ["mock-0000", "build", "production", "success"],
+        ["mock-0000", "deploy", "production", "error"],
+        ["mock-0001", "build", "simulation", "warning"],
+    ]
+    assert flatten_mock_runs([]).empty
@@ -0,0 +1,59 @@
+import time
+from unittest import mock
+from utils.azure_openai import AzureOpenAIClient
+from utils.llm_cache import LLMCache, MemoryCacheBackend, SQLiteCacheBackend, make_cache_key
+
+
+def _key(content, temperature=0.7):
+    return make_cache_key("gpt-4", "2024-02-15-preview", [{"role": "user", "content": content}], temperature, 4000)
+
+
+def test_key_ignores_indentation_but_not_parameters():
+    assert _key("\n    Review this\n    repo  \n") == _key("Review this\nrepo")
+    assert _key("Review this") != _key("Review that")
+    assert _key("Review this") != _key("Review this", temperature=0.0)
+
+
+def test_memory_backend_lru_and_ttl():
+    backend = MemoryCacheBackend(max_entries=2)
+    backend.set("a", "1")
+    backend.set("b", "2")
+    backend.get("a")
+    backend.set("c", "3")
+    assert backend.get("b") is None
+    assert backend.get("a") == "1"
+
+    backend.set("expired", "x", ttl=-1)
+    assert backend.get("expired") is None
+
+
+def test_sqlite_backend_persists_and_evicts(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    backend = SQLiteCacheBackend(path, max_entries=2)
+    backend.set("a", "1")
+    time.sleep(0.01)
+    backend.set("b", "2")
+    time.sleep(0.01)
+    backend.get("a")
+    backend.set("c", "3")
+
+    reopened = SQLiteCacheBackend(path, max_entries=2)
+    assert reopened.get("a") == "1"
+    assert reopened.get("b") is None
+    assert reopened.get("c") == "3"
+
+
+def test_client_serves_repeat_prompts_from_cache():
+    cache = LLMCache(MemoryCacheBackend())
+    client = AzureOpenAIClient(api_key="key", endpoint="https://example.openai.azure.com", cache=cache)
+    response = mock.Mock(status_code=200)
+    response.json.return_value = {"choices": [{"message": {"content": "review"}}]}
+
+    with mock.patch.object(client.session, "post", return_value=response) as post:
+        assert client.complete([{"text": "same logs"}]) == "review"
+        assert client.complete([{"text": "same logs"}]) == "review"
+        assert post.call_count == 1
+
+        client.complete([{"text": "same logs"}], use_cache=False)
+        assert post.call_count == 2
+    assert cache.hits == 1
@@ -8,4 +8,21 @@ def test_simulation_mode(mock_sim):
     azure_config = {"resource_group": "test-rg"}
     result = agent.run(azure_config)
     assert isinstance(result, dict)
-    assert any("errors" in v or "summary" in v for v in result.values())
\ No newline at end of file
+    assert any("errors" in v or "summary" in v for v in result.values())
+
+@mock.patch("agents.monitor_agent.is_simulation_mode", return_value=False)
+@mock.patch("agents.monitor_agent.log_session")
+@mock.patch("agents.monitor_agent.get_container_app_logs", return_value="ready")
+@mock.patch("agents.monitor_agent.get_container_app")
+@mock.patch("agents.monitor_agent.list_container_apps", return_value=["web", "worker"])
+def test_production_mode_uses_management_api(mock_list, mock_get, mock_logs, mock_logger, mock_sim):
+    mock_get.side_effect = [
+        {"provisioningState": "Succeeded", "fqdn": "web.example.io"},
+        {"provisioningState": "Failed", "fqdn": None},
+    ]
+    result = MonitorAgent().run({"resource_group": "test-rg"}, session_id="s1")
+    assert result["web"]["status"] == "success"
+    assert result["web"]["traffic_status"] == "FQDN: web.example.io"
+    assert result["worker"]["status"] == "error"
+    mock_list.assert_called_once_with("test-rg", {"resource_group": "test-rg"})
+    mock_logger.assert_called_once()
@@ -0,0 +1,58 @@
+import time
+import pytest
+from utils.pipeline import Pipeline, Stage
+
+
+def _sleep_stage(name, seconds=0.2, status="success"):
+    def _run(upstream):
+        time.sleep(seconds)
+        return {"status": status, "upstream": sorted(upstream)}
+    return _run
+
+
+def test_independent_stages_run_concurrently():
+    pipeline = Pipeline([
+        Stage("a", _sleep_stage("a")),
+        Stage("b", _sleep_stage("b")),
+        Stage("c", _sleep_stage("c")),
+        Stage("d", _sleep_stage("d", 0.0), depends_on=["a", "b", "c"]),
+    ], max_workers=4)
+    result = pipeline.run()
+
+    assert result.wall_time < 0.5
+    assert result.outputs["d"]["upstream"] == ["a", "b", "c"]
+    assert result.timings["d"].start_offset >= max(result.timings[n].end_offset for n in "abc")
+
+
+def test_when_false_skips_stage_and_dependents():
+    pipeline = Pipeline([
+        Stage("build", _sleep_stage("build", 0.0, status="error")),
+        Stage("deploy", _sleep_stage("deploy", 0.0), depends_on=["build"],
+              when=lambda up: up["build"]["status"] == "success"),
+        Stage("monitor", _sleep_stage("monitor", 0.0), depends_on=["deploy"]),
+    ])
+    result = pipeline.run()
+
+    assert "deploy" not in result.outputs
+    assert "monitor" not in result.outputs
+    assert result.timings["deploy"].status == "skipped"
+    assert result.timings["monitor"].status == "skipped"
+
+
+def test_stage_exception_is_recorded_as_error():
+    def _boom(upstream):
+        raise RuntimeError("boom")
+
+    result = Pipeline([Stage("a", _boom), Stage("b", _sleep_stage("b", 0.0))]).run()
+
+    assert result.outputs["a"]["status"] == "error"
+    assert "boom" in result.outputs["a"]["reason"]
+    assert result.outputs["b"]["status"] == "success"
+    assert result.timings["a"].status == "error"
+
+
+def test_cycle_and_unknown_dependency_rejected():
+    with pytest.raises(ValueError):
+        Pipeline([Stage("a", _sleep_stage("a"), depends_on=["b"]), Stage("b", _sleep_stage("b"), depends_on=["a"])])
+    with pytest.raises(ValueError):
+        Pipeline([Stage("a", _sleep_stage("a"), depends_on=["missing"])])
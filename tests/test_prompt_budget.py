@@ -0,0 +1,71 @@
+from unittest import mock
+from utils.prompt_budget import count_tokens, fit_log, truncate_log
+
+
+def _noisy_log(noise_lines=5000):
+    lines = [f"collecting module_{i} ... ok" for i in range(noise_lines)]
+    lines[1200:1200] = [
+        "Traceback (most recent call last):",
+        '  File "app/db.py", line 42, in connect',
+        "    raise ConnectionError('db down')",
+        "ConnectionError: db down",
+    ]
+    lines += ["FAILED tests/test_api.py::test_login - AssertionError", "=== 1 failed, 99 passed ==="]
+    return "\n".join(lines)
+
+
+def test_small_input_returned_unchanged():
+    assert fit_log("all good", max_tokens=100) == "all good"
+
+
+def test_truncation_keeps_tracebacks_and_tail_within_budget():
+    log = _noisy_log()
+    fitted = fit_log(log, max_tokens=800)
+
+    assert count_tokens(fitted) <= 800
+    assert "ConnectionError: db down" in fitted
+    assert 'File "app/db.py", line 42' in fitted
+    assert "=== 1 failed, 99 passed ===" in fitted
+    assert "lines omitted" in fitted
+
+
+def test_truncate_log_keeps_regions_in_original_order():
+    fitted = truncate_log(_noisy_log(), max_tokens=400)
+    assert fitted.index("ConnectionError: db down") < fitted.index("FAILED tests/test_api.py")
+
+
+@mock.patch("utils.prompt_budget.is_simulation_mode", return_value=False)
+@mock.patch("utils.prompt_budget.azure_openai_prompt_many")
+def test_falls_back_to_map_reduce_when_failures_alone_overflow(mock_many, mock_sim):
+    mock_many.side_effect = lambda prompts, **kw: ["summary"] * len(prompts)
+    log = "\n".join(f"FAILED tests/test_{i}.py::test_case - AssertionError: boom {i}" for i in range(3000))
+
+    fitted = fit_log(log, max_tokens=500)
+
+    assert mock_many.called
+    assert "[Part 1/" in fitted and "summary" in fitted
+    assert count_tokens(fitted) <= 500
+
+
+@mock.patch("utils.prompt_budget.is_simulation_mode", return_value=False)
+@mock.patch("utils.prompt_budget.azure_openai_prompt_many")
+def test_failed_summaries_fall_back_to_truncation(mock_many, mock_sim):
+    mock_many.side_effect = lambda prompts, **kw: ["summary"] + ["[ERROR calling Azure OpenAI]: 503"] * (len(prompts) - 1)
+    log = "\n".join(f"FAILED tests/test_{i}.py::test_case - AssertionError: boom {i}" for i in range(3000))
+
+    fitted = fit_log(log, max_tokens=500)
+
+    assert "[ERROR" not in fitted and "[Part" not in fitted
+    assert "boom 2999" in fitted
+    assert count_tokens(fitted) <= 500
+
+
+@mock.patch("utils.prompt_budget.is_simulation_mode", return_value=True)
+@mock.patch("utils.prompt_budget.azure_openai_prompt_many")
+def test_simulation_mode_truncates_instead_of_summarizing(mock_many, mock_sim):
+    log = "\n".join(f"FAILED tests/test_{i}.py::test_case - AssertionError: boom {i}" for i in range(3000))
+
+    fitted = fit_log(log, max_tokens=500)
+
+    mock_many.assert_not_called()
+    assert "boom 2999" in fitted
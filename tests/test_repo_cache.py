@@ -0,0 +1,45 @@
+import os
+import subprocess
+import pytest
+from unittest import mock
+from utils.repo_cache import RepoCloneCache
+
+
+@pytest.fixture
+def origin(tmp_path):
+    repo = tmp_path / "origin"
+    repo.mkdir()
+    env = {**os.environ, "GIT_AUTHOR_NAME": "t", "GIT_AUTHOR_EMAIL": "t@t", "GIT_COMMITTER_NAME": "t", "GIT_COMMITTER_EMAIL": "t@t"}
+    subprocess.run(["git", "init", "-q", str(repo)], check=True)
+    (repo / "app.py").write_text("print('hi')\n")
+    subprocess.run(["git", "add", "."], cwd=repo, check=True)
+    subprocess.run(["git", "commit", "-qm", "init"], cwd=repo, check=True, env=env)
+    return f"file://{repo}"
+
+
+@mock.patch("utils.repo_cache.validate_repo_url")
+def test_single_clone_shared_by_leases(mock_validate, origin, tmp_path):
+    cache = RepoCloneCache(root=str(tmp_path / "cache"))
+    with mock.patch.object(cache, "_populate", wraps=cache._populate) as populate:
+        with cache.lease(origin) as first, cache.lease(origin) as second:
+            assert first != second
+            assert os.path.exists(os.path.join(first, "app.py"))
+            assert os.path.exists(os.path.join(second, "app.py"))
+        assert populate.call_count == 1
+    assert not os.path.exists(first)
+    cache.close()
+    assert not os.path.exists(cache.root)
+
+
+@mock.patch("utils.repo_cache.validate_repo_url")
+def test_close_defers_cleanup_until_last_release(mock_validate, origin, tmp_path):
+    cache = RepoCloneCache(root=str(tmp_path / "cache"))
+    worktree = cache.acquire(origin)
+    cache.close()
+    assert os.path.exists(worktree)
+
+    cache.release(worktree)
+    assert not os.path.exists(cache.root)
+
+    with pytest.raises(RuntimeError):
+        cache.acquire(origin)
@@ -0,0 +1,93 @@
+import os
+import subprocess
+import time
+from unittest import mock
+from utils.repo_cache import RepoCloneCache
+from utils.repo_mirror import MirrorStore, _git
+
+GIT_ENV = {**os.environ, "GIT_AUTHOR_NAME": "t", "GIT_AUTHOR_EMAIL": "t@t", "GIT_COMMITTER_NAME": "t", "GIT_COMMITTER_EMAIL": "t@t"}
+
+
+def _make_origin(path, content="v1"):
+    path.mkdir()
+    subprocess.run(["git", "init", "-q", str(path)], check=True)
+    _commit(path, content)
+    return f"file://{path}"
+
+
+def _commit(path, content):
+    (path / "app.py").write_text(f"print('{content}')\n")
+    subprocess.run(["git", "add", "."], cwd=path, check=True)
+    subprocess.run(["git", "commit", "-qm", content], cwd=path, check=True, env=GIT_ENV)
+
+
+def test_sync_fetches_incrementally(tmp_path):
+    origin_dir = tmp_path / "origin"
+    url = _make_origin(origin_dir)
+    store = MirrorStore(str(tmp_path / "mirrors"))
+
+    path = store.sync(url)
+    first = _git("rev-parse", "HEAD", cwd=path)
+    _commit(origin_dir, "v2")
+
+    with mock.patch("utils.repo_mirror.subprocess.run", wraps=subprocess.run) as run:
+        assert store.sync(url) == path
+        commands = [call.args[0][:2] for call in run.call_args_list]
+    assert ["git", "clone"] not in commands
+    assert _git("rev-parse", "HEAD", cwd=path) != first
+
+
+def test_evicts_expired_and_oversized_mirrors(tmp_path):
+    store = MirrorStore(str(tmp_path / "mirrors"), max_age=3600)
+    old = store.sync(_make_origin(tmp_path / "old"))
+    os.utime(old, (time.time() - 7200, time.time() - 7200))
+    store.sync(_make_origin(tmp_path / "fresh"))
+    assert not os.path.exists(old)
+
+    store.max_bytes = 0
+    kept = store.sync(_make_origin(tmp_path / "newest"))
+    assert os.listdir(store.root) == [os.path.basename(kept)]
+
+
+@mock.patch("utils.repo_cache.validate_repo_url")
+def test_clone_cache_uses_mirror_worktrees(mock_validate, tmp_path):
+    url = _make_origin(tmp_path / "origin")
+    store = MirrorStore(str(tmp_path / "mirrors"))
+    cache = RepoCloneCache(root=str(tmp_path / "run"), mirror_store=store)
+
+    with mock.patch.object(store, "sync", wraps=store.sync) as sync:
+        with cache.lease(url) as first, cache.lease(url) as second:
+            assert os.path.exists(os.path.join(first, "app.py"))
+            assert os.path.exists(os.path.join(second, "app.py"))
+        assert sync.call_count == 1
+    cache.close()
+
+    # Mirror survives the run; the run's worktrees do not
+    assert os.path.isdir(store.mirror_path(url))
+    assert not os.path.exists(cache.root)
+
+
+def test_eviction_skips_mirrors_locked_by_another_thread(tmp_path):
+    store = MirrorStore(str(tmp_path / "mirrors"), max_age=3600)
+    busy = store.sync(_make_origin(tmp_path / "busy"))
+    os.utime(busy, (time.time() - 7200, time.time() - 7200))
+
+    with store._lock_for(busy):
+        store.evict()
+    assert os.path.isdir(busy)
+
+    store.evict()
+    assert not os.path.exists(busy)
+
+
+def test_add_worktree_restores_a_mirror_evicted_after_sync(tmp_path):
+    url = _make_origin(tmp_path / "origin")
+    store = MirrorStore(str(tmp_path / "mirrors"))
+    path = store.sync(url)
+    store.max_bytes = 0
+    store.evict()
+    assert not os.path.exists(path)
+
+    dest = str(tmp_path / "wt")
+    store.add_worktree(url, dest)
+    assert os.path.exists(os.path.join(dest, "app.py"))
@@ -15,11 +15,23 @@ def test_simulation_mode(mock_logger, mock_sim_mode):
 
 @mock.patch("agents.rollback_agent.is_simulation_mode", return_value=False)
 @mock.patch("agents.rollback_agent.log_session")
-@mock.patch("subprocess.run")
-def test_production_mode_azure_failure(mock_subprocess, mock_logger, mock_sim):
-    mock_subprocess.side_effect = Exception("Azure CLI error")
+@mock.patch("agents.rollback_agent.list_container_app_revisions")
+def test_production_mode_azure_failure(mock_revisions, mock_logger, mock_sim):
+    mock_revisions.side_effect = Exception("Azure CLI error")
     agent = RollbackAgent()
     azure_config = {"resource_group": "test-rg"}
     result = agent.run(azure_config, "test-app")
     assert result["status"] == "error"
-    assert "Azure CLI error" in result["reason"]
\ No newline at end of file
+    assert "Azure CLI error" in result["reason"]
+
+@mock.patch("agents.rollback_agent.is_simulation_mode", return_value=False)
+@mock.patch("agents.rollback_agent.log_session")
+@mock.patch("agents.rollback_agent.set_container_app_traffic")
+@mock.patch("agents.rollback_agent.list_container_app_revisions")
+def test_production_mode_routes_traffic_to_previous_revision(mock_revisions, mock_traffic, mock_logger, mock_sim):
+    mock_revisions.return_value = [{"name": "app--rev3"}, {"name": "app--rev2"}, {"name": "app--rev1"}]
+    azure_config = {"resource_group": "test-rg"}
+    result = RollbackAgent().run(azure_config, "test-app")
+    assert result["status"] == "success"
+    assert result["previous_revision"] == "app--rev2"
+    mock_traffic.assert_called_once_with("test-app", "test-rg", {"app--rev2": 100}, azure_config)
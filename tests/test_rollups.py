@@ -0,0 +1,101 @@
+import datetime
+import pytest
+from unittest import mock
+import utils.rollups as rollups_module
+from utils.rollups import RollupStore, latency_bucket, percentile_from_histogram, record_agent_result
+
+T0 = datetime.datetime(2025, 6, 22, 10, 15)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RollupStore(str(tmp_path / "rollups.sqlite3"))
+
+
+def test_run_and_agent_counts(store):
+    store.record_result("s1", "build", "success", "production", "repo-a", T0)
+    store.record_result("s1", "deploy", "error", "production", "repo-a", T0 + datetime.timedelta(minutes=5))
+    store.record_result("s2", "build", "success", "simulation", "repo-a", T0 + datetime.timedelta(days=1))
+    store.record_result("s2", "deploy", "success", "simulation", "repo-a", T0 + datetime.timedelta(days=1))
+
+    assert store.kpis() == {"total_runs": 2, "success_rate": 0.5, "production_runs": 1}
+    assert store.kpis(since="2025-06-23")["total_runs"] == 1
+    assert store.kpis(mode="production", granularity="hour")["success_rate"] == 0.0
+
+    assert store.timeseries() == [
+        {"bucket": "2025-06-22", "executions": 2, "success_rate": 0.5},
+        {"bucket": "2025-06-23", "executions": 2, "success_rate": 1.0},
+    ]
+    stats = {s["agent"]: s for s in store.agent_stats()}
+    assert stats["deploy"]["executions"] == 2 and stats["deploy"]["success_rate"] == 0.5
+
+
+def test_late_failure_moves_run_to_failed_in_original_bucket(store):
+    store.record_result("s1", "build", "success", "production", "repo-a", T0)
+    store.record_result("s1", "sre", "error", "production", "repo-a", T0 + datetime.timedelta(hours=2))
+    store.record_result("s1", "rollback", "error", "production", "repo-a", T0 + datetime.timedelta(hours=3))
+
+    hourly = store._conn.execute(
+        "SELECT bucket, runs, failed_runs FROM run_rollups WHERE granularity = 'hour'"
+    ).fetchall()
+    assert hourly == [("2025-06-22T10", 1, 1)]
+
+
+def test_latency_percentiles_from_histograms(store):
+    for seconds in [1.5] * 50 + [3.0] * 40 + [50.0] * 10:
+        store.record_latency("build", seconds, "production", "repo-a", T0)
+    store.record_result("s1", "build", "success", "production", "repo-a", T0)
+
+    [stats] = store.agent_stats()
+    assert 1 <= stats["p50_s"] <= 2
+    assert 2 <= stats["p90_s"] <= 4
+    assert 30 <= stats["p99_s"] <= 60
+
+
+def test_histogram_helpers():
+    assert latency_bucket(0.05) == 0 and latency_bucket(1.0) == 3 and latency_bucket(10_000) == 16
+    assert percentile_from_histogram({}, 50) is None
+    assert percentile_from_histogram({3: 1}, 100) == 1.0
+
+
+@mock.patch("utils.rollups.is_simulation_mode", return_value=True)
+def test_record_agent_result_uses_env_store(mock_sim, monkeypatch, tmp_path):
+    monkeypatch.setattr(rollups_module, "_rollups", None)
+    monkeypatch.setenv("AGENTOPS_ROLLUP_PATH", str(tmp_path / "r.sqlite3"))
+    record_agent_result("s1", "build", {"status": "success", "input": {"repo_url": "https://github.com/a/b"}})
+
+    assert rollups_module.get_rollups().kpis() == {"total_runs": 1, "success_rate": 1.0, "production_runs": 0}
+
+    monkeypatch.setenv("AGENTOPS_ROLLUPS", "off")
+    assert rollups_module.get_rollups() is None
+
+
+def _history_pages(rows, page_size=2):
+    def fetch_page(size, token, since=None):
+        matching = [r for r in rows if not since or r["timestamp"] >= since]
+        start = int(token or 0)
+        return matching[start:start + page_size], str(start + page_size) if len(matching) > start + page_size else None
+    return fetch_page
+
+
+def test_catch_up_backfills_from_storage_without_double_counting(store):
+    rows = [
+        {"session_id": "s1", "agent": "build", "timestamp": "2025-06-22T10:00:00Z", "status": "success",
+         "mode": "production", "repo": "repo-a"},
+        {"session_id": "s1", "agent": "deploy", "timestamp": "2025-06-22T10:05:00Z", "status": "error",
+         "mode": "production", "repo": "repo-a"},
+        {"session_id": "s2", "agent": "build", "timestamp": "2025-06-23T09:00:00Z", "status": "success",
+         "mode": "simulation", "repo": "repo-b"},
+    ]
+    # s1/build already arrived through the live feed on this replica
+    store.record_result("s1", "build", "success", "production", "repo-a", T0)
+
+    assert store.catch_up(_history_pages(rows)) == 2
+    assert store.kpis() == {"total_runs": 2, "success_rate": 0.5, "production_runs": 1}
+
+    # A run logged by another replica shows up on the next catch-up; nothing is recounted
+    rows.append({"session_id": "s3", "agent": "build", "timestamp": "2025-06-23T12:00:00Z",
+                 "status": "success", "mode": "production", "repo": "repo-a"})
+    assert store.catch_up(_history_pages(rows)) == 1
+    assert store.catch_up(_history_pages(rows)) == 0
+    assert store.kpis()["total_runs"] == 3
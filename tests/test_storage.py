@@ -0,0 +1,83 @@
+import pytest
+from unittest import mock
+import utils.storage as storage
+from utils.storage import CosmosStorageBackend, SQLiteStorageBackend, StorageBackend, get_storage
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return SQLiteStorageBackend(str(tmp_path / "agentops.sqlite3"))
+
+
+def _log(backend, session_id, agent, status="success", when="2025-06-22T10:00:00", **inputs):
+    with mock.patch("utils.storage.datetime") as mock_datetime:
+        mock_datetime.datetime.utcnow.return_value.isoformat.return_value = when
+        backend.log_session(session_id, agent, {"status": status, "input": inputs, "output": {"issues_found": 2}})
+
+
+def test_history_is_latest_first_per_agent(backend):
+    _log(backend, "s1", "build", when="2025-06-22T10:00:00")
+    _log(backend, "s2", "build", "error", when="2025-06-22T11:00:00")
+    _log(backend, "s2", "deploy", when="2025-06-22T11:05:00")
+    _log(backend, "s2", "build", when="2025-06-22T11:10:00")  # same document id — replaced
+
+    history = backend.fetch_agent_history("build")
+    assert [h["session_id"] for h in history] == ["s2", "s1"]
+    assert history[0]["data"]["status"] == "success"
+    assert backend.fetch_recent_history(["deploy", "sre"]) == {
+        "deploy": [{"session_id": "s2", "timestamp": "2025-06-22T11:05:00", "data": mock.ANY}],
+        "sre": []
+    }
+    assert set(backend.fetch_all_sessions()["s2"]["agents"]) == {"build", "deploy"}
+    assert backend.history_version() == 4
+
+
+def test_sessions_page_keyset_pagination_and_filters(backend):
+    for i in range(5):
+        _log(backend, f"s{i}", "build", "error" if i % 2 else "success",
+             when=f"2025-06-2{i}T10:00:00", repo_url="https://github.com/a/b", mode="production")
+
+    rows, token = backend.fetch_sessions_page(page_size=2)
+    assert [r["session_id"] for r in rows] == ["s4", "s3"]
+    rows, token = backend.fetch_sessions_page(page_size=2, continuation=token)
+    assert [r["session_id"] for r in rows] == ["s2", "s1"]
+    rows, token = backend.fetch_sessions_page(page_size=2, continuation=token)
+    assert [r["session_id"] for r in rows] == ["s0"] and token is None
+
+    rows, _ = backend.fetch_sessions_page(status="error", since="2025-06-22", until="2025-06-24")
+    assert [(r["session_id"], r["repo"], r["issues_found"]) for r in rows] == [("s3", "https://github.com/a/b", "2")]
+
+
+def test_session_summaries_grouped_by_month(backend):
+    _log(backend, "s1", "build", when="2025-06-22T10:00:00")
+    _log(backend, "s1", "deploy", "error", when="2025-06-22T10:05:00")
+    _log(backend, "s2", "build", when="2025-07-01T09:00:00")
+
+    [summary] = backend.fetch_session_summaries("2025-06")
+    assert summary["agents"] == {"build": "success", "deploy": "error"}
+    assert summary["status"] == "error" and summary["updated_at"] == "2025-06-22T10:05:00"
+
+
+def test_backend_selected_from_env(monkeypatch, tmp_path):
+    monkeypatch.setattr(storage, "_storage", None)
+    monkeypatch.setenv("AGENTOPS_STORAGE_BACKEND", "sqlite")
+    monkeypatch.setenv("AGENTOPS_SQLITE_PATH", str(tmp_path / "db.sqlite3"))
+    assert isinstance(get_storage(), SQLiteStorageBackend)
+
+    monkeypatch.setattr(storage, "_storage", None)
+    monkeypatch.setenv("AGENTOPS_STORAGE_BACKEND", "cosmos")
+    assert isinstance(get_storage(), CosmosStorageBackend)
+
+    monkeypatch.setattr(storage, "_storage", None)
+    monkeypatch.setenv("AGENTOPS_STORAGE_BACKEND", "mongo")
+    with pytest.raises(ValueError):
+        get_storage()
+
+
+def test_incomplete_backend_fails_at_construction():
+    class WriteOnlyBackend(StorageBackend):
+        def log_session(self, session_id, agent, data):
+            pass
+
+    with pytest.raises(TypeError):
+        WriteOnlyBackend()
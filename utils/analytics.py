@@ -0,0 +1,191 @@
+import datetime
+import glob
+import json
+import os
+import uuid
+import pyarrow as pa
+import pyarrow.dataset as ds
+from utils.storage import fetch_sessions_page
+from dotenv import load_dotenv
+
+try:
+    import duckdb
+except ImportError:  # optional — the dashboard falls back to the mock history file
+    duckdb = None
+
+load_dotenv()
+
+DEFAULT_ANALYTICS_ROOT = os.getenv("AGENTOPS_ANALYTICS_ROOT", ".data/history")
+
+HISTORY_SCHEMA = pa.schema([
+    ("session_id", pa.string()),
+    ("timestamp", pa.timestamp("us")),
+    ("status", pa.string()),
+    ("mode", pa.string()),
+    ("repo", pa.string()),
+    ("issues_found", pa.string()),
+    ("day", pa.date32()),
+    ("agent", pa.string()),
+])
+
+# Hive-style day=YYYY-MM-DD/agent=<name>/ directories, so date and agent filters
+# prune whole directories before any file is opened.
+PARTITIONING = ds.partitioning(pa.schema([("day", pa.date32()), ("agent", pa.string())]), flavor="hive")
+
+
+def _parse_timestamp(value: str) -> datetime.datetime:
+    parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed.replace(tzinfo=None) if parsed.tzinfo is None else parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _to_table(rows: list) -> pa.Table:
+    columns = {name: [] for name in HISTORY_SCHEMA.names}
+    for row in rows:
+        timestamp = _parse_timestamp(row["timestamp"])
+        columns["session_id"].append(row["session_id"])
+        columns["timestamp"].append(timestamp)
+        columns["status"].append(row.get("status"))
+        columns["mode"].append(row.get("mode"))
+        columns["repo"].append(row.get("repo"))
+        columns["issues_found"].append(row.get("issues_found"))
+        columns["day"].append(timestamp.date())
+        columns["agent"].append(row["agent"])
+    return pa.table(columns, schema=HISTORY_SCHEMA)
+
+
+def _watermark_path(root: str) -> str:
+    return os.path.join(root, "_watermark.json")
+
+
+def _read_watermark(root: str):
+    try:
+        with open(_watermark_path(root)) as f:
+            return json.load(f).get("timestamp")
+    except (OSError, ValueError):
+        return None
+
+
+def export_history_parquet(root: str = None, page_size: int = 1000, flush_rows: int = 50000) -> int:
+    """
+    Appends history rows logged since the previous export to the partitioned Parquet
+    dataset under `root`, reading the storage backend page by page. The newest exported
+    timestamp is kept in `_watermark.json`. Returns the number of rows written.
+    """
+    root = root or DEFAULT_ANALYTICS_ROOT
+    os.makedirs(root, exist_ok=True)
+    watermark = _read_watermark(root)
+    newest = watermark
+    export_id = uuid.uuid4().hex
+    pending, written, token = [], 0, None
+
+    def _flush():
+        nonlocal pending, written
+        if pending:
+            ds.write_dataset(
+                _to_table(pending), root, format="parquet", partitioning=PARTITIONING,
+                existing_data_behavior="overwrite_or_ignore",
+                basename_template=f"part-{export_id}-{written}-{{i}}.parquet"
+            )
+            written += len(pending)
+            pending = []
+
+    while True:
+        rows, token = fetch_sessions_page(page_size, token, since=watermark)
+        for row in rows:
+            if not row.get("timestamp") or (watermark and row["timestamp"] <= watermark):
+                continue
+            pending.append(row)
+            newest = max(newest or row["timestamp"], row["timestamp"])
+        if len(pending) >= flush_rows:
+            _flush()
+        if not token:
+            break
+    _flush()
+
+    if newest != watermark:
+        with open(_watermark_path(root), "w") as f:
+            json.dump({"timestamp": newest}, f)
+    return written
+
+
+class RunAnalytics:
+    """
+    KPIs, time series and per-agent success rates over the exported Parquet history.
+
+    Queries run in DuckDB straight off the files. Date and agent filters hit the
+    hive partition columns, so only the matching day/agent directories are read, and
+    only the columns a query touches are decoded.
+    """
+
+    def __init__(self, root: str = None):
+        self.root = root or DEFAULT_ANALYTICS_ROOT
+
+    @property
+    def files(self) -> str:
+        return os.path.join(self.root, "**", "*.parquet")
+
+    def has_data(self) -> bool:
+        return duckdb is not None and next(glob.iglob(self.files, recursive=True), None) is not None
+
+    def _source(self, since=None, until=None, mode=None, agents=None):
+        """Filtered history relation (SQL, parameters); the optimizer pushes the filters into the scan"""
+        filters, parameters = [], [self.files]
+        if since:
+            filters.append("day >= ?")
+            parameters.append(since)
+        if until:
+            filters.append("day <= ?")
+            parameters.append(until)
+        if mode:
+            filters.append("mode = ?")
+            parameters.append(mode)
+        if agents:
+            filters.append(f"agent IN ({', '.join('?' for _ in agents)})")
+            parameters.extend(agents)
+        where = f" WHERE {' AND '.join(filters)}" if filters else ""
+        sql = (
+            "(SELECT * FROM read_parquet(?, hive_partitioning = true, "
+            f"hive_types = {{'day': DATE, 'agent': VARCHAR}}){where})"
+        )
+        return sql, parameters
+
+    def _query(self, sql: str, parameters: list):
+        with duckdb.connect() as con:
+            return con.execute(sql, parameters).df()
+
+    def kpis(self, since=None, until=None, mode=None) -> dict:
+        """Total runs (sessions), the share with no failing agent, and production runs"""
+        source, parameters = self._source(since, until, mode)
+        df = self._query(
+            "SELECT COUNT(*) AS runs, AVG(CASE WHEN failed THEN 0 ELSE 1 END) AS success_rate, "
+            "COUNT(*) FILTER (WHERE production) AS production_runs FROM ("
+            "SELECT session_id, bool_or(status = 'error') AS failed, bool_or(mode = 'production') AS production "
+            f"FROM {source} GROUP BY session_id)",
+            parameters
+        )
+        row = df.iloc[0]
+        return {
+            "total_runs": int(row["runs"]),
+            "success_rate": float(row["success_rate"]) if row["runs"] else 0.0,
+            "production_runs": int(row["production_runs"]),
+        }
+
+    def status_timeseries(self, since=None, until=None, mode=None):
+        """Per day: agent executions and their success rate"""
+        source, parameters = self._source(since, until, mode)
+        return self._query(
+            "SELECT day, COUNT(*) AS executions, "
+            "AVG(CASE WHEN status = 'success' THEN 1 ELSE 0 END) AS success_rate "
+            f"FROM {source} GROUP BY day ORDER BY day",
+            parameters
+        )
+
+    def agent_success_rates(self, since=None, until=None, mode=None, agents=None):
+        """Per agent: executions and success rate, best first"""
+        source, parameters = self._source(since, until, mode, agents)
+        return self._query(
+            "SELECT agent, COUNT(*) AS executions, "
+            "AVG(CASE WHEN status = 'success' THEN 1 ELSE 0 END) AS success_rate "
+            f"FROM {source} GROUP BY agent ORDER BY success_rate DESC, agent",
+            parameters
+        )
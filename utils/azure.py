@@ -1,10 +1,10 @@
-import subprocess
-import tempfile
-import shutil
 import os
 from urllib.parse import urlparse
 from config import is_simulation_mode, get_azure_config
-from utils.github import validate_and_clone_repo
+from utils import azure_mgmt
+from utils.build_backends import get_build_backend
+from utils.build_context import image_tag
+from utils.github import checkout_repo
 
 
 def _extract_repo_name(repo_url: str) -> str:
@@ -17,43 +17,41 @@ def _extract_repo_name(repo_url: str) -> str:
     return name.replace('.git', '')
 
 
-def build_container(repo_url: str, azure_config: dict) -> str:
+def build_container(repo_url: str, azure_config: dict, repo_cache=None, build_log=None) -> str:
     """
-    Builds a Docker image for the given repository and pushes it to Azure Container Registry.
-    The image and service names are derived from the repository name.
+    Builds a Docker image for the given repository with the configured build backend
+    and pushes it to Azure Container Registry. The image and service names are derived
+    from the repository name; the tag is a hash of the build context, so an unchanged
+    source tree reuses the image already in ACR.
+    Pass a RepoCloneCache to reuse the clone shared by the other agents in this run,
+    and a BuildLog to capture the build output as it streams.
     """
     if is_simulation_mode():
         repo_name = _extract_repo_name(repo_url)
         registry = azure_config.get("container_registry", "agentopssim")
         return f"{registry}.azurecr.io/{repo_name}:latest"
 
-    repo_path = None
     try:
-        repo_path = validate_and_clone_repo(repo_url)
-        repo_name = _extract_repo_name(repo_url)
-        registry = azure_config["container_registry"]
-        image_url = f"{registry}.azurecr.io/{repo_name}:latest"
-
-        # Login to Azure Container Registry
-        subprocess.run([
-            "az", "acr", "login",
-            "--name", registry
-        ], check=True)
-
-        # Build and push image
-        subprocess.run([
-            "az", "acr", "build",
-            "--registry", registry,
-            "--image", f"{repo_name}:latest",
-            repo_path
-        ], check=True)
-
-        return image_url
-    except subprocess.CalledProcessError as e:
+        with checkout_repo(repo_url, repo_cache) as repo_path:
+            repo_name = _extract_repo_name(repo_url).lower()
+            registry = azure_config["container_registry"]
+            tag = image_tag(repo_path)
+            image_url = f"{registry}.azurecr.io/{repo_name}:{tag}"
+
+            backend = get_build_backend()
+            try:
+                if backend.image_exists(registry, repo_name, tag, azure_config):
+                    print(f"Reusing {image_url} — build context unchanged")
+                    return image_url
+            except Exception as e:
+                print(f"Could not check ACR for {image_url}, building: {e}")
+
+            # ACR quick task or local BuildKit, per AGENTOPS_BUILD_BACKEND
+            backend.build(repo_path, registry, repo_name, tag, azure_config, log=build_log)
+
+            return image_url
+    except Exception as e:
         raise RuntimeError(f"Build failed: {e}")
-    finally:
-        if repo_path:
-            shutil.rmtree(repo_path, ignore_errors=True)
 
 
 def deploy_to_container_apps(
@@ -90,41 +88,15 @@ def deploy_to_container_apps(
     try:
         resource_group = azure_config["resource_group"]
         location = azure_config["location"]
-        
-        # Create container app environment if it doesn't exist
-        env_name = f"{app_name}-env"
-        subprocess.run([
-            "az", "containerapp", "env", "create",
-            "--name", env_name,
-            "--resource-group", resource_group,
-            "--location", location
-        ], check=False)  # Don't fail if already exists
-
-        # Deploy container app
-        subprocess.run([
-            "az", "containerapp", "create",
-            "--name", app_name,
-            "--resource-group", resource_group,
-            "--environment", env_name,
-            "--image", image_url,
-            "--target-port", "8501",
-            "--ingress", "external",
-            "--query", "properties.configuration.ingress.fqdn",
-            "--output", "tsv"
-        ], check=True)
-
-        # Get the FQDN
-        result = subprocess.run([
-            "az", "containerapp", "show",
-            "--name", app_name,
-            "--resource-group", resource_group,
-            "--query", "properties.configuration.ingress.fqdn",
-            "--output", "tsv"
-        ], capture_output=True, text=True, check=True)
-
-        fqdn = result.stdout.strip()
-        return f"https://{fqdn}"
-    except subprocess.CalledProcessError as e:
+
+        # Existing apps get an image-only update; the environment is only resolved
+        # (and created if missing) the first time an app is deployed
+        deployment = azure_mgmt.deploy_container_app(
+            app_name, resource_group, location, f"{app_name}-env", image_url,
+            target_port=8501, azure_config=azure_config
+        )
+        return f"https://{deployment['fqdn']}"
+    except Exception as e:
         raise RuntimeError(f"Deploy failed: {e}")
 
 
@@ -136,18 +108,8 @@ def get_container_app_logs(app_name: str, azure_config: dict) -> str:
         return "Simulated Azure Container Apps logs"
 
     try:
-        resource_group = azure_config["resource_group"]
-        
-        result = subprocess.run([
-            "az", "containerapp", "logs", "show",
-            "--name", app_name,
-            "--resource-group", resource_group,
-            "--follow", "false",
-            "--tail", "100"
-        ], capture_output=True, text=True, check=True)
-
-        return result.stdout
-    except subprocess.CalledProcessError as e:
+        return azure_mgmt.get_container_app_logs(app_name, azure_config["resource_group"], 100, azure_config)
+    except Exception as e:
         return f"Failed to retrieve logs: {e}"
 
 
@@ -159,16 +121,10 @@ def scale_container_app(app_name: str, azure_config: dict, min_replicas: int = 0
         return True
 
     try:
-        resource_group = azure_config["resource_group"]
-        
-        subprocess.run([
-            "az", "containerapp", "update",
-            "--name", app_name,
-            "--resource-group", resource_group,
-            "--min-replicas", str(min_replicas),
-            "--max-replicas", str(max_replicas)
-        ], check=True)
-
+        azure_mgmt.scale_container_app(
+            app_name, azure_config["resource_group"], min_replicas, max_replicas, azure_config
+        )
         return True
-    except subprocess.CalledProcessError:
-        return False
\ No newline at end of file
+    except Exception as e:
+        print(f"Error scaling container app {app_name}: {e}")
+        return False
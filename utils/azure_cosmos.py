@@ -1,60 +1,459 @@
+import atexit
+import contextlib
+import contextvars
 import datetime
 import os
-from azure.cosmos import CosmosClient, PartitionKey
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from azure.cosmos import CosmosClient, PartitionKey, exceptions
 from config import is_simulation_mode
 from dotenv import load_dotenv
 
 load_dotenv()
 
+DATABASE_NAME = "agentops"
+CONTAINER_NAME = "sessions"
+SUMMARY_CONTAINER_NAME = "session_summaries"
+SUMMARY_LEASE_ID = "change-feed-lease"
+
+# History reads filter on agent and order by timestamp; prompts and agent outputs
+# are large, never queried on, and only cost RUs to index on every write.
+INDEXING_POLICY = {
+    "indexingMode": "consistent",
+    "automatic": True,
+    "includedPaths": [{"path": "/*"}],
+    "excludedPaths": [
+        {"path": "/data/input/prompt_used/*"},
+        {"path": "/data/output/*"},
+        {"path": "/\"_etag\"/?"}
+    ],
+    "compositeIndexes": [
+        [{"path": "/agent", "order": "ascending"}, {"path": "/timestamp", "order": "descending"}]
+    ]
+}
+
+# Process-wide handles — created on first use so every call after that is a
+# single data-plane operation instead of client construction + provisioning.
+_client = None
+_database = None
+_container = None
+_summary_container = None
+_lock = threading.RLock()
+
+
 def get_cosmos_client():
-    """Initialize Azure Cosmos DB client"""
-    endpoint = os.getenv("AZURE_COSMOS_ENDPOINT")
-    key = os.getenv("AZURE_COSMOS_KEY")
-    
-    if not endpoint or not key:
-        raise ValueError("Azure Cosmos DB endpoint and key must be set")
-    
-    return CosmosClient(endpoint, key)
+    """Return the shared Azure Cosmos DB client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                endpoint = os.getenv("AZURE_COSMOS_ENDPOINT")
+                key = os.getenv("AZURE_COSMOS_KEY")
 
-def get_database_and_container():
-    """Get or create database and container"""
-    client = get_cosmos_client()
-    
-    database_name = "agentops"
-    container_name = "sessions"
-    
-    # Create database if it doesn't exist
-    database = client.create_database_if_not_exists(id=database_name)
-    
-    # Create container if it doesn't exist
-    container = database.create_container_if_not_exists(
-        id=container_name,
-        partition_key=PartitionKey(path="/session_id"),
-        offer_throughput=400
+                if not endpoint or not key:
+                    raise ValueError("Azure Cosmos DB endpoint and key must be set")
+
+                _client = CosmosClient(endpoint, key)
+    return _client
+
+
+def _indexing_policy_matches(current: dict) -> bool:
+    def paths(policy, key):
+        return sorted(p["path"] for p in policy.get(key, []))
+
+    def composites(policy):
+        return [[(p["path"], p.get("order", "ascending")) for p in c] for c in policy.get("compositeIndexes", [])]
+
+    return (
+        paths(current, "excludedPaths") == paths(INDEXING_POLICY, "excludedPaths")
+        and composites(current) == composites(INDEXING_POLICY)
     )
-    
-    return database, container
+
+
+def _apply_indexing_policy(database, container):
+    """Bring an existing container's indexing policy in line with INDEXING_POLICY"""
+    current = container.read().get("indexingPolicy", {})
+    if not _indexing_policy_matches(current):
+        # Cosmos re-indexes in the background; reads stay available meanwhile
+        database.replace_container(
+            container,
+            partition_key=PartitionKey(path="/session_id"),
+            indexing_policy=INDEXING_POLICY
+        )
+
+
+def get_database_and_container():
+    """Get the database and container, provisioning them once per process"""
+    global _database, _container
+    if _container is None:
+        with _lock:
+            if _container is None:
+                client = get_cosmos_client()
+
+                # Create database if it doesn't exist
+                database = client.create_database_if_not_exists(id=DATABASE_NAME)
+
+                # Create container if it doesn't exist
+                container = database.create_container_if_not_exists(
+                    id=CONTAINER_NAME,
+                    partition_key=PartitionKey(path="/session_id"),
+                    indexing_policy=INDEXING_POLICY,
+                    offer_throughput=int(os.getenv("AZURE_COSMOS_THROUGHPUT", "400"))
+                )
+                _apply_indexing_policy(database, container)
+                _database = database
+                _container = container
+
+    return _database, _container
+
+
+def get_summary_container():
+    """Get the session summary container (one document per session, partitioned by month)"""
+    global _summary_container
+    if _summary_container is None:
+        with _lock:
+            if _summary_container is None:
+                database, _ = get_database_and_container()
+                _summary_container = database.create_container_if_not_exists(
+                    id=SUMMARY_CONTAINER_NAME,
+                    partition_key=PartitionKey(path="/bucket")
+                )
+    return _summary_container
+
+
+def reset_cosmos_cache():
+    """Drop the cached client and container (e.g. after key rotation or a deleted container)"""
+    global _client, _database, _container, _summary_container
+    with _lock:
+        _client = None
+        _database = None
+        _container = None
+        _summary_container = None
+
+
+def _handle_cosmos_error(e: Exception):
+    # A deleted database/container invalidates the cached handles — re-provision next call
+    if isinstance(e, exceptions.CosmosResourceNotFoundError):
+        reset_cosmos_cache()
+
+
+class QueryMetrics:
+    """
+    Request charge (RU) and latency of every Cosmos DB call, per operation name.
+
+    Calls are also tagged with the scope active when they ran (see query_scope),
+    so each page can report what its own interactions cost.
+    """
+
+    def __init__(self, max_records: int = 5000):
+        self.max_records = max_records
+        self._records = []
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, request_charge: float, latency: float, items: int = 0, scope: str = None):
+        with self._lock:
+            self._records.append({
+                "operation": operation,
+                "scope": scope or _current_scope.get(),
+                "request_charge": request_charge,
+                "latency_ms": latency * 1000,
+                "items": items
+            })
+            del self._records[:-self.max_records]
+
+    def summary(self, scope: str = None) -> list:
+        """Per-operation totals (calls, RUs, items, avg/max latency), most expensive first"""
+        with self._lock:
+            records = [r for r in self._records if scope is None or r["scope"] == scope]
+        totals = {}
+        for r in records:
+            t = totals.setdefault(r["operation"], {
+                "operation": r["operation"], "calls": 0, "request_charge": 0.0,
+                "items": 0, "avg_latency_ms": 0.0, "max_latency_ms": 0.0
+            })
+            t["calls"] += 1
+            t["request_charge"] += r["request_charge"]
+            t["items"] += r["items"]
+            t["avg_latency_ms"] += (r["latency_ms"] - t["avg_latency_ms"]) / t["calls"]
+            t["max_latency_ms"] = max(t["max_latency_ms"], r["latency_ms"])
+        return sorted(totals.values(), key=lambda t: t["request_charge"], reverse=True)
+
+    def reset(self, scope: str = None):
+        with self._lock:
+            self._records = [r for r in self._records if scope is not None and r["scope"] != scope]
+
+
+# Bumped whenever session documents are written, so history caches know to refresh
+_history_version = 0
+_history_version_lock = threading.Lock()
+
+
+def _bump_history_version():
+    global _history_version
+    with _history_version_lock:
+        _history_version += 1
+
+
+def get_history_version() -> int:
+    """Counter that changes every time new session logs land in Cosmos DB"""
+    return _history_version
+
+
+_current_scope = contextvars.ContextVar("cosmos_query_scope", default=None)
+_metrics = QueryMetrics()
+
+
+def get_query_metrics() -> QueryMetrics:
+    return _metrics
+
+
+@contextlib.contextmanager
+def query_scope(name: str):
+    """Tag every Cosmos DB call made inside the block with `name` (e.g. a page)"""
+    token = _current_scope.set(name)
+    try:
+        yield
+    finally:
+        _current_scope.reset(token)
+
+
+def begin_query_scope(name: str):
+    """Start a fresh scope for the rest of this thread's work — used at the top of a page run"""
+    _metrics.reset(name)
+    _current_scope.set(name)
+
+
+class _ChargeCounter:
+    """response_hook that sums x-ms-request-charge over every backend response"""
+
+    def __init__(self):
+        self.request_charge = 0.0
+
+    def __call__(self, headers, _result=None):
+        try:
+            self.request_charge += float(headers.get("x-ms-request-charge", 0) or 0)
+        except (TypeError, ValueError):
+            pass
+
+
+class _ChangeFeedHook(_ChargeCounter):
+    """
+    _ChargeCounter that also keeps the etag — the change feed continuation — of the
+    latest feed page. Only responses after `armed` is set count: the SDK also calls
+    the hook once when the feed is created, with whatever headers the connection saw last.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.armed = False
+        self.etag = None
+
+    def __call__(self, headers, _result=None):
+        super().__call__(headers, _result)
+        if self.armed and headers.get("etag"):
+            self.etag = headers["etag"]
+
+
+def _query(operation: str, container, query: str, parameters: list = None, continuation: str = None,
+           max_pages: int = None, **kwargs):
+    """
+    Run a parameterized query page by page, recording its RU charge and latency.
+    Returns (items, continuation token or None).
+    """
+    charges = _ChargeCounter()
+    started = time.perf_counter()
+    items = []
+    try:
+        pages = container.query_items(
+            query=query, parameters=parameters or [], response_hook=charges, **kwargs
+        ).by_page(continuation)
+        for count, page in enumerate(pages, start=1):
+            items.extend(page)
+            if max_pages and count >= max_pages:
+                break
+        return items, pages.continuation_token
+    finally:
+        _metrics.record(operation, charges.request_charge, time.perf_counter() - started, len(items))
+
+
+class SessionLogWriter:
+    """
+    Background writer for session documents.
+
+    log_session only enqueues; a daemon thread drains the bounded queue, coalesces
+    documents per session (the latest write of a document id wins) and writes each
+    session's documents as Cosmos transactional batches on the /session_id partition.
+    If a batch fails its documents are retried one by one. Documents that can't be
+    queued are counted as dropped, writes that still fail as failed.
+    """
+
+    MAX_BATCH_OPERATIONS = 100  # Cosmos transactional batch limit
+
+    def __init__(self, max_queue: int = 1000, flush_interval: float = 0.5):
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._idle = threading.Condition()
+        self._in_flight = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="cosmos-session-writer", daemon=True)
+                    self._thread.start()
+
+    def submit(self, document: dict) -> bool:
+        """Queues a document for writing; returns False if the queue is full."""
+        self._ensure_started()
+        with self._idle:
+            self._in_flight += 1
+        try:
+            self._queue.put_nowait(document)
+            return True
+        except queue.Full:
+            with self._idle:
+                self.dropped += 1
+            self._done(1)
+            print(f"Cosmos DB log queue full — dropped {document.get('id')}")
+            return False
+
+    def _done(self, count: int):
+        with self._idle:
+            self._in_flight -= count
+            if self._in_flight == 0:
+                self._idle.notify_all()
+
+    def _drain(self) -> list:
+        documents = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(documents) < self._queue.maxsize:
+            try:
+                documents.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return documents
+
+    def _run(self):
+        while True:
+            documents = self._drain()
+            try:
+                self._write(documents)
+            finally:
+                self._done(len(documents))
+
+    def _write(self, documents: list):
+        by_session = {}
+        for document in documents:
+            by_session.setdefault(document["session_id"], {})[document["id"]] = document
+
+        try:
+            _, container = get_database_and_container()
+        except Exception as e:
+            self.failed += sum(len(docs) for docs in by_session.values())
+            print(f"Error logging to Cosmos DB: {e}")
+            return
+
+        for session_id, docs in by_session.items():
+            docs = list(docs.values())
+            for i in range(0, len(docs), self.MAX_BATCH_OPERATIONS):
+                chunk = docs[i:i + self.MAX_BATCH_OPERATIONS]
+                charges = _ChargeCounter()
+                started = time.perf_counter()
+                try:
+                    container.execute_item_batch(
+                        batch_operations=[("upsert", (doc,)) for doc in chunk],
+                        partition_key=session_id,
+                        response_hook=charges
+                    )
+                    _metrics.record("log_session_batch", charges.request_charge, time.perf_counter() - started, len(chunk))
+                    self.written += len(chunk)
+                    _bump_history_version()
+                except Exception as e:
+                    _handle_cosmos_error(e)
+                    self._write_individually(chunk)
+
+    def _write_individually(self, documents: list):
+        for document in documents:
+            try:
+                _, container = get_database_and_container()
+                container.upsert_item(document)
+                self.written += 1
+                _bump_history_version()
+            except Exception as e:
+                _handle_cosmos_error(e)
+                self.failed += 1
+                print(f"Error logging to Cosmos DB: {e}")
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Blocks until every queued document has been written or has failed."""
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed
+        }
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_session_writer() -> SessionLogWriter:
+    """Return the process-wide SessionLogWriter (flushed automatically at exit)"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = SessionLogWriter(
+                    max_queue=int(os.getenv("AZURE_COSMOS_LOG_QUEUE_SIZE", "1000"))
+                )
+                atexit.register(_writer.flush)
+    return _writer
+
+
+def flush_session_logs(timeout: float = 10.0) -> dict:
+    """Wait for pending session logs to be written and return the writer stats"""
+    writer = get_session_writer()
+    writer.flush(timeout)
+    return writer.stats()
+
 
 def log_session(session_id: str, agent: str, data: dict):
-    """Log session data to Azure Cosmos DB"""
+    """Log session data to Azure Cosmos DB (queued — written in the background)"""
     if is_simulation_mode():
         return  # Don't log in simulation mode
 
-    try:
-        _, container = get_database_and_container()
-        
-        # Create document structure
-        document = {
-            "id": f"{session_id}_{agent}",
-            "session_id": session_id,
-            "agent": agent,
-            "data": data,
-            "timestamp": datetime.datetime.utcnow().isoformat()
-        }
-        
-        container.upsert_item(document)
-    except Exception as e:
-        print(f"Error logging to Cosmos DB: {e}")
+    # Create document structure
+    document = {
+        "id": f"{session_id}_{agent}",
+        "session_id": session_id,
+        "agent": agent,
+        "data": data,
+        "timestamp": datetime.datetime.utcnow().isoformat()
+    }
+
+    writer = get_session_writer()
+    writer.submit(document)
+    if os.getenv("AZURE_COSMOS_SYNC_WRITES", "").lower() in ("1", "true"):
+        writer.flush()
+
 
 def fetch_agent_history(agent: str, limit=5):
     """Fetch agent history from Azure Cosmos DB"""
@@ -70,8 +469,13 @@ def fetch_agent_history(agent: str, limit=5):
     try:
         _, container = get_database_and_container()
         
-        query = f"SELECT * FROM c WHERE c.agent = '{agent}' ORDER BY c.timestamp DESC OFFSET 0 LIMIT {limit}"
-        items = list(container.query_items(query=query, enable_cross_partition_query=True))
+        # ORDER BY both composite-index fields so the (agent, timestamp) index serves the sort
+        query = "SELECT * FROM c WHERE c.agent = @agent ORDER BY c.agent, c.timestamp DESC OFFSET 0 LIMIT @limit"
+        items, _ = _query(
+            "fetch_agent_history", container, query,
+            parameters=[{"name": "@agent", "value": agent}, {"name": "@limit", "value": int(limit)}],
+            enable_cross_partition_query=True
+        )
         
         results = []
         for item in items:
@@ -83,9 +487,241 @@ def fetch_agent_history(agent: str, limit=5):
         
         return results
     except Exception as e:
+        _handle_cosmos_error(e)
         print(f"Error fetching from Cosmos DB: {e}")
         return []
 
+def fetch_recent_history(agents: list, limit: int = 5, max_workers: int = 8) -> dict:
+    """
+    Fetch the last `limit` entries for every agent at once. Cosmos SQL has no
+    per-group TOP, so the per-agent queries (each served by the (agent, timestamp)
+    composite index) run concurrently; total latency is the slowest one, not the sum.
+    """
+    if is_simulation_mode() or not agents:
+        return {agent: fetch_agent_history(agent, limit) for agent in agents}
+
+    try:
+        get_database_and_container()  # provision once before fanning out
+    except Exception as e:
+        _handle_cosmos_error(e)
+        print(f"Error fetching from Cosmos DB: {e}")
+        return {agent: [] for agent in agents}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(agents))) as pool:
+        # copy_context keeps the caller's query scope on the metrics recorded in worker threads
+        futures = {
+            agent: pool.submit(contextvars.copy_context().run, fetch_agent_history, agent, limit)
+            for agent in agents
+        }
+        return {agent: future.result() for agent, future in futures.items()}
+
+
+# Only the fields the history table shows — prompts and full outputs stay on the server
+HISTORY_PROJECTION = (
+    "c.session_id, c.agent, c.timestamp, c.data.status AS status, "
+    "c.data.input.repo_url AS repo, c.data.input.mode AS mode, "
+    "c.data.output.issues_found AS issues_found"
+)
+
+
+def _history_row(item: dict) -> dict:
+    return {
+        "session_id": item.get("session_id"),
+        "agent": item.get("agent"),
+        "timestamp": item.get("timestamp"),
+        "repo": item.get("repo", "N/A"),
+        "mode": item.get("mode", "production"),
+        "status": item.get("status", "unknown"),
+        "issues_found": str(item.get("issues_found", "N/A")),
+    }
+
+
+def build_history_query(mode=None, status=None, agent=None, since=None, until=None):
+    """Return (query, parameters) for the projected, filtered history query"""
+    filters, parameters = [], []
+    for field, name, value in (
+        ("c.data.input.mode", "@mode", mode),
+        ("c.data.status", "@status", status),
+        ("c.agent", "@agent", agent),
+    ):
+        if value:
+            filters.append(f"{field} = {name}")
+            parameters.append({"name": name, "value": value})
+    if since:
+        filters.append("c.timestamp >= @since")
+        parameters.append({"name": "@since", "value": since})
+    if until:
+        filters.append("c.timestamp < @until")
+        parameters.append({"name": "@until", "value": until})
+
+    where = f" WHERE {' AND '.join(filters)}" if filters else ""
+    return f"SELECT {HISTORY_PROJECTION} FROM c{where} ORDER BY c.timestamp DESC", parameters
+
+
+def fetch_sessions_page(
+    page_size: int = 50,
+    continuation: str = None,
+    mode: str = None,
+    status: str = None,
+    agent: str = None,
+    since: str = None,
+    until: str = None
+):
+    """
+    Fetch one page of history rows (newest first) with server-side filters.
+    `since`/`until` are ISO timestamps. Returns (rows, continuation token for the
+    next page or None when there are no more pages).
+    """
+    if is_simulation_mode():
+        return [], None
+
+    try:
+        _, container = get_database_and_container()
+
+        query, parameters = build_history_query(mode, status, agent, since, until)
+        page, next_token = _query(
+            "fetch_sessions_page", container, query, parameters,
+            continuation=continuation, max_pages=1,
+            enable_cross_partition_query=True, max_item_count=page_size
+        )
+
+        return [_history_row(item) for item in page], next_token
+    except Exception as e:
+        _handle_cosmos_error(e)
+        print(f"Error fetching sessions page from Cosmos DB: {e}")
+        return [], None
+
+
+def summary_bucket(timestamp: str) -> str:
+    """Summary partition for a timestamp — its month, e.g. 2025-06"""
+    return (timestamp or "")[:7] or "unknown"
+
+
+def _merge_summary(summary: dict, item: dict) -> dict:
+    data = item.get("data") or {}
+    inputs = data.get("input") if isinstance(data.get("input"), dict) else {}
+    timestamp = item.get("timestamp", "")
+
+    summary.setdefault("agents", {})[item["agent"]] = data.get("status", "unknown")
+    summary["started_at"] = min(filter(None, [summary.get("started_at"), timestamp]), default=timestamp)
+    summary["updated_at"] = max(filter(None, [summary.get("updated_at"), timestamp]), default=timestamp)
+    if inputs.get("repo_url"):
+        summary["repo"] = inputs["repo_url"]
+    if inputs.get("mode"):
+        summary["mode"] = inputs["mode"]
+
+    statuses = summary["agents"].values()
+    summary["status"] = "error" if "error" in statuses else "warning" if "warning" in statuses else "success"
+    return summary
+
+
+def sync_session_summaries(max_item_count: int = 500) -> int:
+    """
+    Fold new session documents from the change feed into the summary container.
+
+    The change feed continuation is stored in a lease document in the summary
+    container, so each call only reads documents written since the last one.
+    Returns the number of summaries upserted.
+    """
+    if is_simulation_mode():
+        return 0
+    return _sync_session_summaries(max_item_count)
+
+
+def _sync_session_summaries(max_item_count: int = 500) -> int:
+    try:
+        _, container = get_database_and_container()
+        summaries = get_summary_container()
+
+        try:
+            lease = summaries.read_item(SUMMARY_LEASE_ID, partition_key="_lease")
+        except exceptions.CosmosResourceNotFoundError:
+            lease = {"id": SUMMARY_LEASE_ID, "bucket": "_lease", "continuation": None}
+
+        charges = _ChangeFeedHook()
+        started = time.perf_counter()
+        if lease.get("continuation"):
+            feed = container.query_items_change_feed(
+                continuation=lease["continuation"], max_item_count=max_item_count, response_hook=charges
+            )
+        else:
+            feed = container.query_items_change_feed(
+                start_time="Beginning", max_item_count=max_item_count, response_hook=charges
+            )
+
+        changed = {}
+        charges.armed = True
+        for item in feed:
+            session_id = item["session_id"]
+            if session_id not in changed:
+                bucket = summary_bucket(item.get("timestamp"))
+                try:
+                    changed[session_id] = summaries.read_item(session_id, partition_key=bucket)
+                except exceptions.CosmosResourceNotFoundError:
+                    changed[session_id] = {"id": session_id, "session_id": session_id, "bucket": bucket}
+            _merge_summary(changed[session_id], item)
+        continuation = charges.etag
+        _metrics.record("sync_session_summaries", charges.request_charge, time.perf_counter() - started, len(changed))
+
+        for summary in changed.values():
+            summaries.upsert_item(summary)
+        if continuation:
+            lease["continuation"] = continuation
+            summaries.upsert_item(lease)
+        return len(changed)
+    except Exception as e:
+        _handle_cosmos_error(e)
+        print(f"Error syncing session summaries in Cosmos DB: {e}")
+        return 0
+
+
+_summary_sync = {"thread": None, "started": None}
+_summary_sync_lock = threading.Lock()
+
+
+def sync_session_summaries_in_background(min_interval: float = None) -> bool:
+    """
+    Start sync_session_summaries on a daemon thread, unless one is still running or
+    one started less than `min_interval` seconds ago (AZURE_COSMOS_SUMMARY_SYNC_INTERVAL).
+    Returns True when a sync was started. Pages call this instead of syncing inline.
+    """
+    if is_simulation_mode():
+        return False
+    if min_interval is None:
+        min_interval = float(os.getenv("AZURE_COSMOS_SUMMARY_SYNC_INTERVAL", "60"))
+    with _summary_sync_lock:
+        thread, started = _summary_sync["thread"], _summary_sync["started"]
+        if thread is not None and thread.is_alive():
+            return False
+        if started is not None and time.monotonic() - started < min_interval:
+            return False
+        _summary_sync["started"] = time.monotonic()
+        # The UI mode lives in Streamlit session state, so it is checked above, on the page's thread
+        _summary_sync["thread"] = threading.Thread(
+            target=_sync_session_summaries, name="cosmos-summary-sync", daemon=True
+        )
+        _summary_sync["thread"].start()
+        return True
+
+
+def fetch_session_summaries(month: str, limit: int = 50) -> list:
+    """List session summaries for one month — a single-partition query"""
+    if is_simulation_mode():
+        return []
+
+    try:
+        query = "SELECT * FROM c ORDER BY c.updated_at DESC OFFSET 0 LIMIT @limit"
+        items, _ = _query(
+            "fetch_session_summaries", get_summary_container(), query,
+            parameters=[{"name": "@limit", "value": limit}], partition_key=month
+        )
+        return items
+    except Exception as e:
+        _handle_cosmos_error(e)
+        print(f"Error fetching session summaries from Cosmos DB: {e}")
+        return []
+
+
 def fetch_all_sessions():
     """Fetch all sessions from Azure Cosmos DB"""
     if is_simulation_mode():
@@ -106,7 +742,7 @@ def fetch_all_sessions():
         _, container = get_database_and_container()
         
         query = "SELECT * FROM c ORDER BY c.timestamp DESC"
-        items = list(container.query_items(query=query, enable_cross_partition_query=True))
+        items, _ = _query("fetch_all_sessions", container, query, enable_cross_partition_query=True)
         
         # Group by session_id
         sessions = {}
@@ -121,5 +757,6 @@ def fetch_all_sessions():
         
         return sessions
     except Exception as e:
+        _handle_cosmos_error(e)
         print(f"Error fetching all sessions from Cosmos DB: {e}")
         return {}
\ No newline at end of file
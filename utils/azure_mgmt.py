@@ -0,0 +1,429 @@
+import codecs
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from utils.build_context import pack_context
+from dotenv import load_dotenv
+
+try:
+    from azure.core.exceptions import ResourceNotFoundError
+    from azure.core.pipeline.transport import RequestsTransport
+    from azure.identity import DefaultAzureCredential
+except ImportError:  # optional — only needed in production mode
+    DefaultAzureCredential = None
+    RequestsTransport = None
+
+    class ResourceNotFoundError(Exception):
+        pass
+
+try:
+    from azure.mgmt.appcontainers import ContainerAppsAPIClient
+    from azure.mgmt.appcontainers import models as app_models
+except ImportError:
+    ContainerAppsAPIClient = None
+    app_models = None
+
+try:
+    from azure.mgmt.containerregistry import ContainerRegistryManagementClient
+    from azure.mgmt.containerregistry import models as acr_models
+except ImportError:
+    ContainerRegistryManagementClient = None
+    acr_models = None
+
+try:
+    from azure.containerregistry import ContainerRegistryClient
+except ImportError:
+    ContainerRegistryClient = None
+
+load_dotenv()
+
+ACR_RUN_TERMINAL_STATES = {"Succeeded", "Failed", "Canceled", "Error", "Timeout"}
+
+
+class AzureManagementClients:
+    """
+    In-process Container Apps and ACR management clients for one subscription.
+
+    Both SDK clients share one credential — so one token cache and one sign-in per
+    process instead of one per `az` invocation — and one pooled keep-alive
+    `requests.Session` as their HTTP transport. The same session is used for the
+    plain HTTPS calls around them (source uploads, log streams).
+    """
+
+    def __init__(self, subscription_id: str, credential=None, pool_size: int = None):
+        if not subscription_id:
+            raise ValueError("Azure subscription id must be set (AZURE_SUBSCRIPTION_ID)")
+        if credential is None and DefaultAzureCredential is None:
+            raise RuntimeError("azure-identity is not installed")
+
+        self.subscription_id = subscription_id
+        self.credential = credential or DefaultAzureCredential()
+        pool_size = pool_size or int(os.getenv("AZURE_MGMT_POOL_SIZE", "10"))
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._container_apps = None
+        self._registry = None
+        self._registry_data = {}
+        # (resource group, environment name) -> resource id, for environments known to exist
+        self.environments = {}
+
+    def _transport(self):
+        # session_owner=False keeps the shared session open when a client is closed
+        return RequestsTransport(session=self.session, session_owner=False) if RequestsTransport else None
+
+    @property
+    def container_apps(self):
+        if self._container_apps is None:
+            if ContainerAppsAPIClient is None:
+                raise RuntimeError("azure-mgmt-appcontainers is not installed")
+            with self._lock:
+                if self._container_apps is None:
+                    self._container_apps = ContainerAppsAPIClient(
+                        self.credential, self.subscription_id, transport=self._transport()
+                    )
+        return self._container_apps
+
+    @property
+    def registry(self):
+        if self._registry is None:
+            if ContainerRegistryManagementClient is None:
+                raise RuntimeError("azure-mgmt-containerregistry is not installed")
+            with self._lock:
+                if self._registry is None:
+                    self._registry = ContainerRegistryManagementClient(
+                        self.credential, self.subscription_id, transport=self._transport()
+                    )
+        return self._registry
+
+    def registry_data(self, registry: str):
+        """Data-plane client (repositories, tags, manifests) for one registry"""
+        if ContainerRegistryClient is None:
+            raise RuntimeError("azure-containerregistry is not installed")
+        with self._lock:
+            if registry not in self._registry_data:
+                self._registry_data[registry] = ContainerRegistryClient(
+                    f"https://{registry}.azurecr.io", self.credential,
+                    audience="https://management.azure.com", transport=self._transport()
+                )
+            return self._registry_data[registry]
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_mgmt_clients(azure_config: dict = None) -> AzureManagementClients:
+    """Return the process-wide management clients for the configured subscription"""
+    subscription_id = (azure_config or {}).get("subscription_id") or os.getenv("AZURE_SUBSCRIPTION_ID")
+    clients = _clients.get(subscription_id)
+    if clients is None:
+        with _clients_lock:
+            clients = _clients.get(subscription_id)
+            if clients is None:
+                clients = _clients[subscription_id] = AzureManagementClients(subscription_id)
+    return clients
+
+
+def reset_mgmt_clients():
+    """Drop the cached clients (e.g. after rotating credentials)"""
+    with _clients_lock:
+        _clients.clear()
+
+
+# === Container Apps ===
+
+def list_container_apps(resource_group: str, azure_config: dict = None) -> list:
+    """Names of the container apps in a resource group"""
+    apps = get_mgmt_clients(azure_config).container_apps.container_apps
+    return [app.name for app in apps.list_by_resource_group(resource_group)]
+
+
+def get_container_app(app_name: str, resource_group: str, azure_config: dict = None) -> dict:
+    """Provisioning state, ingress FQDN, scale settings and latest revision of a container app"""
+    app = get_mgmt_clients(azure_config).container_apps.container_apps.get(resource_group, app_name)
+    ingress = app.configuration.ingress if app.configuration else None
+    scale = app.template.scale if app.template else None
+    return {
+        "provisioningState": app.provisioning_state or "Unknown",
+        "fqdn": ingress.fqdn if ingress else None,
+        "replicas": {"minReplicas": scale.min_replicas, "maxReplicas": scale.max_replicas} if scale else None,
+        "latestRevisionName": app.latest_revision_name,
+        "latestReadyRevisionName": app.latest_ready_revision_name,
+    }
+
+
+def list_container_app_revisions(app_name: str, resource_group: str, azure_config: dict = None) -> list:
+    """Revisions of a container app as [{name, createdTime, active}], newest first"""
+    revisions = get_mgmt_clients(azure_config).container_apps.container_apps_revisions
+    items = [
+        {"name": r.name, "createdTime": r.created_time.isoformat() if r.created_time else "", "active": r.active}
+        for r in revisions.list_revisions(resource_group, app_name)
+    ]
+    return sorted(items, key=lambda r: r["createdTime"], reverse=True)
+
+
+def set_container_app_traffic(app_name: str, resource_group: str, revision_weights: dict, azure_config: dict = None):
+    """Route ingress traffic by revision, e.g. {"myapp--rev2": 100}"""
+    client = get_mgmt_clients(azure_config).container_apps
+    app = client.container_apps.get(resource_group, app_name)
+    app.configuration.ingress.traffic = [
+        app_models.TrafficWeight(revision_name=name, weight=weight) for name, weight in revision_weights.items()
+    ]
+    client.container_apps.begin_update(resource_group, app_name, app).result()
+
+
+def scale_container_app(app_name: str, resource_group: str, min_replicas: int, max_replicas: int,
+                        azure_config: dict = None):
+    client = get_mgmt_clients(azure_config).container_apps
+    app = client.container_apps.get(resource_group, app_name)
+    app.template.scale = app_models.Scale(min_replicas=min_replicas, max_replicas=max_replicas)
+    client.container_apps.begin_update(resource_group, app_name, app).result()
+
+
+def ensure_managed_environment(env_name: str, resource_group: str, location: str, azure_config: dict = None) -> str:
+    """
+    Return the resource id of a Container Apps environment, creating it if it doesn't
+    exist. Ids are cached per process, so a known environment costs no round trip.
+    """
+    clients = get_mgmt_clients(azure_config)
+    key = (resource_group, env_name)
+    if key in clients.environments:
+        return clients.environments[key]
+
+    environments = clients.container_apps.managed_environments
+    try:
+        environment_id = environments.get(resource_group, env_name).id
+    except ResourceNotFoundError:
+        poller = environments.begin_create_or_update(
+            resource_group, env_name, app_models.ManagedEnvironment(location=location)
+        )
+        environment_id = poller.result().id
+    clients.environments[key] = environment_id
+    return environment_id
+
+
+def create_or_update_container_app(app_name: str, resource_group: str, location: str, environment_id: str,
+                                   image_url: str, target_port: int = 8501, azure_config: dict = None) -> str:
+    """Create or replace a container app with external ingress; returns its FQDN"""
+    clients = get_mgmt_clients(azure_config)
+    app = app_models.ContainerApp(
+        location=location,
+        managed_environment_id=environment_id,
+        configuration=app_models.Configuration(
+            ingress=app_models.Ingress(external=True, target_port=target_port)
+        ),
+        template=app_models.Template(
+            containers=[app_models.Container(name=app_name, image=image_url)]
+        ),
+    )
+    result = clients.container_apps.container_apps.begin_create_or_update(resource_group, app_name, app).result()
+    return result.configuration.ingress.fqdn
+
+
+def update_container_app_image(app_name: str, resource_group: str, location: str, image_url: str,
+                               azure_config: dict = None) -> str:
+    """
+    Point an existing app at a new image; returns its FQDN. Raises ResourceNotFoundError
+    when the app doesn't exist.
+
+    ARM PATCH replaces arrays wholesale, so the app's whole container list is sent back
+    with only the image changed — env vars, resources, probes and sidecars are kept.
+    The image goes to the container named after the app, or the first one. The list is
+    read right before the PATCH (two round trips), so changes made outside this process
+    — a sidecar added in the portal, an env var set by another replica — are not
+    reverted by a stale copy.
+    """
+    clients = get_mgmt_clients(azure_config)
+    apps = clients.container_apps.container_apps
+    app = apps.get(resource_group, app_name)
+    template = getattr(app, "template", None)
+    containers = list(template.containers or []) if template is not None else []
+    if not containers:
+        raise ValueError(f"Container app {app_name} has no containers to update")
+
+    target = next((c for c in containers if c.name == app_name), containers[0])
+    target.image = image_url
+    patch = app_models.ContainerApp(location=location, template=app_models.Template(containers=containers))
+    result = apps.begin_update(resource_group, app_name, patch).result()
+    ingress = result.configuration.ingress if result is not None and result.configuration else None
+    return ingress.fqdn if ingress else None
+
+
+def deploy_container_app(app_name: str, resource_group: str, location: str, env_name: str, image_url: str,
+                         target_port: int = 8501, azure_config: dict = None) -> dict:
+    """
+    Idempotent deploy: roll an existing app to `image_url` with a read and an
+    image-only update; only when the app is missing (404) make sure its environment
+    exists and create it.
+    Returns {"action": "updated" | "created", "fqdn": ...}.
+    """
+    try:
+        fqdn = update_container_app_image(app_name, resource_group, location, image_url, azure_config)
+        if fqdn:
+            return {"action": "updated", "fqdn": fqdn}
+        # Update response carried no ingress (e.g. still provisioning) — read it once
+        return {"action": "updated", "fqdn": get_container_app(app_name, resource_group, azure_config)["fqdn"]}
+    except ResourceNotFoundError:
+        pass
+
+    environment_id = ensure_managed_environment(env_name, resource_group, location, azure_config)
+    fqdn = create_or_update_container_app(
+        app_name, resource_group, location, environment_id, image_url, target_port, azure_config
+    )
+    return {"action": "created", "fqdn": fqdn}
+
+
+def get_container_app_logs(app_name: str, resource_group: str, tail: int = 100, azure_config: dict = None) -> str:
+    """Recent console output of the app's latest ready revision (first replica, first container)"""
+    clients = get_mgmt_clients(azure_config)
+    client = clients.container_apps
+    app = client.container_apps.get(resource_group, app_name)
+    revision = app.latest_ready_revision_name or app.latest_revision_name
+    replicas = client.container_apps_revision_replicas.list_replicas(resource_group, app_name, revision).value
+    endpoint = next(
+        (c.log_stream_endpoint for r in replicas or [] for c in r.containers or [] if c.log_stream_endpoint), None
+    )
+    if not endpoint:
+        return ""
+
+    token = client.container_apps.get_auth_token(resource_group, app_name).token
+    response = clients.session.get(
+        endpoint,
+        params={"follow": "false", "tailLines": str(tail), "output": "text"},
+        headers={"Authorization": f"Bearer {token}"},
+        timeout=(10, 60)
+    )
+    response.raise_for_status()
+    return response.text
+
+
+# === Container Registry ===
+
+def acr_image_exists(registry: str, repository: str, tag: str, azure_config: dict = None) -> bool:
+    """True when `repository:tag` already has a manifest in the registry"""
+    try:
+        get_mgmt_clients(azure_config).registry_data(registry).get_tag_properties(repository, tag)
+        return True
+    except ResourceNotFoundError:
+        return False
+
+
+def acr_refresh_token(registry: str, azure_config: dict = None) -> str:
+    """
+    Exchange the shared credential's AAD token for an ACR refresh token, usable as the
+    password for `docker login` with the all-zeros user name.
+    """
+    clients = get_mgmt_clients(azure_config)
+    login_server = f"{registry}.azurecr.io"
+    aad_token = clients.credential.get_token("https://management.azure.com/.default").token
+    response = clients.session.post(
+        f"https://{login_server}/oauth2/exchange",
+        data={"grant_type": "access_token", "service": login_server, "access_token": aad_token},
+        timeout=(10, 60)
+    )
+    response.raise_for_status()
+    return response.json()["refresh_token"]
+
+
+class _RunLogTail:
+    """Incrementally reads an ACR run log blob with Range requests and emits complete lines"""
+
+    def __init__(self, session, log_url: str, on_line):
+        self.session = session
+        self.log_url = log_url
+        self.on_line = on_line
+        self.offset = 0
+        self.pending = ""
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def pull(self):
+        response = self.session.get(self.log_url, headers={"Range": f"bytes={self.offset}-"}, timeout=(10, 60))
+        if response.status_code in (404, 416):  # not created yet / nothing new
+            return
+        response.raise_for_status()
+        self.offset += len(response.content)
+        *lines, self.pending = (self.pending + self._decoder.decode(response.content)).split("\n")
+        for line in lines:
+            self.on_line(line)
+
+    def finish(self):
+        self.pull()
+        if self.pending:
+            self.on_line(self.pending)
+            self.pending = ""
+
+
+def acr_build(registry: str, resource_group: str, context_dir: str, image: str,
+              dockerfile: str = "Dockerfile", timeout: float = 3600, poll_interval: float = 2,
+              on_output=None, azure_config: dict = None) -> str:
+    """
+    Build `image` from `context_dir` with an ACR quick task and push it to `registry`.
+    Uploads the context to the registry's build-source blob, schedules the run and
+    waits for it, passing each run log line to `on_output` while it runs.
+    Returns the run id; raises RuntimeError if the run doesn't succeed.
+    """
+    clients = get_mgmt_clients(azure_config)
+    client = clients.registry
+
+    archive = pack_context(context_dir, dockerfile)
+    try:
+        upload = client.registries.get_build_source_upload_url(resource_group, registry)
+        with open(archive, "rb") as f:
+            response = clients.session.put(
+                upload.upload_url, data=f, headers={"x-ms-blob-type": "BlockBlob"}, timeout=(10, 600)
+            )
+        response.raise_for_status()
+    finally:
+        os.remove(archive)
+
+    request = acr_models.DockerBuildRequest(
+        image_names=[image],
+        is_push_enabled=True,
+        source_location=upload.relative_path,
+        docker_file_path=dockerfile,
+        platform=acr_models.PlatformProperties(os="Linux"),
+        timeout=int(timeout),
+    )
+    run = client.registries.begin_schedule_run(resource_group, registry, request).result()
+
+    tail = None
+    if on_output is not None:
+        try:
+            log_url = client.runs.get_log_sas_url(resource_group, registry, run.run_id).log_link
+            tail = _RunLogTail(clients.session, log_url, on_output)
+        except Exception as e:
+            print(f"Could not stream logs of ACR run {run.run_id}: {e}")
+
+    def _pull(final=False):
+        nonlocal tail
+        if tail is None:
+            return
+        try:
+            if final:
+                tail.finish()
+            else:
+                tail.pull()
+        except Exception as e:
+            # Log streaming is best effort — never fail the build over it
+            print(f"Stopped streaming logs of ACR run {run.run_id}: {e}")
+            tail = None
+
+    deadline = time.monotonic() + timeout
+    while run.status not in ACR_RUN_TERMINAL_STATES:
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"ACR run {run.run_id} timed out after {timeout:.0f}s")
+        _pull()
+        time.sleep(poll_interval)
+        run = client.runs.get(resource_group, registry, run.run_id)
+    _pull(final=True)
+
+    if run.status != "Succeeded":
+        raise RuntimeError(f"ACR run {run.run_id} finished with status {run.status}")
+    return run.run_id
@@ -1,63 +1,312 @@
+import email.utils
+import json
 import os
+import random
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from config import is_simulation_mode
+from utils.llm_cache import get_llm_cache, make_cache_key
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def azure_openai_prompt(messages: list, model="gpt-4") -> str:
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _format_messages(messages: list) -> list:
+    """Convert agent messages to OpenAI chat format"""
+    formatted_messages = []
+    for msg in messages:
+        if isinstance(msg, str):
+            formatted_messages.append({"role": "user", "content": msg})
+        elif isinstance(msg, dict):
+            if "text" in msg:
+                formatted_messages.append({"role": "user", "content": msg["text"]})
+            elif "parts" in msg:
+                content = ""
+                for part in msg["parts"]:
+                    if isinstance(part, str):
+                        content += part
+                    elif isinstance(part, dict) and "text" in part:
+                        content += part["text"]
+                formatted_messages.append({"role": "user", "content": content})
+            else:
+                formatted_messages.append({"role": "user", "content": str(msg)})
+    return formatted_messages
+
+
+class AzureOpenAIClient:
     """
-    Uses Azure OpenAI Service instead of Google Gemini
+    Reusable Azure OpenAI chat client shared by every agent.
+
+    Holds a pooled keep-alive `requests.Session`, applies connect/read timeouts,
+    retries 429/5xx responses and connection errors with exponential backoff
+    (honoring `Retry-After` / `retry-after-ms`), and caps the number of requests
+    in flight so parallel pipeline runs don't trip rate limits together.
+
+    Completions are served from the configured LLMCache when an identical request
+    (deployment, API version, normalized messages, temperature, max_tokens) was
+    answered before.
     """
-    if is_simulation_mode():
-        return "[SIMULATED AZURE OPENAI RESPONSE]"
 
-    try:
-        api_key = os.getenv("AZURE_OPENAI_API_KEY")
-        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-        deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", model)
-        api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
-        
-        if not api_key or not endpoint:
+    def __init__(
+        self,
+        api_key: str = None,
+        endpoint: str = None,
+        deployment_name: str = None,
+        api_version: str = None,
+        connect_timeout: float = None,
+        read_timeout: float = None,
+        max_retries: int = None,
+        max_concurrency: int = None,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        cache=None
+    ):
+        self.api_key = api_key or os.getenv("AZURE_OPENAI_API_KEY")
+        self.endpoint = (endpoint or os.getenv("AZURE_OPENAI_ENDPOINT") or "").rstrip("/")
+        self.deployment_name = deployment_name or os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
+        self.api_version = api_version or os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
+
+        if not self.api_key or not self.endpoint:
             raise ValueError("Azure OpenAI API key and endpoint must be set")
 
-        url = f"{endpoint}/openai/deployments/{deployment_name}/chat/completions?api-version={api_version}"
-
-        # Convert messages to OpenAI format
-        formatted_messages = []
-        for msg in messages:
-            if isinstance(msg, str):
-                formatted_messages.append({"role": "user", "content": msg})
-            elif isinstance(msg, dict):
-                if "text" in msg:
-                    formatted_messages.append({"role": "user", "content": msg["text"]})
-                elif "parts" in msg:
-                    content = ""
-                    for part in msg["parts"]:
-                        if isinstance(part, str):
-                            content += part
-                        elif isinstance(part, dict) and "text" in part:
-                            content += part["text"]
-                    formatted_messages.append({"role": "user", "content": content})
-                else:
-                    formatted_messages.append({"role": "user", "content": str(msg)})
+        self.timeout = (
+            connect_timeout or float(os.getenv("AZURE_OPENAI_CONNECT_TIMEOUT", "10")),
+            read_timeout or float(os.getenv("AZURE_OPENAI_TIMEOUT", "120"))
+        )
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("AZURE_OPENAI_MAX_RETRIES", "5"))
+        self.max_concurrency = max_concurrency or int(os.getenv("AZURE_OPENAI_MAX_CONCURRENCY", "8"))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.cache = cache if cache is not None else get_llm_cache()
+
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "api-key": self.api_key
+        })
+
+    def url(self, model: str = "gpt-4") -> str:
+        deployment_name = self.deployment_name or model
+        return f"{self.endpoint}/openai/deployments/{deployment_name}/chat/completions?api-version={self.api_version}"
+
+    def _retry_delay(self, attempt: int, response: requests.Response = None) -> float:
+        if response is not None:
+            retry_after_ms = response.headers.get("retry-after-ms")
+            if retry_after_ms:
+                try:
+                    return min(float(retry_after_ms) / 1000, self.backoff_max)
+                except ValueError:
+                    pass
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.backoff_max)
+                except ValueError:
+                    parsed = email.utils.parsedate_to_datetime(retry_after)
+                    if parsed:
+                        return min(max(parsed.timestamp() - time.time(), 0.0), self.backoff_max)
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def post(self, payload: dict, model: str = "gpt-4", stream: bool = False) -> requests.Response:
+        """
+        POSTs a chat completion request, retrying throttled and transient failures.
+
+        With stream=True the concurrency slot stays held after the headers arrive, so
+        the body being streamed still counts against max_concurrency; pass the
+        response to release() once it has been consumed.
+        """
+        attempt = 0
+        while True:
+            response = None
+            error = None
+            held = False
+            self._semaphore.acquire()
+            try:
+                response = self.session.post(self.url(model), json=payload, timeout=self.timeout, stream=stream)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    held = stream
+                    return response
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            finally:
+                if not held:
+                    self._semaphore.release()
+
+            if attempt >= self.max_retries:
+                if error:
+                    raise error
+                response.raise_for_status()
 
+            delay = self._retry_delay(attempt, response)
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def release(self, response: requests.Response):
+        """Closes a response returned by post(stream=True) and frees its concurrency slot."""
+        try:
+            response.close()
+        finally:
+            self._semaphore.release()
+
+    def _cache_key(self, formatted_messages: list, model: str, temperature: float, max_tokens: int):
+        if self.cache is None:
+            return None
+        return make_cache_key(
+            self.deployment_name or model, self.api_version,
+            formatted_messages, temperature, max_tokens
+        )
+
+    def cached(self, messages: list, model: str = "gpt-4", max_tokens: int = 4000, temperature: float = 0.7):
+        """Returns the cached completion for this request, or None."""
+        cache_key = self._cache_key(_format_messages(messages), model, temperature, max_tokens)
+        return self.cache.get(cache_key) if cache_key else None
+
+    def complete(
+        self,
+        messages: list,
+        model: str = "gpt-4",
+        max_tokens: int = 4000,
+        temperature: float = 0.7,
+        use_cache: bool = True
+    ) -> str:
         payload = {
-            "messages": formatted_messages,
-            "max_tokens": 4000,
-            "temperature": 0.7
+            "messages": _format_messages(messages),
+            "max_tokens": max_tokens,
+            "temperature": temperature
         }
 
-        headers = {
-            "Content-Type": "application/json",
-            "api-key": api_key
+        cache_key = self._cache_key(payload["messages"], model, temperature, max_tokens) if use_cache else None
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        data = self.post(payload, model=model).json()
+        content = data["choices"][0]["message"]["content"].strip()
+        if cache_key:
+            self.cache.set(cache_key, content)
+        return content
+
+    def stream(
+        self,
+        messages: list,
+        model: str = "gpt-4",
+        max_tokens: int = 4000,
+        temperature: float = 0.7,
+        use_cache: bool = True
+    ):
+        """
+        Yields the completion as it is generated by consuming the `stream=true`
+        server-sent events. A cache hit is yielded as a single chunk.
+        """
+        payload = {
+            "messages": _format_messages(messages),
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": True
         }
 
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        data = response.json()
+        cache_key = self._cache_key(payload["messages"], model, temperature, max_tokens) if use_cache else None
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        response = self.post(payload, model=model, stream=True)
+        chunks = []
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                # Azure sends content-filter results in chunks with no choices
+                if not event.get("choices"):
+                    continue
+                delta = event["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    chunks.append(delta)
+                    yield delta
+        finally:
+            self.release(response)
+
+        if cache_key:
+            self.cache.set(cache_key, "".join(chunks).strip())
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_openai_client() -> AzureOpenAIClient:
+    """Returns the process-wide AzureOpenAIClient, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = AzureOpenAIClient()
+    return _client
+
+
+def azure_openai_stream(messages: list, model="gpt-4", use_cache: bool = True):
+    """
+    Streaming variant of azure_openai_prompt — yields text chunks as they arrive.
+    A failure before the first chunk is yielded as a single error chunk; a failure
+    after output has started is raised, so partial text is never passed off as a
+    complete response.
+    """
+    if is_simulation_mode():
+        yield "[SIMULATED AZURE OPENAI RESPONSE]"
+        return
+
+    started = False
+    try:
+        for chunk in get_openai_client().stream(messages, model=model, use_cache=use_cache):
+            started = True
+            yield chunk
+    except Exception as e:
+        if started:
+            raise
+        yield f"[ERROR calling Azure OpenAI]: {e}"
+
+
+def azure_openai_prompt(messages: list, model="gpt-4", use_cache: bool = True, on_token=None) -> str:
+    """
+    Uses Azure OpenAI Service instead of Google Gemini
+    Pass use_cache=False to skip the response cache for this call.
+    When on_token is given the response is streamed and each chunk is passed to it.
+    """
+    if on_token is not None:
+        chunks = []
+        try:
+            for chunk in azure_openai_stream(messages, model=model, use_cache=use_cache):
+                chunks.append(chunk)
+                on_token(chunk)
+        except Exception as e:
+            error = f"[ERROR calling Azure OpenAI]: {e}"
+            on_token(f"\n\n{error}")
+            return error
+        return "".join(chunks).strip()
 
-        return data["choices"][0]["message"]["content"].strip()
+    if is_simulation_mode():
+        return "[SIMULATED AZURE OPENAI RESPONSE]"
 
+    try:
+        return get_openai_client().complete(messages, model=model, use_cache=use_cache)
     except Exception as e:
-        return f"[ERROR calling Azure OpenAI]: {e}"
\ No newline at end of file
+        return f"[ERROR calling Azure OpenAI]: {e}"
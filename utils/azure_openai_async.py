@@ -0,0 +1,137 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import is_simulation_mode
+from utils.azure_openai import _format_messages, get_openai_client
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def estimate_tokens(messages: list, max_tokens: int = 4000) -> int:
+    """Rough token cost of a request (prompt at ~4 chars/token plus the completion budget)."""
+    prompt_chars = sum(len(str(m.get("content", ""))) for m in _format_messages(messages))
+    return prompt_chars // 4 + max_tokens
+
+
+class RateLimiter:
+    """
+    Requests/min and tokens/min budget for one deployment.
+
+    Each caller reserves its cost up front; if that drives a bucket negative the caller
+    sleeps until the bucket refills. State is guarded by a thread lock rather than an
+    asyncio primitive so one limiter can be shared across event loops and threads.
+    A limit of 0 disables that bucket.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def reserve(self, tokens: int) -> float:
+        """Debits one request and `tokens` tokens; returns how long to wait before sending."""
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = 0.0
+            if self.requests_per_minute:
+                self._requests -= 1
+                if self._requests < 0:
+                    wait = max(wait, -self._requests * 60 / self.requests_per_minute)
+            if self.tokens_per_minute:
+                self._tokens -= min(tokens, self.tokens_per_minute)
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens * 60 / self.tokens_per_minute)
+            return wait
+
+    async def acquire(self, tokens: int):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(deployment: str) -> RateLimiter:
+    """Returns the shared limiter for a deployment, sized from AZURE_OPENAI_RPM / AZURE_OPENAI_TPM."""
+    with _limiters_lock:
+        if deployment not in _limiters:
+            _limiters[deployment] = RateLimiter(
+                requests_per_minute=float(os.getenv("AZURE_OPENAI_RPM", "0")),
+                tokens_per_minute=float(os.getenv("AZURE_OPENAI_TPM", "0"))
+            )
+        return _limiters[deployment]
+
+
+async def azure_openai_prompt_many_async(
+    message_sets: list,
+    model: str = "gpt-4",
+    max_concurrency: int = None,
+    max_tokens: int = 4000,
+    use_cache: bool = True
+) -> list:
+    """
+    Sends many prompts concurrently and returns the responses in input order.
+
+    Concurrency is bounded by a semaphore and each request waits on the deployment's
+    RateLimiter. Requests run on the shared pooled client (in worker threads), so
+    retries, backoff and the response cache all still apply; cache hits skip the
+    rate limiter entirely. A failed prompt yields an error string in its slot.
+    """
+    if is_simulation_mode():
+        return ["[SIMULATED AZURE OPENAI RESPONSE]" for _ in message_sets]
+
+    try:
+        client = get_openai_client()
+    except Exception as e:
+        return [f"[ERROR calling Azure OpenAI]: {e}" for _ in message_sets]
+
+    limiter = get_rate_limiter(client.deployment_name or model)
+    semaphore = asyncio.Semaphore(max_concurrency or client.max_concurrency)
+
+    async def _one(messages):
+        if use_cache:
+            cached = client.cached(messages, model=model, max_tokens=max_tokens)
+            if cached is not None:
+                return cached
+        async with semaphore:
+            await limiter.acquire(estimate_tokens(messages, max_tokens))
+            try:
+                return await asyncio.to_thread(
+                    client.complete, messages, model=model, max_tokens=max_tokens, use_cache=use_cache
+                )
+            except Exception as e:
+                return f"[ERROR calling Azure OpenAI]: {e}"
+
+    return list(await asyncio.gather(*(_one(messages) for messages in message_sets)))
+
+
+def azure_openai_prompt_many(message_sets: list, **kwargs) -> list:
+    """
+    Blocking wrapper around azure_openai_prompt_many_async for agent code. When the
+    calling thread already runs an event loop, the batch runs on its own loop in a
+    worker thread (this blocks the caller's loop until it is done — async code
+    should await azure_openai_prompt_many_async instead).
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(azure_openai_prompt_many_async(message_sets, **kwargs))
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, azure_openai_prompt_many_async(message_sets, **kwargs)).result()
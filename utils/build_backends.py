@@ -0,0 +1,186 @@
+import abc
+import collections
+import os
+import subprocess
+import threading
+import time
+from utils import azure_mgmt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ACR_TOKEN_USER = "00000000-0000-0000-0000-000000000000"
+# docker-container builder used when AGENTOPS_BUILDX_BUILDER is unset: the default
+# `docker` driver can't export cache ("cache export is not supported for the docker driver")
+DEFAULT_BUILDX_BUILDER = "agentops"
+
+
+class BuildBackend(abc.ABC):
+    """
+    Builds an image from a local context and pushes it to the registry.
+
+    Pick the implementation with AGENTOPS_BUILD_BACKEND (acr | buildkit). Every
+    backend pushes to `<registry>.azurecr.io/<repository>:<tag>`, so callers only
+    ever see the resulting image URL.
+    """
+
+    name = "base"
+
+    def image_exists(self, registry: str, repository: str, tag: str, azure_config: dict) -> bool:
+        return azure_mgmt.acr_image_exists(registry, repository, tag, azure_config)
+
+    @abc.abstractmethod
+    def build(self, context_dir: str, registry: str, repository: str, tag: str, azure_config: dict,
+              dockerfile: str = "Dockerfile", log=None):
+        """Build and push; every output line goes to `log.write` (a BuildLog) when given."""
+        raise NotImplementedError
+
+
+class AcrBuildBackend(BuildBackend):
+    """ACR quick task: the context is uploaded and built remotely (see utils/azure_mgmt.py)."""
+
+    name = "acr"
+
+    def build(self, context_dir: str, registry: str, repository: str, tag: str, azure_config: dict,
+              dockerfile: str = "Dockerfile", log=None):
+        azure_mgmt.acr_build(
+            registry,
+            azure_config.get("registry_resource_group") or azure_config["resource_group"],
+            context_dir,
+            f"{repository}:{tag}",
+            dockerfile=dockerfile,
+            on_output=log.write if log is not None else None,
+            azure_config=azure_config
+        )
+
+
+class BuildKitBuildBackend(BuildBackend):
+    """
+    Local `docker buildx build --push` with BuildKit.
+
+    Nothing is uploaded up front — BuildKit reads only the files each step needs from
+    the local context, and the push only sends layers the registry doesn't already
+    have. Layer cache lives either in the registry (`<repository>:buildcache`, shared by
+    every builder) or in a local directory (AGENTOPS_BUILD_CACHE=local).
+
+    Exporting cache needs a docker-container (or remote/kubernetes) builder. Without
+    AGENTOPS_BUILDX_BUILDER, a docker-container builder named DEFAULT_BUILDX_BUILDER is
+    created on first use whenever the cache is on.
+    """
+
+    name = "buildkit"
+    login_ttl = 3600  # ACR refresh tokens last ~3h; log in again well before that
+
+    def __init__(self, cache: str = "registry", cache_dir: str = None, builder: str = None, platform: str = None):
+        if cache not in ("registry", "local", "none"):
+            raise ValueError(f"Unknown AGENTOPS_BUILD_CACHE: {cache}")
+        self.cache = cache
+        self.cache_dir = cache_dir or ".cache/buildkit"
+        self.builder = builder
+        self.platform = platform
+        self._logins = {}
+        self._builder_ready = False
+        self._lock = threading.Lock()
+
+    @property
+    def builder_name(self) -> str:
+        if self.builder:
+            return self.builder
+        return DEFAULT_BUILDX_BUILDER if self.cache != "none" else None
+
+    def _ensure_builder(self):
+        """Create the default docker-container builder unless it exists (once per process)"""
+        if self.builder or self.builder_name is None:
+            return
+        with self._lock:
+            if self._builder_ready:
+                return
+            inspect = ["docker", "buildx", "inspect", DEFAULT_BUILDX_BUILDER]
+            if subprocess.run(inspect, capture_output=True, text=True).returncode != 0:
+                create = subprocess.run(
+                    ["docker", "buildx", "create", "--name", DEFAULT_BUILDX_BUILDER, "--driver", "docker-container"],
+                    capture_output=True, text=True
+                )
+                if create.returncode != 0:
+                    # Another process may have created it in the meantime
+                    subprocess.run(inspect, capture_output=True, text=True, check=True)
+            self._builder_ready = True
+
+    def _login(self, registry: str, azure_config: dict):
+        with self._lock:
+            if time.monotonic() - self._logins.get(registry, -self.login_ttl) < self.login_ttl:
+                return
+            token = azure_mgmt.acr_refresh_token(registry, azure_config)
+            subprocess.run(
+                ["docker", "login", f"{registry}.azurecr.io", "--username", ACR_TOKEN_USER, "--password-stdin"],
+                input=token, capture_output=True, text=True, check=True
+            )
+            self._logins[registry] = time.monotonic()
+
+    def cache_args(self, registry: str, repository: str) -> list:
+        if self.cache == "registry":
+            ref = f"{registry}.azurecr.io/{repository}:buildcache"
+            return ["--cache-from", f"type=registry,ref={ref}", "--cache-to", f"type=registry,ref={ref},mode=max"]
+        if self.cache == "local":
+            cache_dir = os.path.abspath(os.path.join(self.cache_dir, registry, repository))
+            return [
+                "--cache-from", f"type=local,src={cache_dir}",
+                "--cache-to", f"type=local,dest={cache_dir},mode=max"
+            ]
+        return []
+
+    def command(self, context_dir: str, registry: str, repository: str, tag: str,
+                dockerfile: str = "Dockerfile") -> list:
+        command = ["docker", "buildx", "build", "--push", "--progress", "plain"]
+        if self.builder_name:
+            command += ["--builder", self.builder_name]
+        if self.platform:
+            command += ["--platform", self.platform]
+        command += ["--tag", f"{registry}.azurecr.io/{repository}:{tag}"]
+        command += self.cache_args(registry, repository)
+        command += ["--file", os.path.join(context_dir, dockerfile), context_dir]
+        return command
+
+    def build(self, context_dir: str, registry: str, repository: str, tag: str, azure_config: dict,
+              dockerfile: str = "Dockerfile", log=None):
+        self._ensure_builder()
+        self._login(registry, azure_config)
+        recent = collections.deque(maxlen=20)
+        # Stream merged stdout/stderr line by line instead of waiting for the process to exit
+        process = subprocess.Popen(
+            self.command(context_dir, registry, repository, tag, dockerfile),
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1, errors="replace"
+        )
+        with process:
+            for line in process.stdout:
+                recent.append(line.rstrip("\n"))
+                if log is not None:
+                    log.write(line)
+        if process.returncode != 0:
+            tail = "\n".join(recent)
+            raise RuntimeError(f"docker buildx build exited with {process.returncode}:\n{tail}")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_build_backend() -> BuildBackend:
+    """Return the process-wide build backend selected by AGENTOPS_BUILD_BACKEND"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                kind = os.getenv("AGENTOPS_BUILD_BACKEND", "acr").lower()
+                if kind == "acr":
+                    _backend = AcrBuildBackend()
+                elif kind == "buildkit":
+                    _backend = BuildKitBuildBackend(
+                        cache=os.getenv("AGENTOPS_BUILD_CACHE", "registry").lower(),
+                        cache_dir=os.getenv("AGENTOPS_BUILD_CACHE_DIR"),
+                        builder=os.getenv("AGENTOPS_BUILDX_BUILDER") or None,
+                        platform=os.getenv("AGENTOPS_BUILD_PLATFORM", "linux/amd64") or None
+                    )
+                else:
+                    raise ValueError(f"Unknown AGENTOPS_BUILD_BACKEND: {kind}")
+    return _backend
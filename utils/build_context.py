@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shlex
+import tarfile
+import tempfile
+
+ALWAYS_SENT = {"Dockerfile", ".dockerignore"}
+
+
+def _compile_pattern(pattern: str):
+    """Translate a .dockerignore / COPY source pattern (Go filepath.Match plus `**`) to a regex"""
+    out, i = "", 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "*":
+            if pattern[i:i + 2] == "**":
+                i += 2
+                if pattern[i:i + 1] == "/":
+                    i += 1
+                    out += "(?:.*/)?"
+                else:
+                    out += ".*"
+                continue
+            out += "[^/]*"
+        elif c == "?":
+            out += "[^/]"
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out += re.escape(c)
+            else:
+                body = pattern[i + 1:end]
+                out += "[" + ("^" + body[1:] if body.startswith(("!", "^")) else body) + "]"
+                i = end
+        elif c == "\\" and i + 1 < len(pattern):
+            i += 1
+            out += re.escape(pattern[i])
+        else:
+            out += re.escape(c)
+        i += 1
+    return re.compile(out + "$")
+
+
+def _clean(pattern: str) -> str:
+    pattern = posixpath.normpath(pattern.strip()).lstrip("/")
+    return "" if pattern == "." else pattern
+
+
+def _matches(regex, path: str) -> bool:
+    """A pattern matches a path when it matches the path itself or any parent directory"""
+    if regex.match(path):
+        return True
+    parts = path.split("/")[:-1]
+    return any(regex.match("/".join(parts[:i + 1])) for i in range(len(parts)))
+
+
+class DockerIgnore:
+    """The .dockerignore rules of a build context; the last matching rule wins, `!` re-includes."""
+
+    def __init__(self, patterns: list):
+        self.rules = []
+        for raw in patterns:
+            line = raw.strip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            pattern = _clean(line[1:] if negated else line)
+            if pattern:
+                self.rules.append((_compile_pattern(pattern), negated))
+        self.has_negations = any(negated for _, negated in self.rules)
+
+    @classmethod
+    def load(cls, context_dir: str) -> "DockerIgnore":
+        try:
+            with open(os.path.join(context_dir, ".dockerignore"), encoding="utf-8") as f:
+                return cls(f.read().splitlines())
+        except OSError:
+            return cls([])
+
+    def excluded(self, path: str) -> bool:
+        excluded = False
+        for regex, negated in self.rules:
+            if _matches(regex, path):
+                excluded = not negated
+        return excluded
+
+
+def iter_context_files(context_dir: str, dockerfile: str = "Dockerfile"):
+    """
+    Yields the relative POSIX paths of the files Docker would send as the build
+    context, in sorted order: everything not excluded by .dockerignore (and never
+    .git), plus the Dockerfile and .dockerignore themselves.
+    """
+    ignore = DockerIgnore.load(context_dir)
+    always = ALWAYS_SENT | {dockerfile}
+    for root, dirs, files in os.walk(context_dir):
+        rel_root = os.path.relpath(root, context_dir).replace(os.sep, "/")
+        rel_root = "" if rel_root == "." else rel_root + "/"
+        dirs[:] = sorted(
+            d for d in dirs
+            if d != ".git" and (ignore.has_negations or not ignore.excluded(rel_root + d))
+        )
+        for name in sorted(files):
+            path = rel_root + name
+            if path in always or not ignore.excluded(path):
+                yield path
+
+
+def dockerfile_sources(dockerfile_text: str):
+    """
+    Local source patterns of the Dockerfile's COPY/ADD instructions (multi-stage
+    `--from` copies and remote ADD URLs are skipped). Returns None when every file
+    may count: the whole context is copied, a source uses a `$` variable we cannot
+    expand, or a RUN step bind-mounts the context.
+    """
+    sources = []
+    text = re.sub(r"\\\r?\n", " ", dockerfile_text)
+    for line in text.splitlines():
+        line = line.strip()
+        instruction = line.split(None, 1)
+        if len(instruction) < 2 or instruction[0].upper() not in ("COPY", "ADD", "RUN"):
+            continue
+        args = instruction[1].strip()
+        flags = []
+        while args.startswith("--"):
+            flag, _, args = args.partition(" ")
+            flags.append(flag)
+            args = args.strip()
+        if instruction[0].upper() == "RUN":
+            for flag in flags:
+                if not flag.startswith("--mount="):
+                    continue
+                options = dict(o.partition("=")[::2] for o in flag[len("--mount="):].split(","))
+                # bind is the default mount type and reads straight from the context
+                if options.get("type", "bind") == "bind" and "from" not in options:
+                    return None
+            continue
+        if any(flag.startswith("--from") for flag in flags):
+            continue
+        try:
+            tokens = json.loads(args) if args.startswith("[") else shlex.split(args)
+        except ValueError:
+            return None
+        for source in tokens[:-1]:
+            if "://" in source:
+                continue
+            source = _clean(source)
+            if not source or "$" in source:
+                return None
+            sources.append(source)
+    return sources
+
+
+def _file_digest(path: str) -> str:
+    if os.path.islink(path):
+        return "link:" + os.readlink(path)
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def context_hash(context_dir: str, dockerfile: str = "Dockerfile") -> str:
+    """
+    sha256 over the Dockerfile and the context files it references (path, exec bit
+    and content), honoring .dockerignore. Identical sources give the same hash no
+    matter where or when they were checked out.
+    """
+    dockerfile_path = os.path.join(context_dir, dockerfile)
+    try:
+        with open(dockerfile_path, encoding="utf-8") as f:
+            sources = dockerfile_sources(f.read())
+    except (OSError, UnicodeDecodeError):
+        sources = None
+    patterns = None if sources is None else [_compile_pattern(s) for s in sources]
+
+    digest = hashlib.sha256()
+    for path in iter_context_files(context_dir, dockerfile):
+        if path != dockerfile and patterns is not None and not any(_matches(p, path) for p in patterns):
+            continue
+        full_path = os.path.join(context_dir, path)
+        executable = os.access(full_path, os.X_OK) and not os.path.islink(full_path)
+        digest.update(f"{path}\0{int(executable)}\0{_file_digest(full_path)}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def image_tag(context_dir: str, dockerfile: str = "Dockerfile") -> str:
+    """Immutable image tag derived from the build context, e.g. src-3f2a…"""
+    return f"src-{context_hash(context_dir, dockerfile)[:24]}"
+
+
+def pack_context(context_dir: str, dockerfile: str = "Dockerfile") -> str:
+    """tar.gz the build context (honoring .dockerignore) into a temp file and return its path"""
+    handle, path = tempfile.mkstemp(suffix=".tar.gz")
+    os.close(handle)
+    with tarfile.open(path, "w:gz") as tar:
+        for rel_path in iter_context_files(context_dir, dockerfile):
+            tar.add(os.path.join(context_dir, rel_path), arcname=rel_path, recursive=False)
+    return path
@@ -0,0 +1,182 @@
+import collections
+import datetime
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_BUILD_LOG_DIR = os.getenv("AGENTOPS_BUILD_LOG_DIR", ".data/build-logs")
+BUILD_LOG_KEEP = int(os.getenv("AGENTOPS_BUILD_LOG_KEEP", "200"))
+BUILD_LOG_MAX_AGE_DAYS = float(os.getenv("AGENTOPS_BUILD_LOG_MAX_AGE_DAYS", "14"))
+
+# Lines that mean the build has failed (BuildKit, classic docker build, ACR runs),
+# as opposed to error output a step may print and recover from.
+BUILD_FAILURE_PATTERN = re.compile(
+    r"did not complete successfully|failed to solve|returned a non-zero code|"
+    r"executor failed running|COPY failed|error building image|Run ID: \S+ failed"
+)
+
+
+def prune_build_logs(log_dir: str, keep: int = None, max_age_days: float = None) -> int:
+    """
+    Deletes build logs older than `max_age_days`, then the oldest ones beyond the
+    newest `keep`. Returns the number of files removed.
+    """
+    keep = BUILD_LOG_KEEP if keep is None else keep
+    max_age_days = BUILD_LOG_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    try:
+        names = [n for n in os.listdir(log_dir) if n.endswith(".log")]
+    except OSError:
+        return 0
+
+    logs = []
+    for name in names:
+        path = os.path.join(log_dir, name)
+        try:
+            logs.append((os.path.getmtime(path), path))
+        except OSError:
+            pass
+    logs.sort(reverse=True)
+
+    cutoff = time.time() - max_age_days * 24 * 3600
+    removed = 0
+    for index, (mtime, path) in enumerate(logs):
+        if index >= keep or mtime < cutoff:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+class BuildLog:
+    """
+    Line-by-line capture of one build's output.
+
+    Keeps the last `max_lines` lines in a ring buffer, appends every line to a file
+    under AGENTOPS_BUILD_LOG_DIR, forwards lines to `on_line` (live UI), and calls
+    `on_failure(excerpt)` once, as soon as a line matches BUILD_FAILURE_PATTERN —
+    typically well before the build process exits. Errors raised by either callback
+    are printed, never propagated into the build. Old log files are pruned (see
+    prune_build_logs) when a new one is started.
+    """
+
+    def __init__(self, name: str, log_dir: str = None, max_lines: int = 2000, on_line=None, on_failure=None):
+        self.path = os.path.join(
+            log_dir or DEFAULT_BUILD_LOG_DIR,
+            f"{datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{name}.log"
+        )
+        self.on_line = on_line
+        self.on_failure = on_failure
+        self.lines = collections.deque(maxlen=max_lines)
+        self.line_count = 0
+        self.failure_line = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def write(self, line: str):
+        line = line.rstrip("\r\n")
+        failed_now = False
+        with self._lock:
+            if self._file is None:
+                log_dir = os.path.dirname(os.path.abspath(self.path))
+                os.makedirs(log_dir, exist_ok=True)
+                prune_build_logs(log_dir)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self.lines.append((self.line_count, line))
+            if self.failure_line is None and BUILD_FAILURE_PATTERN.search(line):
+                self.failure_line = self.line_count
+                failed_now = True
+            self.line_count += 1
+
+        if self.on_line:
+            try:
+                self.on_line(line)
+            except Exception as e:
+                print(f"Error forwarding build log line: {e}")
+        if failed_now and self.on_failure:
+            try:
+                self.on_failure(self.excerpt())
+            except Exception as e:
+                print(f"Error starting build failure analysis: {e}")
+
+    def excerpt(self, context: int = 30, tail: int = 50) -> str:
+        """The lines around the first failure line plus the last `tail` lines, with gap markers"""
+        with self._lock:
+            buffered = list(self.lines)
+            failure = self.failure_line
+        if not buffered:
+            return ""
+
+        keep = {n for n, _ in buffered[-tail:]}
+        if failure is not None:
+            keep |= set(range(failure - context, failure + context + 1))
+
+        out, previous = [], -1
+        for number, line in buffered:
+            if number not in keep:
+                continue
+            if number > previous + 1:
+                out.append(f"... [{number - previous - 1} lines omitted] ...")
+            out.append(line)
+            previous = number
+        return "\n".join(out)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class EarlyFailureAnalysis:
+    """
+    Runs `analyze(logs)` on a background thread the first time `start` is called —
+    wired to BuildLog.on_failure so analysis overlaps the rest of the failing build.
+    `result(logs)` returns that analysis, starting it with `logs` if it never started;
+    `cancel()` drops it when the build recovers, so `analyze` should not record
+    anything itself — the caller persists what `result` returns.
+    """
+
+    def __init__(self, analyze, initializer=None):
+        self.analyze = analyze
+        self._executor = ThreadPoolExecutor(max_workers=1, initializer=initializer)
+        self._future = None
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    @property
+    def started(self) -> bool:
+        return self._future is not None
+
+    def start(self, logs: str):
+        with self._lock:
+            if self._future is None and not self._cancelled:
+                self._future = self._executor.submit(self.analyze, logs)
+
+    def cancel(self):
+        """Shuts the worker down; an analysis already running finishes, but nobody waits on it"""
+        with self._lock:
+            self._cancelled = True
+            if self._future is not None:
+                self._future.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def result(self, logs: str = ""):
+        self.start(logs)
+        try:
+            return self._future.result()
+        finally:
+            self._executor.shutdown(wait=False)
@@ -1,16 +1,53 @@
 import os
+import shutil
 import tempfile
 import subprocess
+from contextlib import contextmanager
+from utils.repo_mirror import get_mirror_store
+
+
+def validate_repo_url(repo_url: str) -> str:
+    """Raises ValueError unless the URL points at GitHub."""
+    if not repo_url.startswith("https://github.com/"):
+        raise ValueError("Invalid GitHub URL")
+    return repo_url
+
 
 def validate_and_clone_repo(repo_url: str) -> str:
     """
     Validates a GitHub repo URL and clones it to a temporary directory.
+    Uses the persistent mirror store when AGENTOPS_REPO_MIRROR_ROOT is set.
     Returns the local path to the cloned repo.
     """
-    if not repo_url.startswith("https://github.com/"):
-        raise ValueError("Invalid GitHub URL")
+    validate_repo_url(repo_url)
 
     temp_dir = tempfile.mkdtemp()
-    subprocess.run(["git", "clone", repo_url, temp_dir], check=True)
+    store = get_mirror_store()
+    if store:
+        # Local clone from the persistent mirror — only the fetch delta hits the network
+        mirror_path = store.sync(repo_url)
+        subprocess.run(["git", "clone", mirror_path, temp_dir], check=True)
+        subprocess.run(["git", "remote", "set-url", "origin", repo_url], cwd=temp_dir, check=True)
+    else:
+        subprocess.run(["git", "clone", repo_url, temp_dir], check=True)
 
     return temp_dir
+
+
+@contextmanager
+def checkout_repo(repo_url: str, repo_cache=None):
+    """
+    Yields a local checkout of the repo and cleans it up afterwards.
+    When a RepoCloneCache is given, the checkout is a worktree leased from the
+    shared clone instead of a fresh clone.
+    """
+    if repo_cache is not None:
+        with repo_cache.lease(repo_url) as path:
+            yield path
+        return
+
+    path = validate_and_clone_repo(repo_url)
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,161 @@
+import csv
+import gzip
+import io
+import os
+import time
+import uuid
+import weakref
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+from utils.history_frame import HISTORY_COLUMNS
+from utils.storage import fetch_sessions_page
+
+load_dotenv()
+
+# Streamlit serves <main script dir>/static/ at app/static/ when server.enableStaticServing is on
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+EXPORT_SUBDIR = "exports"
+EXPORT_MAX_AGE_HOURS = float(os.getenv("AGENTOPS_EXPORT_MAX_AGE_HOURS", "6"))
+
+EXPORT_FORMATS = {
+    "csv": {"extension": "csv", "mime": "text/csv"},
+    "csv.gz": {"extension": "csv.gz", "mime": "application/gzip"},
+    "parquet": {"extension": "parquet", "mime": "application/vnd.apache.parquet"},
+}
+
+PARQUET_SCHEMA = pa.schema([(name, pa.string()) for name in HISTORY_COLUMNS])
+
+
+def iter_history_rows(fetch_page=fetch_sessions_page, page_size: int = 500, **filters):
+    """Yields every history row matching `filters`, fetching one page at a time."""
+    token = None
+    while True:
+        rows, token = fetch_page(page_size, token, **filters)
+        yield from rows
+        if not token:
+            return
+
+
+def export_history_csv(fileobj, fetch_page=fetch_sessions_page, page_size: int = 500, **filters) -> int:
+    """
+    Writes the matching history rows to a text file object as CSV, page by page, so
+    memory stays bounded by one page regardless of how many rows match.
+    Returns the number of rows written.
+    """
+    writer = csv.DictWriter(fileobj, fieldnames=HISTORY_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    count = 0
+    for row in iter_history_rows(fetch_page, page_size, **filters):
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def export_history_parquet_file(fileobj, fetch_page=fetch_sessions_page, page_size: int = 500,
+                                row_group_size: int = 50000, **filters) -> int:
+    """
+    Writes the matching history rows to a binary file object as Parquet (zstd), one
+    row group per `row_group_size` rows, so at most one row group is held in memory.
+    Returns the number of rows written.
+    """
+    count = 0
+    buffer = {name: [] for name in HISTORY_COLUMNS}
+
+    with pq.ParquetWriter(fileobj, PARQUET_SCHEMA, compression="zstd") as writer:
+        def _write_row_group():
+            if buffer["session_id"]:
+                writer.write_table(pa.table(buffer, schema=PARQUET_SCHEMA))
+                for values in buffer.values():
+                    values.clear()
+
+        for row in iter_history_rows(fetch_page, page_size, **filters):
+            for name in HISTORY_COLUMNS:
+                value = row.get(name)
+                buffer[name].append(None if value is None else str(value))
+            count += 1
+            if len(buffer["session_id"]) >= row_group_size:
+                _write_row_group()
+        _write_row_group()
+    return count
+
+
+def export_history(fileobj, export_format: str = "csv", fetch_page=fetch_sessions_page,
+                   page_size: int = 500, **filters) -> int:
+    """
+    Streams the matching history rows into a binary file object as csv, csv.gz or
+    parquet straight from the paged storage query. Returns the number of rows written.
+    """
+    if export_format == "parquet":
+        return export_history_parquet_file(fileobj, fetch_page, page_size, **filters)
+
+    if export_format == "csv.gz":
+        with gzip.GzipFile(fileobj=fileobj, mode="wb") as gz:
+            with io.TextIOWrapper(gz, encoding="utf-8", newline="") as text:
+                return export_history_csv(text, fetch_page, page_size, **filters)
+
+    if export_format == "csv":
+        text = io.TextIOWrapper(fileobj, encoding="utf-8", newline="")
+        try:
+            return export_history_csv(text, fetch_page, page_size, **filters)
+        finally:
+            text.flush()
+            text.detach()  # leave the caller's file open
+
+    raise ValueError(f"Unknown export format: {export_format}")
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class ExportFile:
+    """
+    A history export written under the static directory, so the browser downloads it
+    with a plain GET that the server streams from disk instead of pushing the bytes
+    through the websocket. Static files are served without auth, hence the random name.
+
+    The file is removed by delete(), or when the object is garbage collected — kept in
+    st.session_state, that is when the Streamlit session ends.
+    """
+
+    def __init__(self, extension: str, static_dir: str = None):
+        export_dir = os.path.join(static_dir or STATIC_DIR, EXPORT_SUBDIR)
+        os.makedirs(export_dir, exist_ok=True)
+        self.url_path = f"app/static/{EXPORT_SUBDIR}/{uuid.uuid4().hex}.{extension}"
+        self.path = os.path.join(export_dir, os.path.basename(self.url_path))
+        self._finalizer = weakref.finalize(self, _remove, self.path)
+
+    def open(self):
+        return open(self.path, "wb")
+
+    def delete(self):
+        self._finalizer()
+
+
+def prune_exports(static_dir: str = None, max_age_hours: float = None) -> int:
+    """
+    Deletes exports older than `max_age_hours` — left behind when the process exited
+    before their sessions ended. Returns the number of files removed.
+    """
+    max_age_hours = EXPORT_MAX_AGE_HOURS if max_age_hours is None else max_age_hours
+    export_dir = os.path.join(static_dir or STATIC_DIR, EXPORT_SUBDIR)
+    try:
+        names = os.listdir(export_dir)
+    except OSError:
+        return 0
+
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    for name in names:
+        path = os.path.join(export_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
@@ -0,0 +1,29 @@
+import pandas as pd
+
+HISTORY_COLUMNS = ["session_id", "agent", "timestamp", "repo", "mode", "status", "issues_found"]
+
+
+def flatten_mock_runs(runs: list) -> pd.DataFrame:
+    """Expands mock runs (one dict of per-agent scores per run) into history rows."""
+    wide = pd.DataFrame(runs)
+    if wide.empty:
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+    wide["session_id"] = [f"mock-{i:04d}" for i in range(len(wide))]
+    wide["mode"] = wide["mode"].fillna("simulation") if "mode" in wide else "simulation"
+    if "timestamp" not in wide:
+        wide["timestamp"] = None
+
+    score_columns = [c for c in wide.columns if c.startswith("agent_")]
+    long = wide.melt(
+        id_vars=["session_id", "timestamp", "mode"], value_vars=score_columns,
+        var_name="agent", value_name="score"
+    ).dropna(subset=["score"])
+    long = long.sort_values("session_id", kind="stable").reset_index(drop=True)
+
+    long["agent"] = long["agent"].str.slice(len("agent_"))
+    long["status"] = "warning"
+    long.loc[long["score"] >= 1, "status"] = "success"
+    long.loc[long["score"] <= 0, "status"] = "error"
+    long["repo"] = "N/A"
+    long["issues_found"] = "N/A"
+    return long[HISTORY_COLUMNS]
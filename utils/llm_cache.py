@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import sqlite3
+import textwrap
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _normalize_content(content) -> str:
+    # Prompts are built from indented f-strings — ignore indentation/trailing-space noise
+    text = textwrap.dedent(str(content)).strip()
+    return "\n".join(line.rstrip() for line in text.splitlines())
+
+
+def make_cache_key(deployment: str, api_version: str, messages: list, temperature: float, max_tokens: int) -> str:
+    """Content hash of everything that determines a chat completion."""
+    normalized = [
+        {"role": msg.get("role", "user"), "content": _normalize_content(msg.get("content", ""))}
+        for msg in messages
+    ]
+    material = json.dumps({
+        "deployment": deployment,
+        "api_version": api_version,
+        "messages": normalized,
+        "temperature": temperature,
+        "max_tokens": max_tokens
+    }, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class MemoryCacheBackend:
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires is not None and expires < time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float = None):
+        with self._lock:
+            self._items[key] = (value, time.time() + ttl if ttl else None)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class SQLiteCacheBackend:
+    """On-disk cache that survives restarts; evicts expired rows, then least recently used."""
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used)")
+        self._conn.commit()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires = row
+            if expires is not None and expires < now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return value
+
+    def set(self, key: str, value: str, ttl: float = None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl if ttl else None, now)
+            )
+            self._conn.execute("DELETE FROM llm_cache WHERE expires IS NOT NULL AND expires < ?", (now,))
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+
+class LLMCache:
+    """Response cache in front of Azure OpenAI chat completions."""
+
+    def __init__(self, backend, ttl: float = None):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: str):
+        self.backend.set(key, value, self.ttl)
+
+
+def get_llm_cache():
+    """
+    Builds the cache configured by AZURE_OPENAI_CACHE (memory | sqlite | off).
+    Returns None when caching is disabled.
+    """
+    kind = os.getenv("AZURE_OPENAI_CACHE", "memory").lower()
+    ttl = float(os.getenv("AZURE_OPENAI_CACHE_TTL", "86400")) or None
+    max_entries = int(os.getenv("AZURE_OPENAI_CACHE_MAX_ENTRIES", "1024"))
+
+    if kind == "memory":
+        return LLMCache(MemoryCacheBackend(max_entries), ttl)
+    if kind == "sqlite":
+        path = os.getenv("AZURE_OPENAI_CACHE_PATH", ".cache/llm_cache.sqlite3")
+        return LLMCache(SQLiteCacheBackend(path, max_entries), ttl)
+    return None
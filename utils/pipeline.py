@@ -0,0 +1,175 @@
+import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class Stage:
+    """
+    A single pipeline step.
+
+    `func` receives a dict of the outputs of every upstream stage (keyed by stage
+    name) and returns the stage output. `when` is an optional predicate over the same
+    dict; if it returns False the stage (and everything downstream of it) is skipped.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Dict[str, Any]], Any],
+        depends_on: Iterable[str] = (),
+        when: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.when = when
+
+
+class StageTiming:
+    """Wall-clock start/finish of a stage, relative to the start of the pipeline run."""
+
+    def __init__(self, name: str, status: str = "pending"):
+        self.name = name
+        self.status = status
+        self.started_at = None
+        self.finished_at = None
+        self.start_offset = None
+        self.end_offset = None
+
+    @property
+    def duration(self) -> float:
+        if self.start_offset is None or self.end_offset is None:
+            return 0.0
+        return self.end_offset - self.start_offset
+
+    def as_dict(self) -> dict:
+        return {
+            "stage": self.name,
+            "status": self.status,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "start_offset_s": round(self.start_offset or 0.0, 3),
+            "duration_s": round(self.duration, 3)
+        }
+
+
+class PipelineResult:
+    def __init__(self, outputs: Dict[str, Any], timings: Dict[str, StageTiming], wall_time: float):
+        self.outputs = outputs
+        self.timings = timings
+        self.wall_time = wall_time
+
+    def timeline(self) -> List[dict]:
+        """Per-stage timings ordered by start time (skipped stages last)."""
+        ordered = sorted(
+            self.timings.values(),
+            key=lambda t: (t.start_offset is None, t.start_offset or 0.0)
+        )
+        return [t.as_dict() for t in ordered]
+
+
+class Pipeline:
+    """
+    Runs a DAG of stages on a thread pool.
+
+    Each stage is submitted as soon as all of its dependencies have finished, so the
+    end-to-end wall time is the longest dependency path rather than the sum of every
+    stage. A stage that raises is recorded as an error output and does not abort
+    independent branches; its dependents still run and can inspect the error.
+    """
+
+    def __init__(self, stages: Iterable[Stage], max_workers: int = 4):
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage name: {stage.name}")
+            self.stages[stage.name] = stage
+        self.max_workers = max_workers
+        self._validate()
+
+    def _validate(self):
+        for stage in self.stages.values():
+            for dep in stage.depends_on:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+
+        # Kahn's algorithm — any stage left over is part of a cycle
+        remaining = {name: set(s.depends_on) for name, s in self.stages.items()}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Pipeline has a dependency cycle: {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+    def run(
+        self,
+        initializer: Optional[Callable[[], None]] = None,
+        on_stage_done: Optional[Callable[[str, StageTiming, Any], None]] = None
+    ) -> PipelineResult:
+        """
+        Executes the pipeline and blocks until every stage has finished or been skipped.
+
+        `initializer` runs once in each worker thread (e.g. to attach a UI context).
+        `on_stage_done` is called from the calling thread as each stage completes.
+        """
+        outputs: Dict[str, Any] = {}
+        timings = {name: StageTiming(name) for name in self.stages}
+        pending = dict(self.stages)
+        running = {}
+        skipped = set()
+        lock = threading.Lock()
+        t0 = time.perf_counter()
+
+        def _execute(stage: Stage, upstream: Dict[str, Any]):
+            timing = timings[stage.name]
+            with lock:
+                timing.status = "running"
+                timing.start_offset = time.perf_counter() - t0
+                timing.started_at = datetime.datetime.utcnow().isoformat()
+            try:
+                output = stage.func(upstream)
+                status = "success"
+            except Exception as e:
+                output = {"status": "error", "reason": f"{stage.name} failed: {e}", "critical": True}
+                status = "error"
+            with lock:
+                timing.end_offset = time.perf_counter() - t0
+                timing.finished_at = datetime.datetime.utcnow().isoformat()
+                timing.status = status
+            return output
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, initializer=initializer) as pool:
+            while pending or running:
+                # Resolve every stage whose dependencies are all settled
+                progressed = True
+                while progressed:
+                    progressed = False
+                    for name, stage in list(pending.items()):
+                        deps = stage.depends_on
+                        if any(d in pending or d in running.values() for d in deps):
+                            continue
+                        del pending[name]
+                        progressed = True
+                        upstream = {d: outputs[d] for d in deps if d in outputs}
+                        if any(d in skipped for d in deps) or (stage.when and not stage.when(upstream)):
+                            skipped.add(name)
+                            timings[name].status = "skipped"
+                            continue
+                        running[pool.submit(_execute, stage, upstream)] = name
+
+                if not running:
+                    break
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    outputs[name] = future.result()
+                    if on_stage_done:
+                        on_stage_done(name, timings[name], outputs[name])
+
+        return PipelineResult(outputs, timings, time.perf_counter() - t0)
@@ -0,0 +1,200 @@
+import os
+import re
+import threading
+from config import is_simulation_mode
+from utils.azure_openai_async import azure_openai_prompt_many
+from dotenv import load_dotenv
+
+try:
+    import tiktoken
+except ImportError:  # optional — fall back to a character-based estimate
+    tiktoken = None
+
+load_dotenv()
+
+DEFAULT_LOG_TOKEN_BUDGET = int(os.getenv("AZURE_OPENAI_LOG_TOKEN_BUDGET", "6000"))
+
+# Lines worth keeping when a log has to be cut down
+DIAGNOSTIC_PATTERN = re.compile(
+    r"Traceback \(most recent call last\)|FAILED|ERROR|Error:|error:|Exception|"
+    r"^E\s{2,}|AssertionError|fatal:|FATAL|panic:|short test summary|"
+    r"exit code [1-9]|returned a non-zero code|failed to solve",
+)
+
+_encoders = {}
+_encoders_lock = threading.Lock()
+
+
+def _encoder(model: str):
+    if tiktoken is None:
+        return None
+    with _encoders_lock:
+        if model not in _encoders:
+            try:
+                _encoders[model] = tiktoken.encoding_for_model(model)
+            except Exception:
+                # Unknown model, or the BPE file can't be downloaded (offline pods)
+                try:
+                    _encoders[model] = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    _encoders[model] = None
+        return _encoders[model]
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """Counts tokens locally with tiktoken, or estimates ~4 characters per token."""
+    encoder = _encoder(model)
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def _diagnostic_windows(lines: list, context: int = 2) -> list:
+    """Returns (start, end) line ranges around tracebacks and failure lines, merged."""
+    windows = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith("Traceback (most recent call last)"):
+            # Keep the whole traceback up to and including the exception line
+            end = i + 1
+            while end < len(lines) and (lines[end].startswith((" ", "\t")) or not lines[end].strip()):
+                end += 1
+            windows.append((max(0, i - context), min(len(lines), end + 1)))
+            i = end + 1
+            continue
+        if DIAGNOSTIC_PATTERN.search(line):
+            windows.append((max(0, i - context), min(len(lines), i + context + 1)))
+        i += 1
+
+    merged = []
+    for start, end in windows:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _render(lines: list, keep: list) -> str:
+    """Joins the kept line ranges, marking each gap with an omission note."""
+    out = []
+    cursor = 0
+    for start, end in sorted(keep):
+        if start > cursor:
+            out.append(f"... [{start - cursor} lines omitted] ...")
+        out.extend(lines[max(start, cursor):end])
+        cursor = max(cursor, end)
+    if cursor < len(lines):
+        out.append(f"... [{len(lines) - cursor} lines omitted] ...")
+    return "\n".join(out)
+
+
+def truncate_log(text: str, max_tokens: int, tail_lines: int = 10, model: str = "gpt-4") -> str:
+    """
+    Cuts a log down to its most diagnostic regions within `max_tokens`.
+
+    Priority: the final `tail_lines` lines, then tracebacks / FAILED / error windows
+    (latest first), then as much more of the tail as the budget allows. Kept regions are emitted in their original
+    order with omission markers. Returns "" if not even the tail fits.
+    """
+    lines = text.splitlines()
+    tail_start = max(0, len(lines) - tail_lines)
+    candidates = [(tail_start, len(lines))]
+    candidates += [w for w in reversed(_diagnostic_windows(lines[:tail_start])) if w[1] <= tail_start]
+
+    keep = []
+    used = 0
+    for start, end in candidates:
+        cost = count_tokens("\n".join(lines[start:end]), model) + 12
+        if used + cost > max_tokens:
+            continue
+        keep.append((start, end))
+        used += cost
+
+    # Spend whatever budget is left on extending the tail backwards
+    if keep and keep[0] == (tail_start, len(lines)):
+        start = tail_start
+        while start > 0:
+            cost = count_tokens(lines[start - 1], model) + 1
+            if used + cost > max_tokens or any(s <= start - 1 < e for s, e in keep[1:]):
+                break
+            start -= 1
+            used += cost
+        keep[0] = (start, len(lines))
+
+    return _render(lines, keep) if keep else ""
+
+
+def _chunk_lines(lines: list, chunk_tokens: int, model: str) -> list:
+    chunks, current, size = [], [], 0
+    for line in lines:
+        cost = count_tokens(line, model) + 1
+        if current and size + cost > chunk_tokens:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += cost
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def summarize_log(
+    text: str,
+    max_tokens: int,
+    chunk_tokens: int = 3000,
+    max_chunks: int = 16,
+    model: str = "gpt-4"
+) -> str:
+    """
+    Map-reduce summary of a log: each chunk is summarized in parallel, then the
+    summaries are reduced again until they fit in `max_tokens`. Falls back to
+    truncate_log when there is no real model to summarize with (simulation mode)
+    or any chunk summary failed, so error text never replaces the log itself.
+    """
+    if is_simulation_mode():
+        return truncate_log(text, max_tokens, model=model)
+    lines = text.splitlines()
+    for _ in range(3):
+        chunks = _chunk_lines(lines, chunk_tokens, model)
+        if len(chunks) > max_chunks:
+            # Bound the fan-out: keep the first and last chunks, where failures usually start and end
+            half = max_chunks // 2
+            chunks = chunks[:half] + chunks[-(max_chunks - half):]
+        summaries = azure_openai_prompt_many([[{
+            "text": (
+                "Summarize the diagnostic content of this log excerpt. Keep exact error messages, "
+                "failing test names, exception types, file paths and line numbers. Drop noise.\n\n"
+                f"```\n{chunk}\n```"
+            )
+        }] for chunk in chunks], max_tokens=max(256, max_tokens // max(len(chunks), 1)))
+        if any(s.startswith("[ERROR") for s in summaries):
+            return truncate_log(text, max_tokens, model=model)
+        combined = "\n\n".join(f"[Part {i + 1}/{len(summaries)}]\n{s}" for i, s in enumerate(summaries))
+        if count_tokens(combined, model) <= max_tokens:
+            return combined
+        lines = combined.splitlines()
+    return truncate_log(combined, max_tokens, model=model)
+
+
+def fit_log(text: str, max_tokens: int = None, summarize: bool = True, model: str = "gpt-4") -> str:
+    """
+    Returns `text` unchanged if it fits in the token budget; otherwise its most
+    diagnostic regions, falling back to a map-reduce summary when the tracebacks
+    and failure lines alone don't fit.
+    """
+    max_tokens = max_tokens or DEFAULT_LOG_TOKEN_BUDGET
+    if not text:
+        return text
+    # Cheap pre-check: a BPE token always covers at least one byte
+    if len(text.encode("utf-8")) <= max_tokens or count_tokens(text, model) <= max_tokens:
+        return text
+
+    lines = text.splitlines()
+    windows = _diagnostic_windows(lines)
+    diagnostic = _render(lines, windows)
+    if not summarize or count_tokens(diagnostic, model) <= max_tokens:
+        return truncate_log(text, max_tokens, model=model)
+
+    return summarize_log(diagnostic + "\n" + "\n".join(lines[-10:]), max_tokens, model=model)
@@ -0,0 +1,156 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from utils.github import validate_repo_url
+from utils.repo_mirror import _git, get_mirror_store
+
+
+class _CloneEntry:
+    def __init__(self, path: str, owned: bool = True):
+        self.path = path
+        self.owned = owned
+        self.refs = 0
+        self.ready = not owned
+        self.lock = threading.Lock()
+
+
+class RepoCloneCache:
+    """
+    Per-run cache of shallow clones keyed by (repo URL, commit SHA).
+
+    The first agent to ask for a repo triggers a single `git clone --depth 1`; every
+    lease after that is a detached `git worktree` of the shared clone, so agents get
+    their own writable checkout without touching the network again. Clones are
+    reference-counted and deleted once the run is closed and the last lease returned.
+
+    When a MirrorStore is configured (see utils.repo_mirror), worktrees are checked out
+    from the persistent bare mirror instead, after one incremental fetch per run.
+    """
+
+    def __init__(self, root: str = None, mirror_store=None):
+        self.root = root or tempfile.mkdtemp(prefix="agentops-clones-")
+        self.mirror_store = mirror_store or get_mirror_store()
+        self._entries = {}
+        self._leases = {}
+        self._synced = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def resolve_sha(self, repo_url: str, ref: str = "HEAD") -> str:
+        """Resolves a ref to a commit SHA without cloning."""
+        output = _git("ls-remote", repo_url, ref)
+        if not output:
+            raise ValueError(f"Could not resolve {ref} for {repo_url}")
+        return output.split()[0]
+
+    def _sync_mirror(self, repo_url: str) -> str:
+        """Fetches the mirror at most once per run and returns the SHA of its HEAD."""
+        with self._lock:
+            state = self._synced.setdefault(repo_url, {"lock": threading.Lock(), "path": None})
+        with state["lock"]:
+            if state["path"] is None:
+                state["path"] = self.mirror_store.sync(repo_url)
+        return _git("rev-parse", "HEAD", cwd=state["path"])
+
+    def _entry(self, repo_url: str, sha: str) -> _CloneEntry:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("RepoCloneCache is closed")
+            key = (repo_url, sha)
+            entry = self._entries.get(key)
+            if entry is None:
+                if self.mirror_store:
+                    entry = _CloneEntry(self.mirror_store.mirror_path(repo_url), owned=False)
+                else:
+                    entry = _CloneEntry(os.path.join(self.root, sha[:12] + "-" + uuid.uuid4().hex[:6]))
+                self._entries[key] = entry
+            entry.refs += 1
+            return entry
+
+    def _populate(self, entry: _CloneEntry, repo_url: str, sha: str):
+        subprocess.run(
+            ["git", "clone", "--depth", "1", "--no-checkout", repo_url, entry.path],
+            capture_output=True, check=True
+        )
+        if _git("rev-parse", "HEAD", cwd=entry.path) != sha:
+            # The default branch moved between ls-remote and clone — pin the SHA we resolved
+            _git("fetch", "--depth", "1", "origin", sha, cwd=entry.path)
+
+    def acquire(self, repo_url: str) -> str:
+        """Returns the path of a fresh worktree for the repo. Pair with release()."""
+        validate_repo_url(repo_url)
+        sha = self._sync_mirror(repo_url) if self.mirror_store else self.resolve_sha(repo_url)
+        entry = self._entry(repo_url, sha)
+        worktree = os.path.join(self.root, f"{sha[:12]}-wt-{uuid.uuid4().hex[:8]}")
+        try:
+            if not entry.owned:
+                self.mirror_store.add_worktree(repo_url, worktree, sha)
+            else:
+                with entry.lock:
+                    if not entry.ready:
+                        self._populate(entry, repo_url, sha)
+                        entry.ready = True
+                    _git("worktree", "add", "--detach", worktree, sha, cwd=entry.path)
+        except Exception:
+            self._drop_ref(entry)
+            raise
+
+        with self._lock:
+            self._leases[worktree] = (entry, repo_url)
+        return worktree
+
+    def release(self, worktree: str):
+        """Removes a leased worktree and drops its reference on the shared clone."""
+        with self._lock:
+            lease = self._leases.pop(worktree, None)
+        if lease is None:
+            return
+        entry, repo_url = lease
+        if not entry.owned:
+            self.mirror_store.remove_worktree(repo_url, worktree)
+        else:
+            with entry.lock:
+                try:
+                    _git("worktree", "remove", "--force", worktree, cwd=entry.path)
+                except subprocess.CalledProcessError:
+                    shutil.rmtree(worktree, ignore_errors=True)
+        self._drop_ref(entry)
+
+    def _drop_ref(self, entry: _CloneEntry):
+        with self._lock:
+            entry.refs -= 1
+            remove = self._closed and entry.refs == 0
+            remove_root = remove and not self._leases
+        if remove and entry.owned:
+            shutil.rmtree(entry.path, ignore_errors=True)
+        if remove_root:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    @contextmanager
+    def lease(self, repo_url: str):
+        worktree = self.acquire(repo_url)
+        try:
+            yield worktree
+        finally:
+            self.release(worktree)
+
+    def close(self):
+        """Marks the run finished; idle clones are removed now, busy ones on last release."""
+        with self._lock:
+            self._closed = True
+            idle = [e for e in self._entries.values() if e.refs == 0 and e.owned]
+        for entry in idle:
+            shutil.rmtree(entry.path, ignore_errors=True)
+        with self._lock:
+            if not self._leases:
+                shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
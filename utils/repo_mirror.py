@@ -0,0 +1,166 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+import time
+from urllib.parse import urlparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _git(*args, cwd=None) -> str:
+    result = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class MirrorStore:
+    """
+    On-disk store of bare `git clone --mirror` repositories, shared across pipeline runs.
+
+    The first sync of a repo does a full mirror clone; every later sync only runs
+    `git fetch --prune`, so repeated runs against the same repo download just the
+    delta. Mirrors not used for `max_age` seconds are evicted, then the least recently
+    used ones until the store fits in `max_bytes`. Mirrors with live worktrees, or
+    locked by another thread's fetch or checkout, are never evicted.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 20 * 1024 ** 3, max_age: float = 14 * 24 * 3600):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def mirror_path(self, repo_url: str) -> str:
+        name = os.path.basename(urlparse(repo_url).path).replace(".git", "") or "repo"
+        digest = hashlib.sha1(repo_url.encode()).hexdigest()[:16]
+        return os.path.join(self.root, f"{name}-{digest}.git")
+
+    def _lock_for(self, path: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def _fetch(self, repo_url: str, path: str):
+        if os.path.isdir(path):
+            _git("fetch", "--prune", "origin", cwd=path)
+        else:
+            subprocess.run(["git", "clone", "--mirror", repo_url, path], capture_output=True, check=True)
+        os.utime(path, None)
+
+    def sync(self, repo_url: str) -> str:
+        """Creates or incrementally fetches the mirror and returns its path."""
+        path = self.mirror_path(repo_url)
+        with self._lock_for(path):
+            self._fetch(repo_url, path)
+        self.evict(keep=(path,))
+        return path
+
+    def add_worktree(self, repo_url: str, dest: str, ref: str = "HEAD") -> str:
+        """Checks out `ref` from the mirror into `dest`. Returns the commit SHA."""
+        path = self.mirror_path(repo_url)
+        with self._lock_for(path):
+            if not os.path.isdir(path):
+                # Evicted by another run between sync() and now, before any worktree protected it
+                self._fetch(repo_url, path)
+            sha = _git("rev-parse", ref, cwd=path)
+            _git("worktree", "add", "--detach", dest, sha, cwd=path)
+            os.utime(path, None)
+        return sha
+
+    def remove_worktree(self, repo_url: str, dest: str):
+        path = self.mirror_path(repo_url)
+        with self._lock_for(path):
+            try:
+                _git("worktree", "remove", "--force", dest, cwd=path)
+            except subprocess.CalledProcessError:
+                shutil.rmtree(dest, ignore_errors=True)
+                _git("worktree", "prune", cwd=path)
+
+    def _in_use(self, path: str) -> bool:
+        try:
+            _git("worktree", "prune", cwd=path)
+            listing = _git("worktree", "list", "--porcelain", cwd=path)
+        except subprocess.CalledProcessError:
+            return False
+        # The first entry is the bare repository itself
+        return listing.count("worktree ") > 1
+
+    def evict(self, keep=()):
+        """Removes expired mirrors, then least recently used ones until under max_bytes."""
+        now = time.time()
+        mirrors = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not name.endswith(".git") or not os.path.isdir(path) or path in keep:
+                continue
+            mirrors.append((os.path.getmtime(path), path))
+
+        survivors = []
+        for last_used, path in sorted(mirrors):
+            if now - last_used > self.max_age and self._remove_idle(path, now - self.max_age):
+                continue
+            survivors.append((last_used, path))
+
+        sizes = {path: _dir_size(path) for _, path in survivors}
+        total = sum(sizes.values()) + sum(_dir_size(p) for p in keep if os.path.isdir(p))
+        for last_used, path in survivors:
+            if total <= self.max_bytes:
+                break
+            if self._remove_idle(path, last_used):
+                total -= sizes[path]
+
+    def _remove_idle(self, path: str, cutoff: float) -> bool:
+        """
+        Deletes a mirror unless another thread holds its lock (mid-fetch or checkout),
+        it was used after `cutoff`, or it has live worktrees. Returns True when removed.
+        """
+        lock = self._lock_for(path)
+        if not lock.acquire(blocking=False):
+            return False
+        try:
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                return False
+            if mtime > cutoff or self._in_use(path):
+                return False
+            shutil.rmtree(path, ignore_errors=True)
+            return True
+        finally:
+            lock.release()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_mirror_store():
+    """
+    Returns the process-wide MirrorStore, or None when AGENTOPS_REPO_MIRROR_ROOT is unset.
+    """
+    global _store
+    root = os.getenv("AGENTOPS_REPO_MIRROR_ROOT")
+    if not root:
+        return None
+    with _store_lock:
+        if _store is None or _store.root != os.path.abspath(root):
+            _store = MirrorStore(
+                root,
+                max_bytes=int(float(os.getenv("AGENTOPS_REPO_MIRROR_MAX_GB", "20")) * 1024 ** 3),
+                max_age=float(os.getenv("AGENTOPS_REPO_MIRROR_MAX_AGE_DAYS", "14")) * 24 * 3600
+            )
+        return _store
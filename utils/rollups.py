@@ -0,0 +1,332 @@
+import bisect
+import datetime
+import os
+import sqlite3
+import threading
+from config import is_simulation_mode
+from dotenv import load_dotenv
+
+load_dotenv()
+
+GRANULARITIES = {
+    "hour": lambda ts: ts.strftime("%Y-%m-%dT%H"),
+    "day": lambda ts: ts.strftime("%Y-%m-%d"),
+}
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open-ended.
+# Roughly log-spaced so percentiles stay within ~25% from sub-second LLM calls to long builds.
+LATENCY_BOUNDS = [
+    0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120, 240, 480, 900, 1800, 3600
+]
+
+
+def latency_bucket(seconds: float) -> int:
+    return bisect.bisect_left(LATENCY_BOUNDS, seconds)
+
+
+def percentile_from_histogram(counts: dict, percentile: float) -> float:
+    """
+    Estimates a percentile from {bucket index: count}, interpolating linearly inside
+    the bucket that contains it. Returns None for an empty histogram.
+    """
+    total = sum(counts.values())
+    if not total:
+        return None
+    rank = percentile / 100 * total
+    seen = 0
+    for index in sorted(counts):
+        count = counts[index]
+        if seen + count >= rank:
+            lower = LATENCY_BOUNDS[index - 1] if index > 0 else 0.0
+            upper = LATENCY_BOUNDS[index] if index < len(LATENCY_BOUNDS) else LATENCY_BOUNDS[-1] * 2
+            return lower + (upper - lower) * ((rank - seen) / count)
+        seen += count
+    return LATENCY_BOUNDS[-1]
+
+
+class RollupStore:
+    """
+    Hourly and daily KPI rollups, updated one record at a time.
+
+    Each agent result increments counters in its (bucket, agent, mode, repo) row;
+    each pipeline run is counted once per bucket (and once more as failed if any of
+    its agents errors). Stage latencies go into fixed histogram buckets so
+    percentiles can be merged across any range of rollup rows. Readers only ever
+    touch rollup rows — O(buckets), independent of how many runs were logged.
+
+    Each (session, agent) result is counted once, so the live feed from log_session
+    and catch_up() from the storage backend can both record the same result. That
+    lets a fresh or restarted replica rebuild its rollups from storage and pick up
+    runs logged by other replicas.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS agent_rollups (
+                granularity TEXT NOT NULL, bucket TEXT NOT NULL,
+                agent TEXT NOT NULL, mode TEXT NOT NULL, repo TEXT NOT NULL,
+                executions INTEGER NOT NULL DEFAULT 0,
+                successes INTEGER NOT NULL DEFAULT 0,
+                errors INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (granularity, bucket, agent, mode, repo)
+            );
+            CREATE TABLE IF NOT EXISTS latency_rollups (
+                granularity TEXT NOT NULL, bucket TEXT NOT NULL,
+                agent TEXT NOT NULL, mode TEXT NOT NULL, repo TEXT NOT NULL,
+                le INTEGER NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                total_seconds REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (granularity, bucket, agent, mode, repo, le)
+            );
+            CREATE TABLE IF NOT EXISTS run_rollups (
+                granularity TEXT NOT NULL, bucket TEXT NOT NULL,
+                mode TEXT NOT NULL, repo TEXT NOT NULL,
+                runs INTEGER NOT NULL DEFAULT 0,
+                failed_runs INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (granularity, bucket, mode, repo)
+            );
+            CREATE TABLE IF NOT EXISTS run_index (
+                session_id TEXT PRIMARY KEY,
+                started_at TEXT NOT NULL,
+                mode TEXT NOT NULL, repo TEXT NOT NULL,
+                failed INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS result_index (
+                session_id TEXT NOT NULL, agent TEXT NOT NULL,
+                PRIMARY KEY (session_id, agent)
+            );
+            CREATE TABLE IF NOT EXISTS rollup_meta (
+                key TEXT PRIMARY KEY, value TEXT NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def _run_buckets(self, started_at: str):
+        ts = datetime.datetime.fromisoformat(started_at)
+        return [(g, fn(ts)) for g, fn in GRANULARITIES.items()]
+
+    def record_result(self, session_id: str, agent: str, status: str, mode: str, repo: str, timestamp=None):
+        """
+        Counts one agent result and, the first time a session is seen, one run.
+        Returns False when this (session, agent) result was already counted.
+        """
+        ts = timestamp or datetime.datetime.utcnow()
+        failed = 1 if status == "error" else 0
+        with self._lock, self._conn:
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO result_index (session_id, agent) VALUES (?, ?)", (session_id, agent)
+            ).rowcount
+            if not inserted:
+                return False
+            for granularity, fn in GRANULARITIES.items():
+                self._conn.execute(
+                    "INSERT INTO agent_rollups (granularity, bucket, agent, mode, repo, executions, successes, errors) "
+                    "VALUES (?, ?, ?, ?, ?, 1, ?, ?) "
+                    "ON CONFLICT (granularity, bucket, agent, mode, repo) DO UPDATE SET "
+                    "executions = executions + 1, successes = successes + excluded.successes, "
+                    "errors = errors + excluded.errors",
+                    (granularity, fn(ts), agent, mode, repo, 1 if status == "success" else 0, failed)
+                )
+
+            run = self._conn.execute(
+                "SELECT started_at, mode, repo, failed FROM run_index WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if run is None:
+                self._conn.execute(
+                    "INSERT INTO run_index (session_id, started_at, mode, repo, failed) VALUES (?, ?, ?, ?, ?)",
+                    (session_id, ts.isoformat(), mode, repo, failed)
+                )
+                for granularity, bucket in self._run_buckets(ts.isoformat()):
+                    self._conn.execute(
+                        "INSERT INTO run_rollups (granularity, bucket, mode, repo, runs, failed_runs) "
+                        "VALUES (?, ?, ?, ?, 1, ?) "
+                        "ON CONFLICT (granularity, bucket, mode, repo) DO UPDATE SET "
+                        "runs = runs + 1, failed_runs = failed_runs + excluded.failed_runs",
+                        (granularity, bucket, mode, repo, failed)
+                    )
+            elif failed and not run[3]:
+                # Run was counted as passing so far — move it to failed in its original buckets
+                started_at, run_mode, run_repo, _ = run
+                self._conn.execute("UPDATE run_index SET failed = 1 WHERE session_id = ?", (session_id,))
+                for granularity, bucket in self._run_buckets(started_at):
+                    self._conn.execute(
+                        "UPDATE run_rollups SET failed_runs = failed_runs + 1 "
+                        "WHERE granularity = ? AND bucket = ? AND mode = ? AND repo = ?",
+                        (granularity, bucket, run_mode, run_repo)
+                    )
+        return True
+
+    def catch_up(self, fetch_page, page_size: int = 1000, overlap: float = 600) -> int:
+        """
+        Counts history rows from `fetch_page` (the storage backend's fetch_sessions_page)
+        logged since the last catch-up — the whole history on first use. Re-reads
+        `overlap` seconds before the watermark for late batched writes; results already
+        counted are skipped. Latencies aren't in the history, so they are not backfilled.
+        Returns the number of results added.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM rollup_meta WHERE key = 'watermark'").fetchone()
+        watermark = row[0] if row else None
+        since = None
+        if watermark:
+            since = (datetime.datetime.fromisoformat(watermark) - datetime.timedelta(seconds=overlap)).isoformat()
+
+        added, newest, token = 0, watermark, None
+        while True:
+            rows, token = fetch_page(page_size, token, since=since)
+            for item in rows:
+                if not item.get("timestamp") or not item.get("session_id"):
+                    continue
+                ts = _parse_timestamp(item["timestamp"])
+                added += self.record_result(
+                    item["session_id"], item["agent"], item.get("status") or "unknown",
+                    item.get("mode") or "production", item.get("repo") or "N/A", ts
+                )
+                newest = max(newest or ts.isoformat(), ts.isoformat())
+            if not token:
+                break
+
+        if newest and newest != watermark:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO rollup_meta (key, value) VALUES ('watermark', ?)", (newest,)
+                )
+        return added
+
+    def record_latency(self, agent: str, seconds: float, mode: str, repo: str, timestamp=None):
+        """Adds one stage duration to the agent's latency histogram."""
+        ts = timestamp or datetime.datetime.utcnow()
+        le = latency_bucket(seconds)
+        with self._lock, self._conn:
+            for granularity, fn in GRANULARITIES.items():
+                self._conn.execute(
+                    "INSERT INTO latency_rollups (granularity, bucket, agent, mode, repo, le, count, total_seconds) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 1, ?) "
+                    "ON CONFLICT (granularity, bucket, agent, mode, repo, le) DO UPDATE SET "
+                    "count = count + 1, total_seconds = total_seconds + excluded.total_seconds",
+                    (granularity, fn(ts), agent, mode, repo, le, seconds)
+                )
+
+    def _select(self, sql: str, granularity: str, since: str, mode: str, parameters=()):
+        filters = ["granularity = ?"]
+        values = [granularity]
+        if since:
+            filters.append("bucket >= ?")
+            values.append(since)
+        if mode:
+            filters.append("mode = ?")
+            values.append(mode)
+        with self._lock:
+            return self._conn.execute(sql.format(where=" AND ".join(filters)), values + list(parameters)).fetchall()
+
+    def kpis(self, since: str = None, mode: str = None, granularity: str = "day") -> dict:
+        """Total runs, run success rate and production runs since `since` (a bucket key)"""
+        runs, failed, production = self._select(
+            "SELECT COALESCE(SUM(runs), 0), COALESCE(SUM(failed_runs), 0), "
+            "COALESCE(SUM(CASE WHEN mode = 'production' THEN runs ELSE 0 END), 0) "
+            "FROM run_rollups WHERE {where}",
+            granularity, since, mode
+        )[0]
+        return {
+            "total_runs": runs,
+            "success_rate": (runs - failed) / runs if runs else 0.0,
+            "production_runs": production,
+        }
+
+    def timeseries(self, since: str = None, mode: str = None, granularity: str = "day") -> list:
+        """Per bucket: agent executions and their success rate"""
+        rows = self._select(
+            "SELECT bucket, SUM(executions), SUM(successes) FROM agent_rollups WHERE {where} "
+            "GROUP BY bucket ORDER BY bucket",
+            granularity, since, mode
+        )
+        return [
+            {"bucket": bucket, "executions": executions, "success_rate": successes / executions}
+            for bucket, executions, successes in rows if executions
+        ]
+
+    def agent_stats(self, since: str = None, mode: str = None, granularity: str = "day",
+                    percentiles=(50, 90, 99)) -> list:
+        """Per agent: executions, success rate and latency percentiles (seconds)"""
+        counts = self._select(
+            "SELECT agent, SUM(executions), SUM(successes) FROM agent_rollups WHERE {where} GROUP BY agent",
+            granularity, since, mode
+        )
+        histograms = {}
+        for agent, le, count in self._select(
+            "SELECT agent, le, SUM(count) FROM latency_rollups WHERE {where} GROUP BY agent, le",
+            granularity, since, mode
+        ):
+            histograms.setdefault(agent, {})[le] = count
+
+        stats = []
+        for agent, executions, successes in counts:
+            row = {"agent": agent, "executions": executions, "success_rate": successes / executions if executions else 0.0}
+            for p in percentiles:
+                row[f"p{p}_s"] = percentile_from_histogram(histograms.get(agent, {}), p)
+            stats.append(row)
+        return sorted(stats, key=lambda r: r["success_rate"], reverse=True)
+
+    def has_data(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM run_rollups LIMIT 1").fetchone() is not None
+
+
+def _parse_timestamp(value: str) -> datetime.datetime:
+    """ISO timestamp as naive UTC, the way the rollup buckets are keyed"""
+    parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _dimensions(data: dict, repo: str = None):
+    inputs = data.get("input") if isinstance(data, dict) and isinstance(data.get("input"), dict) else {}
+    mode = inputs.get("mode") or ("simulation" if is_simulation_mode() else "production")
+    return mode, repo or inputs.get("repo_url") or "N/A"
+
+
+_rollups = None
+_rollups_lock = threading.Lock()
+
+
+def get_rollups():
+    """Return the process-wide RollupStore, or None when AGENTOPS_ROLLUPS is off"""
+    global _rollups
+    if os.getenv("AGENTOPS_ROLLUPS", "on").lower() in ("off", "0", "false"):
+        return None
+    if _rollups is None:
+        with _rollups_lock:
+            if _rollups is None:
+                _rollups = RollupStore(os.getenv("AGENTOPS_ROLLUP_PATH", ".data/rollups.sqlite3"))
+    return _rollups
+
+
+def record_agent_result(session_id: str, agent: str, data: dict):
+    """Feed one logged agent result into the rollups (never raises)"""
+    try:
+        rollups = get_rollups()
+        if rollups is not None:
+            mode, repo = _dimensions(data)
+            status = data.get("status", "unknown") if isinstance(data, dict) else "unknown"
+            rollups.record_result(session_id, agent, status, mode, repo)
+    except Exception as e:
+        print(f"Error updating KPI rollups: {e}")
+
+
+def record_stage_latency(agent: str, seconds: float, repo: str = None):
+    """Feed one pipeline stage duration into the latency rollups (never raises)"""
+    try:
+        rollups = get_rollups()
+        if rollups is not None:
+            mode, repo = _dimensions({}, repo)
+            rollups.record_latency(agent, seconds, mode, repo)
+    except Exception as e:
+        print(f"Error updating latency rollups: {e}")
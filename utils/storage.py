@@ -0,0 +1,330 @@
+import abc
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import is_simulation_mode
+from utils import azure_cosmos
+from utils.azure_cosmos import begin_query_scope, get_query_metrics, query_scope, summary_bucket
+from utils.rollups import get_rollups, record_agent_result
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class StorageBackend(abc.ABC):
+    """
+    Session log persistence used by the agents and pages.
+
+    Pick the implementation with AGENTOPS_STORAGE_BACKEND (cosmos | sqlite).
+    `records_simulation` is True when the backend keeps simulation-mode runs
+    instead of serving mock history. A backend that leaves an abstract method
+    unimplemented fails when it is constructed, not on first use.
+    """
+
+    name = "base"
+    records_simulation = False
+
+    @abc.abstractmethod
+    def log_session(self, session_id: str, agent: str, data: dict):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def fetch_agent_history(self, agent: str, limit=5) -> list:
+        raise NotImplementedError
+
+    def fetch_recent_history(self, agents: list, limit: int = 5) -> dict:
+        return {agent: self.fetch_agent_history(agent, limit) for agent in agents}
+
+    @abc.abstractmethod
+    def fetch_all_sessions(self) -> dict:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def fetch_sessions_page(self, page_size: int = 50, continuation: str = None, **filters):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def fetch_session_summaries(self, month: str, limit: int = 50) -> list:
+        raise NotImplementedError
+
+    def sync_session_summaries(self) -> int:
+        return 0
+
+    def sync_session_summaries_in_background(self) -> bool:
+        return False
+
+    def flush(self, timeout: float = 10.0) -> dict:
+        return {"queued": 0, "written": 0, "dropped": 0, "failed": 0}
+
+    def history_version(self) -> int:
+        return 0
+
+
+class CosmosStorageBackend(StorageBackend):
+    """Azure Cosmos DB (see utils/azure_cosmos.py)."""
+
+    name = "cosmos"
+
+    def log_session(self, session_id: str, agent: str, data: dict):
+        azure_cosmos.log_session(session_id, agent, data)
+
+    def fetch_agent_history(self, agent: str, limit=5) -> list:
+        return azure_cosmos.fetch_agent_history(agent, limit)
+
+    def fetch_recent_history(self, agents: list, limit: int = 5) -> dict:
+        return azure_cosmos.fetch_recent_history(agents, limit)
+
+    def fetch_all_sessions(self) -> dict:
+        return azure_cosmos.fetch_all_sessions()
+
+    def fetch_sessions_page(self, page_size: int = 50, continuation: str = None, **filters):
+        return azure_cosmos.fetch_sessions_page(page_size, continuation, **filters)
+
+    def fetch_session_summaries(self, month: str, limit: int = 50) -> list:
+        return azure_cosmos.fetch_session_summaries(month, limit)
+
+    def sync_session_summaries(self) -> int:
+        return azure_cosmos.sync_session_summaries()
+
+    def sync_session_summaries_in_background(self) -> bool:
+        return azure_cosmos.sync_session_summaries_in_background()
+
+    def flush(self, timeout: float = 10.0) -> dict:
+        return azure_cosmos.flush_session_logs(timeout)
+
+    def history_version(self) -> int:
+        return azure_cosmos.get_history_version()
+
+
+class SQLiteStorageBackend(StorageBackend):
+    """
+    Embedded single-file store for local runs, benchmarks and single-node deployments.
+
+    Documents keep the Cosmos shape (id = "<session_id>_<agent>", data as JSON); the
+    fields the pages filter and sort on are also stored as indexed columns. WAL mode
+    lets the UI read while a pipeline is writing. History pages use keyset pagination,
+    so the continuation token is the (timestamp, id) of the last row returned.
+    """
+
+    name = "sqlite"
+    records_simulation = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._version = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                agent TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                status TEXT,
+                mode TEXT,
+                repo TEXT,
+                issues_found TEXT,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_agent_ts ON sessions(agent, timestamp DESC);
+            CREATE INDEX IF NOT EXISTS idx_sessions_ts ON sessions(timestamp DESC, id DESC);
+            CREATE INDEX IF NOT EXISTS idx_sessions_session ON sessions(session_id);
+        """)
+        self._conn.commit()
+
+    def _timed(self, operation: str, sql: str, parameters=()) -> list:
+        started = time.perf_counter()
+        with self._lock:
+            rows = self._conn.execute(sql, parameters).fetchall()
+        get_query_metrics().record(operation, 0.0, time.perf_counter() - started, len(rows))
+        return rows
+
+    def log_session(self, session_id: str, agent: str, data: dict):
+        inputs = data.get("input") if isinstance(data.get("input"), dict) else {}
+        output = data.get("output") if isinstance(data.get("output"), dict) else {}
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions "
+                "(id, session_id, agent, timestamp, status, mode, repo, issues_found, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    f"{session_id}_{agent}", session_id, agent,
+                    datetime.datetime.utcnow().isoformat(),
+                    data.get("status", "unknown"),
+                    inputs.get("mode", "simulation" if is_simulation_mode() else "production"),
+                    inputs.get("repo_url", "N/A"),
+                    str(output.get("issues_found", "N/A")),
+                    json.dumps(data, default=str)
+                )
+            )
+            self._conn.commit()
+            self._version += 1
+
+    def fetch_agent_history(self, agent: str, limit=5) -> list:
+        rows = self._timed(
+            "fetch_agent_history",
+            "SELECT session_id, timestamp, data FROM sessions WHERE agent = ? ORDER BY timestamp DESC LIMIT ?",
+            (agent, int(limit))
+        )
+        return [{"session_id": s, "timestamp": t, "data": json.loads(d)} for s, t, d in rows]
+
+    def fetch_all_sessions(self) -> dict:
+        sessions = {}
+        for session_id, agent, data in self._timed(
+            "fetch_all_sessions", "SELECT session_id, agent, data FROM sessions ORDER BY timestamp DESC"
+        ):
+            sessions.setdefault(session_id, {"agents": {}})["agents"][agent] = json.loads(data)
+        return sessions
+
+    def fetch_sessions_page(
+        self,
+        page_size: int = 50,
+        continuation: str = None,
+        mode: str = None,
+        status: str = None,
+        agent: str = None,
+        since: str = None,
+        until: str = None
+    ):
+        filters, parameters = [], []
+        for column, value in (("mode", mode), ("status", status), ("agent", agent)):
+            if value:
+                filters.append(f"{column} = ?")
+                parameters.append(value)
+        if since:
+            filters.append("timestamp >= ?")
+            parameters.append(since)
+        if until:
+            filters.append("timestamp < ?")
+            parameters.append(until)
+        if continuation:
+            last_timestamp, last_id = json.loads(continuation)
+            filters.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+            parameters += [last_timestamp, last_timestamp, last_id]
+
+        where = f"WHERE {' AND '.join(filters)}" if filters else ""
+        rows = self._timed(
+            "fetch_sessions_page",
+            f"SELECT id, session_id, agent, timestamp, repo, mode, status, issues_found FROM sessions {where} "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?",
+            parameters + [page_size + 1]
+        )
+
+        next_token = json.dumps([rows[page_size - 1][3], rows[page_size - 1][0]]) if len(rows) > page_size else None
+        columns = ("session_id", "agent", "timestamp", "repo", "mode", "status", "issues_found")
+        return [dict(zip(columns, row[1:])) for row in rows[:page_size]], next_token
+
+    def fetch_session_summaries(self, month: str, limit: int = 50) -> list:
+        rows = self._timed(
+            "fetch_session_summaries",
+            "SELECT session_id, MIN(timestamp), MAX(timestamp), MAX(repo), MAX(mode), "
+            "json_group_object(agent, status) FROM sessions WHERE substr(timestamp, 1, 7) = ? "
+            "GROUP BY session_id ORDER BY MAX(timestamp) DESC LIMIT ?",
+            (month, limit)
+        )
+        summaries = []
+        for session_id, started_at, updated_at, repo, mode, agents in rows:
+            agents = json.loads(agents)
+            statuses = agents.values()
+            summaries.append({
+                "id": session_id,
+                "session_id": session_id,
+                "bucket": summary_bucket(started_at),
+                "started_at": started_at,
+                "updated_at": updated_at,
+                "repo": repo,
+                "mode": mode,
+                "agents": agents,
+                "status": "error" if "error" in statuses else "warning" if "warning" in statuses else "success"
+            })
+        return summaries
+
+    def flush(self, timeout: float = 10.0) -> dict:
+        # Writes are synchronous — nothing is ever queued or dropped
+        return {"queued": 0, "written": self._version, "dropped": 0, "failed": 0}
+
+    def history_version(self) -> int:
+        return self._version
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> StorageBackend:
+    """Return the process-wide storage backend selected by AGENTOPS_STORAGE_BACKEND"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                kind = os.getenv("AGENTOPS_STORAGE_BACKEND", "cosmos").lower()
+                if kind == "sqlite":
+                    _storage = SQLiteStorageBackend(os.getenv("AGENTOPS_SQLITE_PATH", ".data/agentops.sqlite3"))
+                elif kind == "cosmos":
+                    _storage = CosmosStorageBackend()
+                else:
+                    raise ValueError(f"Unknown AGENTOPS_STORAGE_BACKEND: {kind}")
+    return _storage
+
+
+def log_session(session_id: str, agent: str, data: dict):
+    """Log one agent's output for a session to the configured backend and the KPI rollups"""
+    storage = get_storage()
+    storage.log_session(session_id, agent, data)
+    # Rollups mirror what the backend keeps — no simulated runs unless it records them
+    if storage.records_simulation or not is_simulation_mode():
+        record_agent_result(session_id, agent, data)
+
+
+def fetch_agent_history(agent: str, limit=5) -> list:
+    return get_storage().fetch_agent_history(agent, limit)
+
+
+def fetch_recent_history(agents: list, limit: int = 5) -> dict:
+    return get_storage().fetch_recent_history(agents, limit)
+
+
+def fetch_all_sessions() -> dict:
+    return get_storage().fetch_all_sessions()
+
+
+def fetch_sessions_page(page_size: int = 50, continuation: str = None, **filters):
+    return get_storage().fetch_sessions_page(page_size, continuation, **filters)
+
+
+def fetch_session_summaries(month: str, limit: int = 50) -> list:
+    return get_storage().fetch_session_summaries(month, limit)
+
+
+def sync_session_summaries() -> int:
+    return get_storage().sync_session_summaries()
+
+
+def sync_session_summaries_in_background() -> bool:
+    return get_storage().sync_session_summaries_in_background()
+
+
+def sync_rollups() -> int:
+    """
+    Fold history rows the local KPI rollups haven't counted yet into them — the whole
+    history on first use, so a new replica or a restarted container starts complete.
+    """
+    rollups = get_rollups()
+    if rollups is None:
+        return 0
+    return rollups.catch_up(fetch_sessions_page)
+
+
+def flush_session_logs(timeout: float = 10.0) -> dict:
+    return get_storage().flush(timeout)
+
+
+def get_history_version() -> int:
+    return get_storage().history_version()